@@ -0,0 +1,35 @@
+import argparse
+import time
+
+from src.friend_network import FriendNetwork
+
+
+# Times how the edges of a network are built from its mutual friend links. Every link is resolved through a hash index,
+# so the time grows linearly with the number of mutual friends and the sample network takes a few milliseconds.
+#
+#   python -m benchmarks.edge_construction --network sample_data/my_anonymized_network.json
+def run_benchmark(network: FriendNetwork, repetitions=1):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        edges = network._get_network_edges()
+    duration = time.perf_counter() - start
+
+    return dict(edges=len(edges), unresolved_links=len(network.unresolved_links), seconds=duration / repetitions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time of building the edges of a network of friends")
+    parser.add_argument("--network", default="sample_data/my_anonymized_network.json", help="Network file")
+    parser.add_argument("--repetitions", type=int, default=10, help="Times the edges are built")
+    args = parser.parse_args()
+
+    network = FriendNetwork()
+    network.load_network(args.network)
+    result = run_benchmark(network, args.repetitions)
+
+    print(f"{result['edges']} edges, {result['unresolved_links']} unresolved links")
+    print(f"{result['seconds']:.4f} s per construction")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import time
+
+import networkx as nx
+
+from src.layouts import LAYOUTS
+
+
+# Times every layout of the analysis page on a small-world graph like the networks of friends. Spring layouts do not
+# scale to big networks, so this is where the Barnes-Hut layout is compared with them.
+#
+#   python -m benchmarks.layout_speed --nodes 1000 --neighbors 10
+def get_graph(number_of_nodes, neighbors, rewiring_probability, seed) -> nx.Graph:
+    return nx.connected_watts_strogatz_graph(number_of_nodes, neighbors, rewiring_probability, seed=seed)
+
+
+def run_benchmark(graph: nx.Graph, layouts, repetitions=1, seed=0):
+    results = []
+    for name, layout in layouts.items():
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            positions = layout(graph, seed=seed)
+            if len(positions) != graph.number_of_nodes():
+                raise RuntimeError(f"Layout '{name}' did not place every node")
+        duration = time.perf_counter() - start
+
+        results.append(dict(layout=name, seconds_per_layout=duration / repetitions))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time of the layouts on a small-world graph")
+    parser.add_argument("--nodes", type=int, default=1000, help="Number of nodes of the graph")
+    parser.add_argument("--neighbors", type=int, default=10, help="Neighbors of every node before rewiring")
+    parser.add_argument("--rewiring-probability", type=float, default=0.1)
+    parser.add_argument("--repetitions", type=int, default=1, help="Layouts per layout algorithm")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    graph = get_graph(args.nodes, args.neighbors, args.rewiring_probability, args.seed)
+    results = run_benchmark(graph, LAYOUTS, args.repetitions, args.seed)
+
+    print(f"{'layout':<20} {'s/layout':>10}")
+    for result in results:
+        print(f"{result['layout']:<20} {result['seconds_per_layout']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
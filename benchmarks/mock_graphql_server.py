@@ -0,0 +1,156 @@
+import asyncio
+from collections import deque
+import json
+import random
+import threading
+from typing import Dict, List, Optional
+
+from aiohttp import web
+import networkx as nx
+
+
+# Local stand-in for the /api/graphql/ endpoint of Facebook. It answers the friend list and mutual friends queries of
+# the scanners with the same paging contract (page_info.has_next_page and end_cursor), for a random network of friends,
+# with configurable latency and rate of server errors. Like Facebook, it throttles clients that exceed a request rate.
+class MockGraphQLServer(object):
+    FRIEND_LIST_QUERY = "FriendingCometFriendsListPaginationQuery"
+    DEFAULT_FRIEND_LIST_PAGE_SIZE = 30
+    DEFAULT_MUTUAL_FRIENDS_PAGE_SIZE = 10
+    THROTTLING_RESPONSE = dict(error=1675004, errorSummary="Rate limit exceeded")
+
+    def __init__(
+            self,
+            number_of_friends=300,
+            mean_mutual_friends=20,
+            latency=0.05,
+            error_rate=0.0,
+            max_requests_per_second=None,
+            seed=None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_requests_per_second = max_requests_per_second
+        self._request_times = deque()
+        self._random = random.Random(seed)
+
+        probability = min(1.0, mean_mutual_friends / max(1, number_of_friends - 1))
+        graph = nx.fast_gnp_random_graph(number_of_friends, probability, seed=seed)
+        self.friend_ids = [str(node + 1) for node in graph.nodes]
+        self.mutual_friend_ids: Dict[str, List[str]] = {
+            str(node + 1): [str(neighbor + 1) for neighbor in sorted(graph.neighbors(node))] for node in graph.nodes
+        }
+
+        self.number_of_requests = 0
+        self.number_of_errors = 0
+        self.number_of_throttled_requests = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self.url: Optional[str] = None
+
+    def start(self, host="127.0.0.1", port=0) -> str:
+        # The server runs its own event loop in a thread, so that it can be used by synchronous scanners too
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_site(host, port))
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.url
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def reset_counters(self):
+        self.number_of_requests = 0
+        self.number_of_errors = 0
+        self.number_of_throttled_requests = 0
+
+    def __enter__(self) -> "MockGraphQLServer":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+
+    async def _start_site(self, host, port):
+        app = web.Application()
+        app.router.add_post("/api/graphql/", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}/api/graphql/"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        variables = json.loads(form["variables"])
+        self.number_of_requests += 1
+        is_throttled = self._exceeds_rate_limit()
+
+        await asyncio.sleep(self.latency)
+
+        if is_throttled:
+            self.number_of_throttled_requests += 1
+            return web.Response(text="for (;;);" + json.dumps(self.THROTTLING_RESPONSE))
+        if self._random.random() < self.error_rate:
+            self.number_of_errors += 1
+            return web.Response(status=500)
+
+        if form["fb_api_req_friendly_name"] == self.FRIEND_LIST_QUERY:
+            return web.json_response(self.get_friend_list_page(variables))
+
+        return web.json_response(self.get_mutual_friends_page(variables))
+
+    def _exceeds_rate_limit(self) -> bool:
+        if not self.max_requests_per_second:
+            return False
+
+        # Throttled requests are counted too, so a client that keeps retrying stays throttled
+        now = asyncio.get_running_loop().time()
+        self._request_times.append(now)
+        while self._request_times[0] <= now - 1:
+            self._request_times.popleft()
+
+        return len(self._request_times) > self.max_requests_per_second
+
+    def get_friend_list_page(self, variables) -> dict:
+        edges, page_info = self._get_page(
+            self.friend_ids, variables.get("cursor"), variables.get("count") or self.DEFAULT_FRIEND_LIST_PAGE_SIZE
+        )
+        return dict(data=dict(viewer=dict(all_friends=dict(
+            edges=[dict(node=dict(self._get_user(user_id), gender="MALE")) for user_id in edges],
+            page_info=page_info,
+        ))))
+
+    def get_mutual_friends_page(self, variables) -> dict:
+        edges, page_info = self._get_page(
+            self.mutual_friend_ids.get(variables["sourceID"], []),
+            variables.get("cursor"),
+            variables.get("count") or self.DEFAULT_MUTUAL_FRIENDS_PAGE_SIZE,
+        )
+        return dict(data=dict(profile_list=dict(list_items=dict(
+            edges=[dict(node=self._get_user(user_id)) for user_id in edges],
+            page_info=page_info,
+        ))))
+
+    @staticmethod
+    def _get_page(user_ids, cursor, count):
+        start = int(cursor or 0)
+        end = min(start + count, len(user_ids))
+        return user_ids[start:end], dict(has_next_page=end < len(user_ids), end_cursor=str(end))
+
+    @staticmethod
+    def _get_user(user_id) -> dict:
+        return dict(id=user_id, name=f"Friend {user_id}", url=f"https://www.facebook.com/{user_id}", __typename="User")
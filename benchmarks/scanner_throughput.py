@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import time
+
+from benchmarks.mock_graphql_server import MockGraphQLServer
+from src.facebook_friend_network_async_scanner import AsyncFacebookFriendNetworkGraphQLScanner
+from src.facebook_friend_network_graphql_scanner import FacebookFriendNetworkGraphQLScanner
+
+
+# Scans a local MockGraphQLServer with every scanner mode and reports their throughput. The Selenium scanner reads the
+# mutual friends from the profile pages, so only the GraphQL modes can be measured against the mock server.
+#
+#   python -m benchmarks.scanner_throughput --friends 300 --latency 0.05 --concurrency 10
+COOKIES = dict(c_user="1", xs="benchmark")
+TOKEN = "benchmark"
+
+
+def do_nothing(_):
+    pass
+
+
+def scan_with_graphql_scanner(url, concurrency):
+    scanner_class = type("LocalGraphQLScanner", (FacebookFriendNetworkGraphQLScanner,), dict(GRAPHQL_URL=url))
+    scanner = scanner_class.from_session(COOKIES, TOKEN, concurrency=concurrency)
+    scanner.scan_network(notify=do_nothing)
+    return scanner
+
+
+def scan_with_async_scanner(url, concurrency):
+    scanner = AsyncFacebookFriendNetworkGraphQLScanner(COOKIES, TOKEN, concurrency=concurrency)
+    scanner.GRAPHQL_URL = url
+    asyncio.run(scanner.scan_network())
+    return scanner
+
+
+def get_modes(concurrency):
+    return {
+        "graphql": lambda url: scan_with_graphql_scanner(url, 1),
+        f"graphql-threads-{concurrency}": lambda url: scan_with_graphql_scanner(url, concurrency),
+        f"async-{concurrency}": lambda url: scan_with_async_scanner(url, concurrency),
+    }
+
+
+def run_benchmark(server: MockGraphQLServer, modes, repetitions=1):
+    results = []
+    for mode, scan in modes.items():
+        server.reset_counters()
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            scanner = scan(server.url)
+            if len(scanner.mutual_friends) != len(server.friend_ids):
+                raise RuntimeError(f"Scan with mode '{mode}' is incomplete")
+        duration = time.perf_counter() - start
+
+        results.append(dict(
+            mode=mode,
+            seconds_per_scan=duration / repetitions,
+            scans_per_minute=60 * repetitions / duration,
+            requests_per_second=server.number_of_requests / duration,
+            errors=server.number_of_errors + server.number_of_throttled_requests,
+        ))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the scanners against a local mock GraphQL server")
+    parser.add_argument("--friends", type=int, default=300, help="Number of friends of the mock network")
+    parser.add_argument("--mutual-friends", type=int, default=20, help="Mean number of mutual friends")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latency of every response, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of responses that are HTTP 500")
+    parser.add_argument(
+        "--max-requests-per-second", type=float, default=None, help="Request rate above which the server throttles"
+    )
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrency of the concurrent modes")
+    parser.add_argument("--repetitions", type=int, default=1, help="Scans per mode")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockGraphQLServer(
+        number_of_friends=args.friends,
+        mean_mutual_friends=args.mutual_friends,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        max_requests_per_second=args.max_requests_per_second,
+        seed=args.seed,
+    )
+    with server:
+        results = run_benchmark(server, get_modes(args.concurrency), args.repetitions)
+
+    print(f"{'mode':<20} {'s/scan':>10} {'scans/min':>10} {'requests/s':>11} {'errors':>7}")
+    for result in results:
+        print(
+            f"{result['mode']:<20} {result['seconds_per_scan']:>10.2f} {result['scans_per_minute']:>10.2f} "
+            f"{result['requests_per_second']:>11.1f} {result['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+import networkx as nx
+import numpy as np
+
+from src import communities
+from src.friend_network import FriendNetwork
+
+
+class AnalysisCache(object):
+    NODE_BYTES = 1024
+    EDGE_BYTES = 512
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[FriendNetwork, int, str]]" = OrderedDict()
+        # Only the last version of every file is remembered, and it is forgotten with the network that was read from it
+        self._file_hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._lock = threading.Lock()
+        self.size = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else settings.ANALYSIS_CACHE_MAX_BYTES
+
+    def get_network(self, scan_instance_pk: int, filename: str, layout: Optional[Dict] = None) -> FriendNetwork:
+        key = (scan_instance_pk, self._get_file_hash(filename))
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                network, _, _ = self._entries[key]
+                return network
+
+        network = self._prepare_network(filename, layout)
+        self._add(key, network, filename)
+        return network
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._file_hashes.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _prepare_network(filename, layout: Optional[Dict] = None) -> FriendNetwork:
+        network = FriendNetwork()
+        network.load_network(filename)
+        network.filter_biggest_component()
+
+        if layout is not None and all(node in layout for node in network.graph.nodes):
+            network.node_positions = {node: np.array(layout[node]) for node in network.graph.nodes}
+        else:
+            network.compute_positions(seed=0)
+            # Lay the network out before it is shared between requests
+            _ = network.node_positions
+
+        # Requests must not edit a shared network, and a frozen graph lets it memoize its fingerprint
+        nx.freeze(network.graph)
+        return network
+
+    def _add(self, key, network: FriendNetwork, filename: str):
+        network_size = (
+            self.NODE_BYTES * network.graph.number_of_nodes() + self.EDGE_BYTES * network.graph.number_of_edges()
+        )
+
+        with self._lock:
+            if key in self._entries:
+                return
+
+            self._entries[key] = (network, network_size, filename)
+            self.size += network_size
+
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                (_, evicted_hash), (_, evicted_size, evicted_filename) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                if self._file_hashes.get(evicted_filename, (None, None))[1] == evicted_hash:
+                    del self._file_hashes[evicted_filename]
+
+    def _get_file_hash(self, filename) -> str:
+        stat = os.stat(filename)
+        file_version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            if filename in self._file_hashes and self._file_hashes[filename][0] == file_version:
+                return self._file_hashes[filename][1]
+
+        file_hash = hashlib.sha256()
+        with open(filename, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                file_hash.update(chunk)
+
+        with self._lock:
+            self._file_hashes[filename] = (file_version, file_hash.hexdigest())
+
+        return file_hash.hexdigest()
+
+
+class CommunityCache(communities.CommunityCache):
+    @property
+    def directory(self) -> Optional[str]:
+        return self._directory if self._directory is not None else settings.COMMUNITY_CACHE_DIR
+
+
+analysis_cache = AnalysisCache()
+community_cache = CommunityCache()
@@ -1,6 +1,24 @@
 from django import forms
 
+from src.communities import ALGORITHMS_WITH_COMMUNITY_COUNT, COMMUNITY_ALGORITHMS
+
 
 class LogInForm(forms.Form):
     user = forms.CharField(max_length=255)
     password = forms.CharField(widget=forms.PasswordInput())
+    incremental = forms.BooleanField(
+        required=False, label="Only read again the friends that changed since the last scan"
+    )
+
+
+class CommunityDetectionForm(forms.Form):
+    algorithm = forms.ChoiceField(choices=[(name, name) for name in COMMUNITY_ALGORITHMS], initial="fluid")
+    num_communities = forms.IntegerField(required=False, min_value=1, max_value=12, label="Number of communities")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        algorithm = cleaned_data.get("algorithm")
+        if algorithm in ALGORITHMS_WITH_COMMUNITY_COUNT and cleaned_data.get("num_communities") is None:
+            self.add_error("num_communities", f"The algorithm {algorithm} needs the number of communities")
+
+        return cleaned_data
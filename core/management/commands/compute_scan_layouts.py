@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from core.models import ScanInstance
+
+
+class Command(BaseCommand):
+    help = 'Computes and stores the layout of the scan instances that do not have one'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Recompute the layout of scan instances that already have one",
+        )
+
+    def handle(self, *args, **options):
+        for scan in ScanInstance.objects.all():
+            self.stdout.write("Scan:")
+            self.stdout.write(f" user: {scan.user}")
+
+            if scan.layout is not None and not options["force"]:
+                self.stdout.write(" Layout already computed")
+                continue
+
+            if not scan.file or not Path(scan.file_path).exists():
+                self.stdout.write(" Missing file")
+                continue
+
+            scan.compute_layout()
+            scan.save()
+            self.stdout.write(" Layout computed")
+
+        self.stdout.write(self.style.SUCCESS("Successfully computed scan layouts"))
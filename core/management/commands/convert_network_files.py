@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.models import ScanInstance
+from src.friend_network import convert_network_file, NETWORK_FILE_EXTENSIONS
+from src.network_binary_file import BinaryNetworkFile
+
+
+class Command(BaseCommand):
+    help = 'Converts the network files of all scan instances to the given format'
+
+    def add_arguments(self, parser):
+        parser.add_argument("file_format", choices=list(NETWORK_FILE_EXTENSIONS))
+        parser.add_argument(
+            "--delete-originals",
+            action="store_true",
+            help="Delete the original network files once they have been converted",
+        )
+
+    def handle(self, *args, **options):
+        file_format = options["file_format"]
+        media_path = Path(settings.MEDIA_ROOT)
+
+        for scan in ScanInstance.objects.all():
+            self.stdout.write("Scan:")
+            self.stdout.write(f" user: {scan.user}")
+
+            file_path = media_path.joinpath(scan.file.name)
+            if not scan.file or not file_path.exists():
+                self.stdout.write(" Missing file")
+                continue
+
+            is_binary = BinaryNetworkFile.is_binary_network_file(file_path)
+            if is_binary == (file_format == "binary"):
+                self.stdout.write(" Already converted")
+                continue
+
+            converted_file_path = file_path.with_suffix(NETWORK_FILE_EXTENSIONS[file_format])
+            convert_network_file(str(file_path), str(converted_file_path), file_format)
+            scan.file.name = str(converted_file_path.relative_to(media_path))
+            scan.save()
+            self.stdout.write(f" Converted to {scan.file.name}")
+
+            if options["delete_originals"]:
+                file_path.unlink()
+
+        self.stdout.write(self.style.SUCCESS(f"Successfully converted network files to {file_format}"))
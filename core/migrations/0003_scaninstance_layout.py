@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20210707_1243'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scaninstance',
+            name='layout',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,27 @@
+from pathlib import Path
+
+from django.conf import settings
 from django.db import models
 
+from src.friend_network import FriendNetwork
+
 
 class ScanInstance(models.Model):
     datetime = models.DateTimeField(auto_now_add=True)
     user = models.CharField(max_length=255)
     file = models.FileField(upload_to="networks")
+    layout = models.JSONField(null=True, blank=True)
+
+    @property
+    def file_path(self):
+        return str(Path(settings.MEDIA_ROOT).joinpath(self.file.name))
+
+    def compute_layout(self):
+        network = FriendNetwork()
+        network.load_network(self.file_path)
+        network.filter_biggest_component()
+        network.compute_positions(seed=0)
+        self.layout = {node: position.tolist() for node, position in network.node_positions.items()}
 
 
 class LogEvent(models.Model):
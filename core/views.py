@@ -1,18 +1,19 @@
 import os
-from pathlib import Path
+import uuid
 
 from background_task import background
 from django.conf import settings
 from django.core.files import File
 from django.urls import reverse_lazy
 from django.views.generic import TemplateView, FormView
+import networkx as nx
 import plotly.offline as opy
-from networkx.algorithms.community import asyn_fluidc
 
-from core.forms import LogInForm
+from core.analysis_cache import analysis_cache, community_cache
+from core.forms import CommunityDetectionForm, LogInForm
 from core.models import LogEvent, ScanInstance
 from src.facebook_friend_network_scanner import FacebookFriendNetworkScanner
-from src.friend_network import FriendNetwork
+from src.friend_network import FriendNetwork, NETWORK_FILE_EXTENSIONS
 
 
 
@@ -27,13 +28,19 @@ class LogInView(FormView):
     success_url = reverse_lazy("scan")
 
     def form_valid(self, form):
-        scan_facebook_friend_network(form.cleaned_data["user"], form.cleaned_data["password"])
+        # The retries of the task get the same id, so only they resume the checkpoint of the scan
+        scan_facebook_friend_network(
+            form.cleaned_data["user"],
+            form.cleaned_data["password"],
+            form.cleaned_data["incremental"],
+            scan_id=uuid.uuid4().hex,
+        )
         LogEvent.objects.all().delete()
         return super().form_valid(form)
 
 
 @background(schedule=1)
-def scan_facebook_friend_network(user, password):
+def scan_facebook_friend_network(user, password, incremental=False, scan_id=None):
     def write_to_log(text):
         print(text)
         LogEvent.objects.create(
@@ -44,25 +51,74 @@ def scan_facebook_friend_network(user, password):
     def save_scan_results():
         print(settings.BASE_DIR)
         print(settings.MEDIA_ROOT)
+        file_format = settings.NETWORK_FILE_FORMAT
+        extension = NETWORK_FILE_EXTENSIONS[file_format]
         temporary_network_file_path = os.path.join(
-            settings.BASE_DIR, settings.MEDIA_ROOT, "temp", f"network_{user}.json"
+            settings.BASE_DIR, settings.MEDIA_ROOT, "temp", f"network_{user}{extension}"
         )
-        ffn.save_network(output_file_name=temporary_network_file_path)
-        with open(temporary_network_file_path) as file:
-            scan_instance.file = File(file, name=f"{user}.json")
+        ffn.save_network(output_file_name=temporary_network_file_path, file_format=file_format)
+        with open(temporary_network_file_path, "rb") as file:
+            scan_instance.file = File(file, name=f"{user}{extension}")
             scan_instance.save()
         os.remove(temporary_network_file_path)
 
+    def reuse_previous_scan():
+        if (
+                previous_scan_instance is None
+                or not previous_scan_instance.file
+                or not os.path.exists(previous_scan_instance.file_path)
+        ):
+            write_to_log("There is no previous scan. The whole network will be scanned")
+            return
+
+        write_to_log("Getting list of friends")
+        ffn.read_all_friends_from_graphql_api()
+
+        previous_network = FriendNetwork()
+        previous_network.load_network(previous_scan_instance.file_path)
+        number_of_reused_friends = ffn.reuse_mutual_friends(
+            previous_network.mutual_friends, refresh_fraction=settings.INCREMENTAL_SCAN_REFRESH_FRACTION
+        )
+        write_to_log(
+            f"Reusing the mutual friends of {number_of_reused_friends} of {len(ffn.friends)} friends "
+            f"from the scan of {previous_scan_instance.datetime:%Y-%m-%d %H:%M}"
+        )
+
+    # Every scan creates its instance before scanning, so the latest one may be a scan that failed or is running
+    previous_scan_instance = ScanInstance.objects.filter(user=user).exclude(file="").order_by("-datetime").first()
     scan_instance = ScanInstance.objects.create(user=user)
 
     write_to_log("Configuring scanner")
-    ffn = FacebookFriendNetworkScanner(user, password)
+    ffn = FacebookFriendNetworkScanner(user, password, browsers=settings.SCAN_BROWSERS)
 
-    write_to_log("Start scanning")
-    ffn.scan_network(notify=write_to_log)
+    os.makedirs(settings.SCAN_CHECKPOINT_DIR, exist_ok=True)
+    checkpoint_file = os.path.join(settings.SCAN_CHECKPOINT_DIR, f"{user}.jsonl")
+    ffn.resume_from_checkpoint(checkpoint_file, notify=write_to_log, scan_id=scan_id)
+
+    try:
+        if incremental:
+            reuse_previous_scan()
+
+        write_to_log("Start scanning")
+        ffn.scan_network(notify=write_to_log)
+    finally:
+        # scan_network closes the checkpoint, but the task can fail before it runs
+        ffn.close_checkpoint()
 
     write_to_log("Saving scan")
     save_scan_results()
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    # The network is already saved, so a failing layout must not make the task retry the whole scan. Scans without
+    # a layout compute it when they are analyzed
+    write_to_log("Computing layout")
+    try:
+        scan_instance.compute_layout()
+    except Exception as error:
+        write_to_log(f"The layout could not be computed: {error!r}")
+    else:
+        scan_instance.save()
 
     write_to_log("Scan has finished")
 
@@ -98,14 +154,7 @@ class AnalysisView(TemplateView):
     template_name = "core/analysis.html"
 
     def get(self, request, *args, **kwargs):
-        instance = ScanInstance.objects.get(pk=kwargs["pk"])
-
-        filename = str(Path(settings.MEDIA_ROOT).joinpath(instance.file.name))
-
-        fn = FriendNetwork()
-        fn.load_network(filename)
-        fn.filter_biggest_component()
-        fn.compute_positions(seed=0)
+        fn = self.get_network(kwargs["pk"])
 
         fig = fn.draw_graph_plotly()
         div = opy.plot(fig, auto_open=False, output_type="div")
@@ -116,21 +165,45 @@ class AnalysisView(TemplateView):
         return self.render_to_response(context)
 
     def post(self, request, *args, **kwargs):
-        instance = ScanInstance.objects.get(pk=kwargs["pk"])
+        fn = self.get_network(kwargs["pk"])
 
-        filename = str(Path(settings.MEDIA_ROOT).joinpath(instance.file.name))
-
-        fn = FriendNetwork()
-        fn.load_network(filename)
-        fn.filter_biggest_component()
-        fn.compute_positions(seed=0)
-
-        community_division = list(asyn_fluidc(fn.graph, int(request.POST["num_communities"])))
-        fig = fn.draw_graph_plotly(communities=community_division)
+        form = CommunityDetectionForm(request.POST)
+        community_division = self.detect_communities(fn, form) if form.is_valid() else None
+        if community_division is not None:
+            fig = fn.draw_graph_plotly(communities=community_division)
+        else:
+            fig = fn.draw_graph_plotly()
 
         div = opy.plot(fig, auto_open=False, output_type="div")
 
-        context = self.get_context_data(**kwargs)
+        context = self.get_context_data(form=form, **kwargs)
         context["graph"] = div
 
         return self.render_to_response(context)
+
+    @staticmethod
+    def detect_communities(fn: FriendNetwork, form: CommunityDetectionForm):
+        # The form cannot know the size of the network, so the errors that depend on it are added here
+        num_communities = form.cleaned_data["num_communities"]
+        number_of_friends = fn.graph.number_of_nodes()
+        if num_communities is not None and num_communities > number_of_friends:
+            form.add_error("num_communities", f"The network only has {number_of_friends} friends")
+            return None
+
+        try:
+            return fn.detect_communities(
+                form.cleaned_data["algorithm"], num_communities, seed=0, cache=community_cache
+            )
+        except nx.NetworkXError as error:
+            form.add_error(None, f"The communities could not be detected: {error}")
+            return None
+
+    def get_context_data(self, **kwargs):
+        kwargs.setdefault("form", CommunityDetectionForm())
+        return super().get_context_data(**kwargs)
+
+    @staticmethod
+    def get_network(pk) -> FriendNetwork:
+        instance = ScanInstance.objects.get(pk=pk)
+
+        return analysis_cache.get_network(instance.pk, instance.file_path, layout=instance.layout)
@@ -127,4 +127,22 @@ STATICFILES_DIRS = [
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
 
+# Format of the network files of new scans: "json" or "binary"
+NETWORK_FILE_FORMAT = "json"
+
+# Memory budget of the networks prepared for analysis that are kept between requests
+ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Directory where detected communities are stored, so that they are shared between processes and restarts
+COMMUNITY_CACHE_DIR = os.path.join(BASE_DIR, "cache", "communities")
+
+# Directory where the progress of running scans is saved, so that a failed scan is resumed when it is retried
+SCAN_CHECKPOINT_DIR = os.path.join(BASE_DIR, "cache", "scans")
+
+# Number of browsers that read the profile pages of the friends at the same time during a scan
+SCAN_BROWSERS = 1
+
+# Fraction of the friends of the last scan whose mutual friends are read again in incremental scans
+INCREMENTAL_SCAN_REFRESH_FRACTION = 0.1
+
 DEFAULT_AUTO_FIELD='django.db.models.AutoField'
@@ -0,0 +1,53 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+
+# Runs a function over many items with a fixed set of browsers. Every browser is driven by its own thread, which pulls
+# the next item from a shared queue when it is free, so slow pages do not block the rest of the browsers.
+class BrowserPool(object):
+    def __init__(self, drivers: List):
+        self.drivers = drivers
+
+    def map_unordered(self, function: Callable, items: Iterable) -> Iterator[Tuple]:
+        items = list(items)
+        pending_items: queue.Queue[Any] = queue.Queue()
+        for item in items:
+            pending_items.put(item)
+
+        results: queue.Queue[Tuple[Any, Any, Optional[Exception]]] = queue.Queue()
+        stopped = threading.Event()
+
+        workers = [
+            threading.Thread(
+                target=self._work, args=(driver, function, pending_items, results, stopped), daemon=True
+            )
+            for driver in self.drivers
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            for _ in items:
+                item, result, error = results.get()
+                if error is not None:
+                    raise error
+                yield item, result
+        finally:
+            # Browsers finish the page they are reading, but do not start new ones
+            stopped.set()
+            for worker in workers:
+                worker.join()
+
+    @staticmethod
+    def _work(driver, function: Callable, pending_items: queue.Queue, results: queue.Queue, stopped: threading.Event):
+        while not stopped.is_set():
+            try:
+                item = pending_items.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                results.put((item, function(driver, item), None))
+            except Exception as error:
+                results.put((item, None, error))
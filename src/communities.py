@@ -0,0 +1,405 @@
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import networkx as nx
+from networkx.algorithms import community
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+
+
+def _fluid(graph: nx.Graph, k: Optional[int], seed: Optional[int]):
+    if k is None:
+        raise ValueError("Fluid communities need the number of communities")
+
+    return community.asyn_fluidc(graph, k, seed=seed)
+
+
+def _louvain(graph: nx.Graph, k: Optional[int], seed: Optional[int]):
+    return community.louvain_communities(graph, seed=seed)
+
+
+def _label_propagation(graph: nx.Graph, k: Optional[int], seed: Optional[int]):
+    return community.asyn_lpa_communities(graph, seed=seed)
+
+
+def _greedy_modularity(graph: nx.Graph, k: Optional[int], seed: Optional[int]):
+    if k is None:
+        return community.greedy_modularity_communities(graph)
+
+    return community.greedy_modularity_communities(graph, cutoff=k, best_n=k)
+
+
+COMMUNITY_ALGORITHMS: Dict[str, Callable] = dict(
+    fluid=_fluid,
+    louvain=_louvain,
+    label_propagation=_label_propagation,
+    greedy_modularity=_greedy_modularity,
+)
+ALGORITHMS_WITH_COMMUNITY_COUNT = ("fluid", "greedy_modularity")
+DENSE_EIGENSOLVER_MAX_NODES = 64
+# Only the order of the nodes along the Fiedler vector is used, which converges long before the vector itself
+EIGENSOLVER_TOLERANCE = 1e-3
+
+
+def detect_communities(graph: nx.Graph, algorithm="fluid", k: Optional[int] = None, seed=None) -> List[Set]:
+    if algorithm not in COMMUNITY_ALGORITHMS:
+        raise ValueError(f"Unknown community detection algorithm '{algorithm}'")
+
+    return _sort_communities(set(nodes) for nodes in COMMUNITY_ALGORITHMS[algorithm](graph, k, seed))
+
+
+def community_dendrogram(graph: nx.Graph, max_communities: int, seed=None) -> Dict[int, List[Set]]:
+    # Recursive spectral bisection: the community whose best split gains more modularity is split next, so every
+    # division refines the previous one, like the ones of girvan_newman
+    nodes = list(graph.nodes)
+    adjacency = nx.to_scipy_sparse_array(graph, nodelist=nodes, format="csr", dtype=float)
+    adjacency.data[:] = 1
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    number_of_edges = max(graph.number_of_edges(), 1)
+
+    communities: List[Optional[np.ndarray]] = []
+    splits: List[Tuple[float, int, np.ndarray, np.ndarray]] = []
+
+    def add_community(community: np.ndarray):
+        communities.append(community)
+        split = _bisect(adjacency[community][:, community], degrees[community], number_of_edges, seed)
+        if split is not None:
+            gain, first, second = split
+            heapq.heappush(splits, (-gain, len(communities) - 1, community[first], community[second]))
+
+    _, component_labels = scipy.sparse.csgraph.connected_components(adjacency, directed=False)
+    for component in _group_by_label(component_labels):
+        add_community(component)
+
+    dendrogram = {}
+    while True:
+        number_of_communities = len(communities) - sum(community is None for community in communities)
+        if 2 <= number_of_communities <= max_communities:
+            dendrogram[number_of_communities] = _sort_communities(
+                {nodes[position] for position in community} for community in communities if community is not None
+            )
+        if number_of_communities >= max_communities or not splits:
+            break
+
+        _, index, first, second = heapq.heappop(splits)
+        communities[index] = None
+        add_community(first)
+        add_community(second)
+
+    return dendrogram
+
+
+def balanced_partition(graph: nx.Graph, min_size: int, max_size: int, seed=None, max_passes=10) -> List[Set]:
+    # Groups (tables) whose sizes are between min_size and max_size, with as many edges inside them as possible. They
+    # come from recursive spectral bisection with sizes that keep every half feasible, refined by moving and swapping
+    # nodes between groups, in the spirit of Kernighan-Lin
+    if min_size < 1 or min_size > max_size:
+        raise ValueError("Group sizes must satisfy 1 <= min_size <= max_size")
+
+    nodes = list(graph.nodes)
+    if len(nodes) == 0:
+        return []
+
+    min_groups, max_groups = -(-len(nodes) // max_size), len(nodes) // min_size
+    if min_groups > max_groups:
+        raise ValueError(f"{len(nodes)} nodes cannot be divided into groups of {min_size} to {max_size}")
+    number_of_groups = min(max(round(2 * len(nodes) / (min_size + max_size)), min_groups), max_groups)
+
+    adjacency = nx.to_scipy_sparse_array(graph, nodelist=nodes, format="csr", dtype=float)
+    adjacency.data[:] = 1
+
+    groups = _split_balanced(adjacency, np.arange(len(nodes)), number_of_groups, min_size, max_size, seed)
+    labels = np.empty(len(nodes), dtype=np.int64)
+    for label, group in enumerate(groups):
+        labels[group] = label
+
+    _refine_balanced_partition(adjacency, labels, min_size, max_size, np.random.default_rng(seed), max_passes)
+
+    return _sort_communities({nodes[position] for position in group} for group in _group_by_label(labels))
+
+
+def _split_balanced(adjacency, positions: np.ndarray, number_of_groups, min_size, max_size, seed) -> List[np.ndarray]:
+    if number_of_groups == 1:
+        return [positions]
+
+    first_groups = number_of_groups // 2
+    second_groups = number_of_groups - first_groups
+    smallest_first_size = max(first_groups * min_size, len(positions) - second_groups * max_size)
+    biggest_first_size = min(first_groups * max_size, len(positions) - second_groups * min_size)
+
+    subgraph_adjacency = adjacency[positions][:, positions]
+    order = _spectral_order(subgraph_adjacency, seed)
+
+    # Cheapest cut among the sizes that leave both halves feasible, the most proportional one in case of a tie
+    first_sizes = np.arange(smallest_first_size, biggest_first_size + 1)
+    cut_sizes = np.append(_get_sweep_cut_sizes(subgraph_adjacency, order), 0)[first_sizes - 1]
+    imbalances = np.abs(first_sizes - len(positions) * first_groups / number_of_groups)
+    first_size = first_sizes[np.lexsort((imbalances, cut_sizes))[0]]
+
+    return (
+        _split_balanced(adjacency, positions[order[:first_size]], first_groups, min_size, max_size, seed)
+        + _split_balanced(adjacency, positions[order[first_size:]], second_groups, min_size, max_size, seed)
+    )
+
+
+def _spectral_order(adjacency, seed) -> np.ndarray:
+    # Connected components one after the other, the nodes of each one sorted by its Fiedler vector
+    _, component_labels = scipy.sparse.csgraph.connected_components(adjacency, directed=False)
+    orders = []
+    for component in _group_by_label(component_labels):
+        if len(component) > 2:
+            component = component[np.argsort(_fiedler_vector(adjacency[component][:, component], seed), kind="stable")]
+        orders.append(component)
+
+    return np.concatenate(orders)
+
+
+def _refine_balanced_partition(adjacency, labels: np.ndarray, min_size, max_size, random_generator, max_passes):
+    sizes = np.bincount(labels)
+    members = [set(group.tolist()) for group in _split_by_label(labels, len(sizes))]
+
+    for _ in range(max_passes):
+        improved = False
+        for node in random_generator.permutation(len(labels)).tolist():
+            own_label = labels[node]
+            ties = _get_ties(adjacency, labels, node)
+            own_ties = ties.get(own_label, 0)
+
+            for label, label_ties in sorted(ties.items(), key=lambda item: -item[1]):
+                if label_ties <= own_ties:
+                    break
+
+                if sizes[own_label] > min_size and sizes[label] < max_size:
+                    _move(labels, members, sizes, node, label)
+                    improved = True
+                    break
+
+                # The sizes do not allow the move, so the node is swapped with the member that loses less by leaving
+                partner = _find_swap_partner(adjacency, labels, node, members[label], label_ties - own_ties)
+                if partner is not None:
+                    _move(labels, members, sizes, node, label)
+                    _move(labels, members, sizes, partner, own_label)
+                    improved = True
+                    break
+
+        if not improved:
+            break
+
+
+def _get_ties(adjacency, labels: np.ndarray, node) -> Dict[int, int]:
+    neighbors = adjacency.indices[adjacency.indptr[node]:adjacency.indptr[node + 1]]
+    ties: Dict[int, int] = {}
+    for label in labels[neighbors].tolist():
+        ties[label] = ties.get(label, 0) + 1
+    return ties
+
+
+def _find_swap_partner(adjacency, labels: np.ndarray, node, candidates: Set[int], node_gain) -> Optional[int]:
+    own_label = labels[node]
+    neighbors = set(adjacency.indices[adjacency.indptr[node]:adjacency.indptr[node + 1]].tolist())
+
+    best_partner, best_gain = None, 0
+    for partner in candidates:
+        partner_ties = _get_ties(adjacency, labels, partner)
+        are_friends = partner in neighbors
+        gain = node_gain + partner_ties.get(own_label, 0) - partner_ties.get(labels[partner], 0) - 2 * are_friends
+        if gain > best_gain:
+            best_partner, best_gain = partner, gain
+
+    return best_partner
+
+
+def _move(labels: np.ndarray, members: List[Set[int]], sizes: np.ndarray, node, label):
+    members[labels[node]].remove(node)
+    sizes[labels[node]] -= 1
+    labels[node] = label
+    members[label].add(node)
+    sizes[label] += 1
+
+
+def _split_by_label(labels: np.ndarray, number_of_labels: int) -> List[np.ndarray]:
+    order = np.argsort(labels, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(labels, minlength=number_of_labels))[:-1])
+
+
+def _bisect(adjacency, degrees, number_of_edges: int, seed) -> Optional[Tuple[float, np.ndarray, np.ndarray]]:
+    if len(degrees) < 2:
+        return None
+
+    number_of_components, component_labels = scipy.sparse.csgraph.connected_components(adjacency, directed=False)
+    if number_of_components == 1:
+        order = np.argsort(_fiedler_vector(adjacency, seed), kind="stable")
+    else:
+        order = np.concatenate(_group_by_label(component_labels))
+
+    # Sweep cut along the order: the first t nodes against the rest, choosing the t that gains more modularity
+    cut_sizes = _get_sweep_cut_sizes(adjacency, order)
+    first_degrees = np.cumsum(degrees[order])[:-1]
+    second_degrees = degrees.sum() - first_degrees
+    gains = -cut_sizes / number_of_edges + first_degrees * second_degrees / (2 * number_of_edges ** 2)
+
+    in_first = np.zeros(len(order), dtype=bool)
+    in_first[order[:int(np.argmax(gains)) + 1]] = True
+    gain, in_first = _refine_bisection(adjacency, degrees, in_first, number_of_edges)
+
+    return gain, np.flatnonzero(in_first), np.flatnonzero(~in_first)
+
+
+def _refine_bisection(adjacency, degrees, in_first: np.ndarray, number_of_edges: int, max_passes=10):
+    # Moves at once every node that has more ties with the other side than with its own, while that improves the split
+    def get_gain(in_first):
+        first_degree = degrees[in_first].sum()
+        cut_size = adjacency[in_first][:, ~in_first].sum()
+        return -cut_size / number_of_edges + first_degree * (degrees.sum() - first_degree) / (2 * number_of_edges ** 2)
+
+    gain = get_gain(in_first)
+    for _ in range(max_passes):
+        ties_with_first = adjacency @ in_first.astype(float)
+        ties_with_second = np.asarray(adjacency.sum(axis=1)).ravel() - ties_with_first
+        ties_with_own_side = np.where(in_first, ties_with_first, ties_with_second)
+        ties_with_other_side = np.where(in_first, ties_with_second, ties_with_first)
+
+        own_side_degree = np.where(in_first, degrees[in_first].sum(), degrees[~in_first].sum())
+        move_gains = (ties_with_other_side - ties_with_own_side) / number_of_edges + degrees * (
+            2 * own_side_degree - degrees.sum() - degrees
+        ) / (2 * number_of_edges ** 2)
+
+        moved_in_first = in_first ^ (move_gains > 0)
+        if not moved_in_first.any() or moved_in_first.all():
+            break
+
+        moved_gain = get_gain(moved_in_first)
+        if moved_gain <= gain:
+            break
+
+        gain, in_first = moved_gain, moved_in_first
+
+    return float(gain), in_first
+
+
+def _get_sweep_cut_sizes(adjacency, order: np.ndarray) -> np.ndarray:
+    # Number of edges between the first t nodes of the order and the rest, for t = 1..n-1
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order))
+    rows, columns = scipy.sparse.triu(adjacency).nonzero()
+    first_ranks, last_ranks = np.minimum(ranks[rows], ranks[columns]), np.maximum(ranks[rows], ranks[columns])
+    cut_changes = np.bincount(first_ranks + 1, minlength=len(order) + 1) - np.bincount(
+        last_ranks + 1, minlength=len(order) + 1
+    )
+    return np.cumsum(cut_changes)[1:-1]
+
+
+def _fiedler_vector(adjacency, seed) -> np.ndarray:
+    # Second eigenvector of D^-1/2 A D^-1/2, that is the Fiedler vector of the normalized laplacian. Lanczos only needs
+    # sparse products, which is much faster than nx.fiedler_vector on big communities
+    inverse_sqrt_degrees = 1 / np.sqrt(np.asarray(adjacency.sum(axis=1)).ravel())
+    degree_normalization = scipy.sparse.diags(inverse_sqrt_degrees)
+    normalized_adjacency = degree_normalization @ adjacency @ degree_normalization
+
+    if len(inverse_sqrt_degrees) <= DENSE_EIGENSOLVER_MAX_NODES:
+        _, vectors = np.linalg.eigh(normalized_adjacency.toarray())
+        return vectors[:, -2] * inverse_sqrt_degrees
+
+    start_vector = np.random.default_rng(seed).random(len(inverse_sqrt_degrees))
+    values, vectors = scipy.sparse.linalg.eigsh(
+        normalized_adjacency, k=2, which="LA", v0=start_vector, tol=EIGENSOLVER_TOLERANCE
+    )
+    return vectors[:, np.argmin(values)] * inverse_sqrt_degrees
+
+
+def _group_by_label(labels: np.ndarray) -> List[np.ndarray]:
+    # Groups of positions with the same label, biggest first
+    order = np.argsort(labels, kind="stable")
+    groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+    return sorted(groups, key=len, reverse=True)
+
+
+def _sort_communities(communities: Iterable[Set]) -> List[Set]:
+    # Biggest communities first, so that they keep their colors between algorithms
+    return sorted(communities, key=lambda nodes: (-len(nodes), min(map(str, nodes))))
+
+
+def graph_fingerprint(graph: nx.Graph) -> str:
+    fingerprint = hashlib.sha256()
+    for node in sorted(map(str, graph.nodes)):
+        fingerprint.update(f"{node}\n".encode("utf-8"))
+
+    fingerprint.update(b"\n")
+    for a, b in sorted(tuple(sorted((str(a), str(b)))) for a, b in graph.edges):
+        fingerprint.update(f"{a}\t{b}\n".encode("utf-8"))
+
+    return fingerprint.hexdigest()
+
+
+class CommunityCache(object):
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._entries: Dict[Tuple[str, str, Optional[int], Optional[int]], List[Set]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Optional[str]:
+        return self._directory
+
+    def get_communities(
+            self, graph: nx.Graph, algorithm="fluid", k: Optional[int] = None, seed=None, fingerprint=None
+    ) -> List[Set]:
+        if algorithm not in ALGORITHMS_WITH_COMMUNITY_COUNT:
+            k = None
+        key = (fingerprint or graph_fingerprint(graph), algorithm, k, seed)
+
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+
+        communities = self._load(key)
+        if communities is None:
+            communities = detect_communities(graph, algorithm, k, seed)
+            self._save(key, communities)
+
+        with self._lock:
+            self._entries[key] = communities
+
+        return communities
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self, key) -> Optional[List[Set]]:
+        filename = self._get_filename(key)
+        if filename is None or not os.path.exists(filename):
+            return None
+
+        with open(filename, "r") as file:
+            return [set(nodes) for nodes in json.load(file)]
+
+    def _save(self, key, communities: List[Set]):
+        filename = self._get_filename(key)
+        if filename is None:
+            return
+
+        directory = os.path.dirname(filename)
+        os.makedirs(directory, exist_ok=True)
+        # Written to a temporary file first, so that other processes never read a half written result
+        file_descriptor, temporary_filename = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "w") as file:
+            json.dump([sorted(nodes, key=str) for nodes in communities], file)
+        os.replace(temporary_filename, filename)
+
+    def _get_filename(self, key) -> Optional[str]:
+        if self.directory is None:
+            return None
+
+        fingerprint, algorithm, k, seed = key
+        return os.path.join(self.directory, f"{fingerprint}-{algorithm}-{k}-{seed}.json")
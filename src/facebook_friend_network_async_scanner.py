@@ -0,0 +1,157 @@
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from src import facebook_graphql
+from src.friend import Friend
+from src.friend_network import save_network_file
+from src.graphql_client import AdaptiveLimits, GraphQLClient, parse_response, RetryPolicy
+from src.rate_limiter import RateLimiter
+
+
+class AsyncFacebookFriendNetworkGraphQLScanner(object):
+    GRAPHQL_URL = facebook_graphql.GRAPHQL_URL
+    DOC_IDS = facebook_graphql.MUTUAL_FRIENDS_DOC_IDS
+    CONCURRENCY = 10
+
+    def __init__(
+            self,
+            cookies: Dict[str, str],
+            fb_dtsg_token: str,
+            concurrency=CONCURRENCY,
+            rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.friends: List[Friend] = []
+        self.mutual_friends: Dict[str, List[Friend]] = {}
+
+        self.cookies = cookies
+        self.concurrency = concurrency
+
+        self._fb_dtsg_token = fb_dtsg_token
+        self._friend_list_page_info: dict = dict(has_next_page=True, end_cursor=None)
+        self._mutual_friends_list_page_info: Dict[str, dict] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        # The semaphore of the scan bounds the friends that are read at the same time, and the limits adapt the requests
+        # in flight, the size of the pages and the rate below it
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.limits = AdaptiveLimits(concurrency, rate_limiter=self.rate_limiter)
+        self.retry_policy = RetryPolicy(self.rate_limiter, self.limits)
+
+    @classmethod
+    def from_scanner(cls, scanner, **kwargs) -> "AsyncFacebookFriendNetworkGraphQLScanner":
+        # The requests of both scanners share the rate limit of the Facebook account
+        kwargs.setdefault("rate_limiter", scanner.rate_limiter)
+        return cls(scanner.session.cookies.get_dict(), scanner._fb_dtsg_token, **kwargs)
+
+    @property
+    def max_retries(self) -> int:
+        return self.retry_policy.max_retries
+
+    @max_retries.setter
+    def max_retries(self, max_retries: int):
+        self.retry_policy.max_retries = max_retries
+
+    async def __aenter__(self) -> "AsyncFacebookFriendNetworkGraphQLScanner":
+        # A single client keeps the connections alive for every request
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=GraphQLClient.TIMEOUT)
+        self._session = aiohttp.ClientSession(cookies=self.cookies, connector=connector, timeout=timeout)
+        return self
+
+    async def __aexit__(self, *_):
+        await self._session.close()
+        self._session = None
+
+    async def scan_network(self, notify: Optional[Callable] = None):
+        if self._session is None:
+            async with self:
+                return await self.scan_network(notify)
+
+        def do_nothing(_):
+            pass
+
+        if notify is None:
+            notify = do_nothing
+
+        notify("Getting list of friends")
+        await self.read_all_friends_from_graphql_api()
+
+        notify("Start reading mutual connections between your friends")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [
+            asyncio.create_task(self._read_mutual_friends_with_semaphore(friend, semaphore))
+            for friend in self.friends
+        ]
+
+        try:
+            for i, task in enumerate(asyncio.as_completed(tasks), start=1):
+                friend = await task
+                notify(
+                    f"Read {len(self.mutual_friends[friend.user_id])} mutual friends with {friend.name}. "
+                    f"({i} of {len(self.friends)})"
+                )
+        finally:
+            # When the scan is cancelled or fails, the pending requests are cancelled too
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.mutual_friends = {friend.user_id: self.mutual_friends[friend.user_id] for friend in self.friends}
+
+        notify("Finished scanning network")
+
+    def save_network(self, output_file_name, file_format="json"):
+        save_network_file(output_file_name, self.friends, self.mutual_friends, file_format)
+
+    async def read_all_friends_from_graphql_api(self):
+        while self._friend_list_page_info["has_next_page"]:
+            api_info = await self._get_next_batch_of_friends_api_info()
+            friends, self._friend_list_page_info = facebook_graphql.parse_friend_list(api_info)
+            self.friends += friends
+
+    async def read_mutual_friends_from_graphql_api(self, friend_id):
+        self.mutual_friends[friend_id] = []
+        self._mutual_friends_list_page_info[friend_id] = dict(has_next_page=True, end_cursor=None)
+
+        while self._mutual_friends_list_page_info[friend_id]["has_next_page"]:
+            api_info = await self._get_next_batch_of_mutual_friends_api_info(friend_id)
+            mutual_friends, self._mutual_friends_list_page_info[friend_id] = facebook_graphql.parse_mutual_friends(
+                api_info
+            )
+            self.mutual_friends[friend_id] += mutual_friends
+
+    async def _read_mutual_friends_with_semaphore(self, friend: Friend, semaphore: asyncio.Semaphore) -> Friend:
+        async with semaphore:
+            await self.read_mutual_friends_from_graphql_api(friend.user_id)
+
+        return friend
+
+    async def _get_next_batch_of_friends_api_info(self) -> dict:
+        headers, data = facebook_graphql.get_friend_list_request(
+            self._fb_dtsg_token,
+            self._friend_list_page_info["end_cursor"],
+            self.limits.page_size(facebook_graphql.FRIEND_LIST_PAGE_SIZE),
+        )
+        return await self._post(headers, data)
+
+    async def _get_next_batch_of_mutual_friends_api_info(self, friend_id) -> dict:
+        headers, data = facebook_graphql.get_mutual_friends_request(
+            self._fb_dtsg_token,
+            friend_id,
+            self._mutual_friends_list_page_info[friend_id]["end_cursor"],
+            self.DOC_IDS,
+            self.limits.page_size(facebook_graphql.MUTUAL_FRIENDS_PAGE_SIZE),
+        )
+        return await self._post(headers, data)
+
+    async def _post(self, headers, data) -> dict:
+        session = self._session
+        if session is None:
+            raise RuntimeError("Requests can only be made inside 'async with scanner' or while a scan is running")
+
+        async def send() -> dict:
+            async with session.post(self.GRAPHQL_URL, headers=headers, data=data) as response:
+                return parse_response(response.status, await response.read(), response.headers.get("Retry-After"))
+
+        return await self.retry_policy.call_async(send, (aiohttp.ClientError, asyncio.TimeoutError))
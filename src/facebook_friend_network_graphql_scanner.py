@@ -1,95 +1,158 @@
-import json
-import urllib
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
 
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import facebook_graphql
 from src.facebook_friend_network_scanner import FacebookFriendNetworkScanner
-from src.friend import Friend
+from src.graphql_client import AdaptiveLimits, GraphQLClient, GraphQLError
+from src.rate_limiter import RateLimiter
+from src.session_store import SessionStore
 
 
 class FacebookFriendNetworkGraphQLScanner(FacebookFriendNetworkScanner):
-    def __init__(self, user, password):
+    CONCURRENCY = 1
+
+    def __init__(self, user, password, concurrency=CONCURRENCY, max_requests_per_second=None):
         super().__init__(user, password)
+        self._configure_requests(concurrency, max_requests_per_second)
+
+    @classmethod
+    def from_session(
+            cls, cookies: Dict[str, str], fb_dtsg_token, concurrency=CONCURRENCY, max_requests_per_second=None
+    ) -> "FacebookFriendNetworkGraphQLScanner":
+        # The GraphQL API only needs the cookies and token of a logged-in session, so no browser is opened
+        scanner = cls.__new__(cls)
+        scanner._initialize_scan()
+        scanner.driver = None
+        scanner.session = requests.session()
+        scanner.session.cookies.update(cookies)
+        scanner._fb_dtsg_token = fb_dtsg_token
+        scanner._configure_requests(concurrency, max_requests_per_second)
+        return scanner
+
+    @classmethod
+    def log_in(
+            cls, user, password, session_store: Optional[SessionStore] = None, **kwargs
+    ) -> "FacebookFriendNetworkGraphQLScanner":
+        if session_store is not None:
+            stored_session = session_store.load(user, password)
+            if stored_session is not None:
+                scanner = cls.from_session(stored_session.cookies, stored_session.fb_dtsg_token, **kwargs)
+                if scanner.session_is_alive():
+                    return scanner
+
+                session_store.delete(user)
+
+        scanner = cls(user, password, **kwargs)
+        if session_store is not None:
+            session_store.save(user, password, scanner.session.cookies.get_dict(), scanner._fb_dtsg_token)
+
+        return scanner
+
+    def session_is_alive(self) -> bool:
+        # Facebook answers with an error or a login page instead of the friend list when the session has expired
+        headers, data = facebook_graphql.get_friend_list_request(self._fb_dtsg_token, None)
+        try:
+            facebook_graphql.parse_friend_list(self.graphql_client.post(headers, data))
+        except (requests.RequestException, GraphQLError, KeyError, TypeError):
+            return False
+
+        return True
+
+    def _configure_requests(self, concurrency, max_requests_per_second):
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(max_requests_per_second or self.MAX_REQUESTS_PER_SECOND)
+        self.graphql_client = GraphQLClient(
+            self.session, self.rate_limiter, AdaptiveLimits(concurrency, self.rate_limiter), url=self.GRAPHQL_URL
+        )
+
+        # One keep-alive connection per worker thread, all of them sharing the cookies of the session
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(concurrency, 10))
+        self.session.mount("https://", adapter)
+
+    def scan_network(self, notify: Optional[Callable] = print, checkpoint_file=None):
+        def do_nothing(_):
+            pass
+
+        if notify is None:
+            notify = do_nothing
 
-    def scan_network(self):
-        self.read_all_friends_from_graphql_api()
+        if checkpoint_file is not None:
+            self.resume_from_checkpoint(checkpoint_file, notify)
 
-        for i, friend in enumerate(self.friends, start=1):
-            print(f"Reading mutual friends with {friend.name}. ({i} of {len(self.friends)})")
-            self.read_mutual_friends_from_graphql_api(friend.user_id)
-            print(f"  Number of mutual friends: {len(self.mutual_friends[friend.user_id])}")
+        try:
+            self.read_all_friends_from_graphql_api()
+            self._read_mutual_friends_of_all_friends(notify)
+        finally:
+            self.close_checkpoint()
+
+        self._add_new_mutual_friends_to_reused_friends()
+
+    def _read_mutual_friends_of_all_friends(self, notify: Callable):
+        friends_to_read = [friend for friend in self.friends if friend.user_id not in self._scanned_friend_ids]
+
+        if self.concurrency <= 1:
+            for i, friend in enumerate(friends_to_read, start=1):
+                notify(f"Reading mutual friends with {friend.name}. ({i} of {len(friends_to_read)})")
+                self.read_mutual_friends_from_graphql_api(friend.user_id)
+                self._mark_as_scanned(friend.user_id)
+                notify(f"  Number of mutual friends: {len(self.mutual_friends[friend.user_id])}")
+        else:
+            # Pages of one friend are read one after the other, but many friends are read at the same time
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = {
+                    executor.submit(self.read_mutual_friends_from_graphql_api, friend.user_id): friend
+                    for friend in friends_to_read
+                }
+                try:
+                    for i, future in enumerate(as_completed(futures), start=1):
+                        future.result()
+                        friend = futures[future]
+                        self._mark_as_scanned(friend.user_id)
+                        notify(
+                            f"Read {len(self.mutual_friends[friend.user_id])} mutual friends with {friend.name}. "
+                            f"({i} of {len(friends_to_read)})"
+                        )
+                finally:
+                    # When a friend fails, the friends that are not being read yet are not read, since leaving the
+                    # executor waits for every submitted friend
+                    for future in futures:
+                        future.cancel()
+
+        # Friends that were resumed or reused are read in a different order than the friend list
+        self.mutual_friends = {friend.user_id: self.mutual_friends[friend.user_id] for friend in self.friends}
 
     def read_mutual_friends_from_graphql_api(self, friend_id):
-        self.mutual_friends[friend_id] = []
-        self._mutual_friends_list_page_info[friend_id] = dict(has_next_page=True, end_cursor=None)
+        # A friend whose pages were partly read before the scan was resumed continues from its last cursor
+        if not self._mutual_friends_list_page_info.get(friend_id, {}).get("has_next_page"):
+            self.mutual_friends[friend_id] = []
+            self._mutual_friends_list_page_info[friend_id] = dict(has_next_page=True, end_cursor=None)
 
         while self._mutual_friends_list_page_info[friend_id]["has_next_page"]:
             self._read_next_batch_of_mutual_friends(friend_id)
 
     def _read_next_batch_of_mutual_friends(self, friend_id):
+        cursor = self._mutual_friends_list_page_info[friend_id]["end_cursor"]
         api_info = self._get_next_batch_of_mutual_friends_api_info(friend_id)
-        api_info_dict = json.loads(api_info)
-
-        self.mutual_friends[friend_id] += self._mutual_friends_api_info_to_friend_list(api_info_dict)
-        self._mutual_friends_list_page_info[friend_id] = (
-            api_info_dict["data"]["profile_list"]["list_items"]["page_info"]
+        mutual_friends, self._mutual_friends_list_page_info[friend_id] = facebook_graphql.parse_mutual_friends(
+            api_info
         )
 
-    def _get_next_batch_of_mutual_friends_api_info(self, friend_id):
-        url = 'https://www.facebook.com/api/graphql/'
-        headers = {
-            "accept": "*/*",
-            "accept-language": "es-ES,es;q=0.9",
-            "content-type": "application/x-www-form-urlencoded",
-            "sec-ch-ua": "\" Not;A Brand\";v=\"99\", \"Google Chrome\";v=\"91\", \"Chromium\";v=\"91\"",
-            "sec-ch-ua-mobile": "?0",
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-origin",
-            "x-fb-friendly-name": "CometProfileListDialogQuery",
-            "referrer": "https://www.facebook.com/friends/list",
-            "referrerPolicy": "strict-origin-when-cross-origin",
-        }
-
-        cursor = self._mutual_friends_list_page_info[friend_id]["end_cursor"]
-        is_first_request = cursor is None
-
-        response = self.session.post(
-            url,
-            headers=headers,
-            data=urllib.parse.urlencode(
-                {
-                    "fb_dtsg": self._fb_dtsg_token,
-                    "fb_api_req_friendly_name": (
-                        "CometProfileListDialogQuery" if is_first_request
-                        else "CometProfileListDialogListRefetchQuery"
-                    ),
-                    "variables": json.dumps(
-                        {key: value for key, value in {
-                            "listType": "MUTUAL_FRIENDS",
-                            "sourceID": friend_id,
-                            "scale": 1 if is_first_request else 1.5,
-                            "cursor": cursor,
-                            "count": None if is_first_request else 10,
-                        }.items() if value}
-                    ).replace(" ", ""),
-                    "doc_id": (
-                        self.DOC_IDS["mutual_friends_page_1"] if is_first_request
-                        else self.DOC_IDS["mutual_friends_next_pages"]
-                    )
-                }
+        self.mutual_friends[friend_id] += mutual_friends
+        if self.checkpoint is not None:
+            self.checkpoint.record_mutual_friends_page(
+                friend_id, mutual_friends, cursor, self._mutual_friends_list_page_info[friend_id]
             )
-        )
 
-        return response.content
+    def _get_next_batch_of_mutual_friends_api_info(self, friend_id) -> dict:
+        headers, data = facebook_graphql.get_mutual_friends_request(
+            self._fb_dtsg_token,
+            friend_id,
+            self._mutual_friends_list_page_info[friend_id]["end_cursor"],
+            self.DOC_IDS,
+            self.graphql_client.limits.page_size(facebook_graphql.MUTUAL_FRIENDS_PAGE_SIZE),
+        )
 
-    @staticmethod
-    def _mutual_friends_api_info_to_friend_list(api_info: dict):
-        friend_objects = api_info["data"]["profile_list"]["list_items"]["edges"]
-        return [
-            Friend(
-                user_id=str(friend["node"]["id"]),
-                name=friend['node']['name'],
-                link=friend['node']['url'],
-            )
-            for friend in friend_objects
-            if friend["node"]["__typename"] == "User"
-        ]
+        return self.graphql_client.post(headers, data)
@@ -1,11 +1,12 @@
 import json
+import random
 import re
-import time
-from typing import Callable, Optional
+from typing import Callable, Dict, Iterable, Optional
 import urllib
 
 import requests
 from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 from selenium.webdriver.common.keys import Keys
@@ -13,37 +14,68 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
-from src import facebook_css_selectors
+from src import facebook_css_selectors, facebook_graphql
+from src.browser_pool import BrowserPool
 from src.friend import Friend
+from src.friend_network import save_network_file
 from src.friend_set import FriendSet
+from src.graphql_client import GraphQLClient
+from src.page_waits import PageWaiter
+from src.rate_limiter import RateLimiter
+from src.scan_checkpoint import ScanCheckpoint
 
 
 class FacebookFriendNetworkScanner(object):
-    DOC_IDS = dict(
-        mutual_friends_page_1=5488968171176172,
-        mutual_friends_next_pages=4236371019740591,
-    )
-
-    TIME_TO_LOGIN = 3
-
-    def __init__(self, user, password, visible_browser=False):
-        self.friends = []
-        self.mutual_friends = {}
+    GRAPHQL_URL = facebook_graphql.GRAPHQL_URL
+    DOC_IDS = facebook_graphql.MUTUAL_FRIENDS_DOC_IDS
+
+    TIME_TO_LOGIN = 10
+    MAX_REQUESTS_PER_SECOND = None
+    REFRESH_FRACTION = 0.1
+    BROWSERS = 1
+    SESSION_COOKIE_KEYS = ("name", "value", "path", "domain", "secure", "httpOnly", "expiry")
+
+    # Reading every card in the browser takes a single call to the driver instead of two per card
+    MUTUAL_FRIEND_CARDS_SCRIPT = """
+        const panel = document.querySelector(arguments[0]);
+        if (panel === null) {
+            return null;
+        }
+        return Array.from(panel.querySelectorAll(arguments[1]), card => [card.href, card.innerText]);
+    """
+    ELEMENT_EXISTS_SCRIPT = "return document.querySelector(arguments[0]) !== null;"
 
-        self._friend_list_page_info = dict(has_next_page=True, end_cursor=None)
-        self._mutual_friends_list_page_info = {}
+    def __init__(self, user, password, visible_browser=False, browsers=BROWSERS):
+        self._initialize_scan(browsers)
 
         self.driver = self._create_driver(visible_browser=visible_browser)
         self._log_into_facebook(self.driver, user, password)
-        time.sleep(self.TIME_TO_LOGIN)
+        # Facebook sets the user cookie as soon as the login is accepted
+        self.page_waiter.wait_until(
+            self.driver, lambda driver: driver.get_cookie("c_user") is not None, self.TIME_TO_LOGIN
+        )
         self.driver.get("https://www.facebook.com/friends/list")
 
         self.session = requests.session()
         self.session.cookies.update({cookie["name"]: cookie["value"] for cookie in self.driver.get_cookies()})
         self._fb_dtsg_token = self._get_fb_dtsg_token()
+        self.graphql_client = GraphQLClient(self.session, self.rate_limiter, url=self.GRAPHQL_URL)
 
         print("Facebook Friend Network initialized")
 
+    def _initialize_scan(self, browsers=BROWSERS):
+        self.browsers = browsers
+        self.friends = []
+        self.mutual_friends = {}
+        self.rate_limiter = RateLimiter(self.MAX_REQUESTS_PER_SECOND)
+        self.page_waiter = PageWaiter()
+        self.checkpoint: Optional[ScanCheckpoint] = None
+
+        self._friend_list_page_info = dict(has_next_page=True, end_cursor=None)
+        self._mutual_friends_list_page_info = {}
+        self._scanned_friend_ids = set()
+        self._reused_friend_ids = set()
+
     @staticmethod
     def _create_driver(get_logs=False, visible_browser=False):  # pragma: no cover
         if not get_logs:
@@ -97,107 +129,180 @@ class FacebookFriendNetworkScanner(object):
         match = re.search(pattern, self.driver.page_source)
         return json.loads(match.group())[2]["token"]
 
-    def scan_network(self, notify: Optional[Callable] = None):
+    def scan_network(self, notify: Optional[Callable] = None, checkpoint_file=None):
         def do_nothing(_):
             pass
 
         if notify is None:
             notify = do_nothing
 
-        notify("Getting list of friends")
-        self.read_all_friends_from_graphql_api()
+        if checkpoint_file is not None:
+            self.resume_from_checkpoint(checkpoint_file, notify)
+
+        try:
+            notify("Getting list of friends")
+            self.read_all_friends_from_graphql_api()
+
+            notify("Start reading mutual connections between your friends")
+            if self.browsers <= 1:
+                self._read_mutual_friends_from_friend_profiles(notify)
+            else:
+                self._read_mutual_friends_from_friend_profiles_in_parallel(notify)
+        finally:
+            self.close_checkpoint()
 
-        notify("Start reading mutual connections between your friends")
+        self.infer_missing_user_ids_from_profile_link()
+        self._add_new_mutual_friends_to_reused_friends()
+
+        notify(self.page_waiter.report())
+        notify("Finished scanning network")
+
+    def reuse_mutual_friends(
+            self, previous_mutual_friends: Dict[str, Iterable[Friend]], refresh_fraction=REFRESH_FRACTION, seed=None
+    ) -> int:
+        # Friends that were already in a previous scan keep their mutual friends, except a random sample of them that
+        # is read again so that old scans are refreshed little by little. The friend list must have been read before.
+        friend_ids = {friend.user_id for friend in self.friends}
+        reusable_friend_ids = [
+            friend.user_id for friend in self.friends
+            if friend.user_id in previous_mutual_friends and friend.user_id not in self._scanned_friend_ids
+        ]
+        refreshed_friend_ids = set(
+            random.Random(seed).sample(reusable_friend_ids, round(len(reusable_friend_ids) * refresh_fraction))
+        )
+
+        for friend_id in reusable_friend_ids:
+            if friend_id in refreshed_friend_ids:
+                continue
+
+            self.mutual_friends[friend_id] = [
+                mutual_friend for mutual_friend in previous_mutual_friends[friend_id]
+                if mutual_friend.user_id in friend_ids
+            ]
+            self._scanned_friend_ids.add(friend_id)
+            self._reused_friend_ids.add(friend_id)
+
+        return len(reusable_friend_ids) - len(refreshed_friend_ids)
+
+    def _add_new_mutual_friends_to_reused_friends(self):
+        # The lists that were not read again miss the friendships with the friends that were added since the last scan
+        friends_by_id = {friend.user_id: friend for friend in self.friends}
+        reused_mutual_friend_ids = {
+            friend_id: {mutual_friend.user_id for mutual_friend in self.mutual_friends[friend_id]}
+            for friend_id in self._reused_friend_ids
+        }
+
+        for friend_id, mutual_friends in self.mutual_friends.items():
+            if friend_id in self._reused_friend_ids:
+                continue
+
+            for mutual_friend in mutual_friends:
+                if friend_id not in reused_mutual_friend_ids.get(mutual_friend.user_id, {friend_id}):
+                    self.mutual_friends[mutual_friend.user_id].append(friends_by_id[friend_id])
+                    reused_mutual_friend_ids[mutual_friend.user_id].add(friend_id)
+
+    def _read_mutual_friends_from_friend_profiles(self, notify: Callable):
         for i, friend in enumerate(self.friends, start=1):
+            if friend.user_id in self._scanned_friend_ids:
+                continue
+
             notify(f"Reading mutual friends with {friend.name}. ({i} of {len(self.friends)})")
             self.read_mutual_friends_from_friend_profile(friend.user_id)
+            self._save_mutual_friends_from_friend_profile(friend.user_id)
             notify(f"  Number of mutual friends: {len(self.mutual_friends[friend.user_id])}")
 
-        self.infer_missing_user_ids_from_profile_link()
+    def _read_mutual_friends_from_friend_profiles_in_parallel(self, notify: Callable):
+        friends_to_read = [friend for friend in self.friends if friend.user_id not in self._scanned_friend_ids]
+        drivers = [self.driver]
+        try:
+            for _ in range(min(self.browsers, len(friends_to_read)) - 1):
+                drivers.append(self._create_logged_in_driver())
+
+            pool = BrowserPool(drivers)
+            results = pool.map_unordered(
+                lambda driver, friend: self.read_mutual_friends_from_friend_profile(friend.user_id, driver),
+                friends_to_read,
+            )
+            for i, (friend, _) in enumerate(results, start=1):
+                self._save_mutual_friends_from_friend_profile(friend.user_id)
+                notify(
+                    f"Read {len(self.mutual_friends[friend.user_id])} mutual friends with {friend.name}. "
+                    f"({i} of {len(friends_to_read)})"
+                )
+        finally:
+            for driver in drivers[1:]:
+                driver.quit()
 
-        notify("Finished scanning network")
+        self.mutual_friends = {friend.user_id: self.mutual_friends[friend.user_id] for friend in self.friends}
+
+    def _create_logged_in_driver(self):
+        # The new browser does not log in again, it takes the cookies of the session of the main browser
+        driver = self._create_driver()
+        driver.get("https://www.facebook.com/")
+        for cookie in self.driver.get_cookies():
+            driver.add_cookie({key: value for key, value in cookie.items() if key in self.SESSION_COOKIE_KEYS})
+
+        return driver
 
-    def save_network(self, output_file_name):
-        with open(output_file_name, "w") as outfile:
-            json.dump(
-                dict(
-                    friend_list=[vars(friend) for friend in self.friends],
-                    mutual_friends={
-                        friend: [vars(mutual_friend) for mutual_friend in mutual_friends]
-                        for friend, mutual_friends in self.mutual_friends.items()
-                    }
-                ),
-                outfile
+    def _save_mutual_friends_from_friend_profile(self, friend_id):
+        if self.checkpoint is not None:
+            self.checkpoint.record_mutual_friends_page(friend_id, self.mutual_friends[friend_id])
+        self._mark_as_scanned(friend_id)
+
+    def resume_from_checkpoint(self, checkpoint_file, notify: Callable = print, scan_id: Optional[str] = None):
+        self.checkpoint = ScanCheckpoint(checkpoint_file, scan_id)
+
+        self.friends = self.checkpoint.friends
+        self.mutual_friends = self.checkpoint.mutual_friends
+        self._friend_list_page_info = self.checkpoint.friend_list_page_info
+        self._mutual_friends_list_page_info = self.checkpoint.mutual_friends_page_info
+        self._scanned_friend_ids = self.checkpoint.scanned_friend_ids
+
+        if self.friends:
+            notify(
+                f"Resuming scan from checkpoint. Mutual friends already read with "
+                f"{len(self._scanned_friend_ids)} of {len(self.friends)} friends"
             )
 
+    def _mark_as_scanned(self, friend_id):
+        self._scanned_friend_ids.add(friend_id)
+        if self.checkpoint is not None:
+            self.checkpoint.record_scanned_friend(friend_id)
+
+    def close_checkpoint(self):
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+            self.checkpoint = None
+
+    def save_network(self, output_file_name, file_format="json"):
+        save_network_file(output_file_name, self.friends, self.mutual_friends, file_format)
+
     def read_all_friends_from_graphql_api(self):
         while self._friend_list_page_info["has_next_page"]:
             self._read_next_batch_of_friends()
 
     def _read_next_batch_of_friends(self):
         api_info = self._get_next_batch_of_friends_api_info()
-        api_info_dict = json.loads(api_info)
-
-        self.friends += self._friends_api_info_to_friend_list(api_info_dict)
-
-        self._friend_list_page_info = api_info_dict["data"]["viewer"]["all_friends"]["page_info"]
-
-    def _get_next_batch_of_friends_api_info(self):
-        url = 'https://www.facebook.com/api/graphql/'
-        headers = {
-            "accept": "*/*",
-            "accept-language": "es-ES,es;q=0.9",
-            "content-type": "application/x-www-form-urlencoded",
-            "sec-ch-ua": "\" Not;A Brand\";v=\"99\", \"Google Chrome\";v=\"91\", \"Chromium\";v=\"91\"",
-            "sec-ch-ua-mobile": "?0",
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-origin",
-            "x-fb-friendly-name": "FriendingCometFriendsListPaginationQuery",
-            "referrer": "https://www.facebook.com/friends/list",
-            "referrerPolicy": "strict-origin-when-cross-origin",
-        }
+        friends, self._friend_list_page_info = facebook_graphql.parse_friend_list(api_info)
 
-        response = self.session.post(
-            url,
-            headers=headers,
-            data=urllib.parse.urlencode(
-                {
-                    "fb_dtsg": self._fb_dtsg_token,
-                    "fb_api_req_friendly_name": "FriendingCometFriendsListPaginationQuery",
-                    "variables": json.dumps(
-                        {
-                            "count": 30,
-                            "cursor": self._friend_list_page_info["end_cursor"],
-                            "name": None,
-                            "scale": 1,
-                        }
-                    ).replace(" ", ""),
-                    "doc_id": 4577965845578736,
-                }
-            )
-        )
+        self.friends += friends
+        if self.checkpoint is not None:
+            self.checkpoint.record_friends_page(friends, self._friend_list_page_info)
 
-        return response.content
+    def _get_next_batch_of_friends_api_info(self) -> dict:
+        headers, data = facebook_graphql.get_friend_list_request(
+            self._fb_dtsg_token,
+            self._friend_list_page_info["end_cursor"],
+            self.graphql_client.limits.page_size(facebook_graphql.FRIEND_LIST_PAGE_SIZE),
+        )
 
-    @staticmethod
-    def _friends_api_info_to_friend_list(api_info: dict):
-        friend_objects = api_info["data"]["viewer"]["all_friends"]["edges"]
-        return [
-            Friend(
-                user_id=str(friend["node"]["id"]),
-                name=friend['node']['name'],
-                link=friend['node']['url'],
-                gender=friend['node']['gender']
-            )
-            for friend in friend_objects
-            if friend["node"]["__typename"] == "User"
-        ]
+        return self.graphql_client.post(headers, data)
 
-    def read_mutual_friends_from_friend_profile(self, friend_id):
-        self.driver.get(self._get_mutual_friends_link(friend_id))
-        self._wait_until_all_mutual_friends_are_loaded()
-        self.mutual_friends[friend_id] = self._get_mutual_friends_from_mutual_friends_html(self.driver)
+    def read_mutual_friends_from_friend_profile(self, friend_id, driver=None):
+        driver = driver or self.driver
+        driver.get(self._get_mutual_friends_link(friend_id))
+        self._wait_until_all_mutual_friends_are_loaded(driver)
+        self.mutual_friends[friend_id] = self._get_mutual_friends_from_mutual_friends_html(driver)
 
     def _get_mutual_friends_link(self, friend_id):
         friend = self._get_friend_by_id(friend_id)
@@ -209,41 +314,49 @@ class FacebookFriendNetworkScanner(object):
 
         return f"{profile_link}&sk=friends_mutual"
 
-    def _wait_until_all_mutual_friends_are_loaded(self):
-        time.sleep(1.5)
-
-        while self._mutual_friends_page_is_loading():
-            self.driver.find_element_by_xpath('//body').send_keys(Keys.END)
-            time.sleep(0.5)
-
-    def _mutual_friends_page_is_loading(self):
-        return self._mutual_friends_page_is_loading_from_html(self.driver)
-
-    @staticmethod
-    def _mutual_friends_page_is_loading_from_html(driver):
-        element = driver.find_elements_by_css_selector(
-            facebook_css_selectors.loading_mutual_friends_panel
-        )
-        return len(element) > 0
-
-    @staticmethod
-    def _get_mutual_friends_from_mutual_friends_html(driver):
-        mutual_friends_pannel = driver.find_element_by_css_selector(
-            facebook_css_selectors.mutual_friends_panel
+    def _wait_until_all_mutual_friends_are_loaded(self, driver=None):
+        driver = driver or self.driver
+        self.page_waiter.wait_for_page(
+            driver,
+            lambda driver: driver.execute_script(
+                self.ELEMENT_EXISTS_SCRIPT,
+                f"{facebook_css_selectors.mutual_friends_panel}, {facebook_css_selectors.loading_mutual_friends_panel}",
+            )
         )
 
-        cards = mutual_friends_pannel.find_elements_by_css_selector(
-            facebook_css_selectors.mutual_friend_cards
+        # A timeout does not mean that the list is complete while the loading indicator is still there, the batch may
+        # be slow or the page may keep changing. Scrolling goes on until nothing has loaded for the maximum timeout.
+        last_progress_time = self.page_waiter.clock()
+        while self._mutual_friends_page_is_loading(driver):
+            driver.find_element_by_xpath('//body').send_keys(Keys.END)
+            if self.page_waiter.wait_for_content(driver):
+                last_progress_time = self.page_waiter.clock()
+            elif self.page_waiter.clock() - last_progress_time >= self.page_waiter.content_load_timeout.maximum:
+                raise TimeoutException("The list of mutual friends is still loading but nothing else is loaded")
+
+    def _mutual_friends_page_is_loading(self, driver=None):
+        return self._mutual_friends_page_is_loading_from_html(driver or self.driver)
+
+    @classmethod
+    def _mutual_friends_page_is_loading_from_html(cls, driver):
+        return driver.execute_script(cls.ELEMENT_EXISTS_SCRIPT, facebook_css_selectors.loading_mutual_friends_panel)
+
+    @classmethod
+    def _get_mutual_friends_from_mutual_friends_html(cls, driver):
+        cards = driver.execute_script(
+            cls.MUTUAL_FRIEND_CARDS_SCRIPT,
+            facebook_css_selectors.mutual_friends_panel,
+            facebook_css_selectors.mutual_friend_cards,
         )
-
-        friend_cards = [FriendCard(card) for card in cards]
+        if cards is None:
+            raise NoSuchElementException("The panel of mutual friends is not in the page")
 
         return [
             Friend(
-                name=friend_card.name,
-                link=friend_card.link
+                name=text.split("\n")[0],
+                link=link
             )
-            for friend_card in friend_cards
+            for link, text in cards
         ]
 
     def infer_missing_user_ids_from_profile_link(self):
@@ -256,16 +369,3 @@ class FacebookFriendNetworkScanner(object):
 
     def _get_friend_by_id(self, friend_id):
         return [friend for friend in self.friends if friend.user_id == friend_id][0]
-
-
-class FriendCard(object):
-    def __init__(self, card):
-        self.card = card
-
-    @property
-    def link(self):
-        return self.card.get_attribute("href")
-
-    @property
-    def name(self):
-        return self.card.text.split("\n")[0]
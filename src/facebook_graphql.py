@@ -0,0 +1,122 @@
+import json
+from typing import Dict, List, Optional, Tuple
+import urllib.parse
+
+from src.friend import Friend
+
+
+GRAPHQL_URL = "https://www.facebook.com/api/graphql/"
+
+FRIEND_LIST_DOC_ID = 4577965845578736
+FRIEND_LIST_PAGE_SIZE = 30
+MUTUAL_FRIENDS_PAGE_SIZE = 10
+MUTUAL_FRIENDS_DOC_IDS = dict(
+    mutual_friends_page_1=5488968171176172,
+    mutual_friends_next_pages=4236371019740591,
+)
+
+
+def get_headers(friendly_name) -> Dict[str, str]:
+    return {
+        "accept": "*/*",
+        "accept-language": "es-ES,es;q=0.9",
+        "content-type": "application/x-www-form-urlencoded",
+        "sec-ch-ua": "\" Not;A Brand\";v=\"99\", \"Google Chrome\";v=\"91\", \"Chromium\";v=\"91\"",
+        "sec-ch-ua-mobile": "?0",
+        "sec-fetch-dest": "empty",
+        "sec-fetch-mode": "cors",
+        "sec-fetch-site": "same-origin",
+        "x-fb-friendly-name": friendly_name,
+        "referrer": "https://www.facebook.com/friends/list",
+        "referrerPolicy": "strict-origin-when-cross-origin",
+    }
+
+
+def get_friend_list_request(
+        fb_dtsg_token, cursor: Optional[str], count=FRIEND_LIST_PAGE_SIZE
+) -> Tuple[Dict[str, str], str]:
+    friendly_name = "FriendingCometFriendsListPaginationQuery"
+    data = urllib.parse.urlencode(
+        {
+            "fb_dtsg": fb_dtsg_token,
+            "fb_api_req_friendly_name": friendly_name,
+            "variables": json.dumps(
+                {
+                    "count": count,
+                    "cursor": cursor,
+                    "name": None,
+                    "scale": 1,
+                }
+            ).replace(" ", ""),
+            "doc_id": FRIEND_LIST_DOC_ID,
+        }
+    )
+
+    return get_headers(friendly_name), data
+
+
+def get_mutual_friends_request(
+        fb_dtsg_token,
+        friend_id,
+        cursor: Optional[str],
+        doc_ids: Optional[Dict[str, int]] = None,
+        count=MUTUAL_FRIENDS_PAGE_SIZE,
+) -> Tuple[Dict[str, str], str]:
+    doc_ids = doc_ids or MUTUAL_FRIENDS_DOC_IDS
+    is_first_request = cursor is None
+
+    data = urllib.parse.urlencode(
+        {
+            "fb_dtsg": fb_dtsg_token,
+            "fb_api_req_friendly_name": (
+                "CometProfileListDialogQuery" if is_first_request
+                else "CometProfileListDialogListRefetchQuery"
+            ),
+            "variables": json.dumps(
+                {key: value for key, value in {
+                    "listType": "MUTUAL_FRIENDS",
+                    "sourceID": friend_id,
+                    "scale": 1 if is_first_request else 1.5,
+                    "cursor": cursor,
+                    "count": None if is_first_request else count,
+                }.items() if value}
+            ).replace(" ", ""),
+            "doc_id": (
+                doc_ids["mutual_friends_page_1"] if is_first_request
+                else doc_ids["mutual_friends_next_pages"]
+            )
+        }
+    )
+
+    return get_headers("CometProfileListDialogQuery"), data
+
+
+def parse_friend_list(api_info: dict) -> Tuple[List[Friend], dict]:
+    all_friends = api_info["data"]["viewer"]["all_friends"]
+    friends = [
+        Friend(
+            user_id=str(friend["node"]["id"]),
+            name=friend['node']['name'],
+            link=friend['node']['url'],
+            gender=friend['node']['gender']
+        )
+        for friend in all_friends["edges"]
+        if friend["node"]["__typename"] == "User"
+    ]
+
+    return friends, all_friends["page_info"]
+
+
+def parse_mutual_friends(api_info: dict) -> Tuple[List[Friend], dict]:
+    list_items = api_info["data"]["profile_list"]["list_items"]
+    friends = [
+        Friend(
+            user_id=str(friend["node"]["id"]),
+            name=friend['node']['name'],
+            link=friend['node']['url'],
+        )
+        for friend in list_items["edges"]
+        if friend["node"]["__typename"] == "User"
+    ]
+
+    return friends, list_items["page_info"]
@@ -1,10 +1,17 @@
 class Friend(object):
+    __slots__ = ("user_id", "name", "link", "gender")
+
+    ATTRIBUTES = __slots__
+
     def __init__(self, user_id=None, name=None, link=None, gender=None):
         self.user_id = user_id
         self.name = name
         self.link = link
         self.gender = gender
 
+    def to_dict(self):
+        return {attribute: getattr(self, attribute) for attribute in self.ATTRIBUTES}
+
     def __repr__(self):
         return f"Friend({self.name})"
 
@@ -1,8 +1,9 @@
 import hashlib
-import json
-from typing import Dict, Optional, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import warnings
 
-from matplotlib import cm
+from matplotlib.collections import LineCollection
+from matplotlib.colors import LogNorm
 import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
@@ -10,17 +11,57 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from src.communities import (
+    balanced_partition, community_dendrogram, CommunityCache, detect_communities, graph_fingerprint
+)
 from src.friend import Friend
 from src.friend_set import FriendSet
+from src.json_stream import JsonStreamReader
+from src.layouts import LAYOUTS
+from src.network_binary_file import BinaryNetworkFile, load_network_binary, save_network_binary
+from src.network_json_file import load_network_json, save_network_json, VERSION as NETWORK_JSON_VERSION
+
+
+NETWORK_FILE_EXTENSIONS = dict(json=".json", binary=".fnet")
+
+
+def convert_network_file(input_file_name, output_file_name, file_format):
+    # The records are converted as they are stored, since loading them into a FriendNetwork drops the mutual friends
+    # that are not in the friend list
+    if BinaryNetworkFile.is_binary_network_file(input_file_name):
+        friends, mutual_friends = load_network_binary(input_file_name)
+    else:
+        friends, mutual_friends = load_network_json(input_file_name)
+
+    save_network_file(output_file_name, friends, mutual_friends, file_format)
+
+
+def save_network_file(output_file_name, friends: Iterable[Friend], mutual_friends: Dict[str, Iterable[Friend]],
+                      file_format="json"):
+    if file_format == "json":
+        save_network_json(output_file_name, friends, mutual_friends)
+    elif file_format == "binary":
+        save_network_binary(output_file_name, friends, mutual_friends)
+    else:
+        raise ValueError(f"Unknown network file format '{file_format}'")
 
 
 class FriendNetwork(object):
+    PLOTLY_WEBGL_THRESHOLD = 5000
+    MATPLOTLIB_DENSITY_THRESHOLD = 200000
+    DENSITY_RESOLUTION = 1000
+    DENSITY_CHUNK_SIZE = 100000
+
     def __init__(self, friends: Optional[FriendSet] = None, mutual_friends: Dict[str, FriendSet] = None):
         self.friends = friends or FriendSet([])
         self.mutual_friends = mutual_friends or {}
 
-        self.node_positions: Dict = {}
+        self._node_positions: Dict = {}
+        self._positions_are_outdated = False
+        self._layout = nx.spring_layout
+        self._layout_seed = None
         self.graph = nx.Graph()
+        self.unresolved_links: Set[str] = set()
 
         if friends is not None:
             self.calculate_graph()
@@ -28,94 +69,239 @@ class FriendNetwork(object):
     def get_person_friends(self, **person_attributes) -> FriendSet:
         person = self.friends.filter(**person_attributes)
         edges = self.graph.edges(person.user_id)
-        return FriendSet([
-            self.friends.filter(user_id=contact)
-            for _, contact in edges
-        ])
+        return self.friends.filter_many(user_id=[contact for _, contact in edges])
 
     def get_person_friend_names(self, **attributes):
         friends = self.get_person_friends(**attributes)
         return friends.name
 
     def load_network(self, filename):
-        with open(filename, "r", encoding="utf-8") as file:
-            network = json.load(file)
+        self.friends = FriendSet([])
+        self.mutual_friends = {}
+        self.graph = nx.Graph()
+        self.unresolved_links = set()
 
-        self.friends = FriendSet([
-            Friend(**friend_dict)
-            for friend_dict in network["friend_list"]
+        if BinaryNetworkFile.is_binary_network_file(filename):
+            self._load_binary_network(filename)
+        else:
+            self._load_json_network(filename)
+
+    def _load_binary_network(self, filename):
+        network_file = BinaryNetworkFile(filename)
+        friend_count = network_file.friend_count
+
+        record_columns = network_file.get_record_columns()
+        self.friends = FriendSet.from_columns({
+            attribute: column[:friend_count] for attribute, column in record_columns.items()
+        })
+        user_ids = self.friends.user_id
+        source_ids = np.concatenate([user_ids, network_file.get_other_source_ids()])
+
+        # As with JSON files, the mutual friends that are not in the friend list are left out of the network
+        self.mutual_friends = {}
+        for row, source_id in enumerate(source_ids):
+            positions = network_file.get_mutual_friend_positions(row)
+            self.mutual_friends[source_id] = self.friends.take(positions[positions < friend_count])
+
+        sources, targets = network_file.get_edges()
+        targets_are_friends = targets < friend_count
+        self.unresolved_links.update(record_columns["link"][targets[~targets_are_friends]])
+
+        self.graph.add_nodes_from([
+            (user_id, dict(name=name)) for user_id, name in zip(user_ids, self.friends.name)
         ])
+        self.graph.add_edges_from(
+            zip(source_ids[sources[targets_are_friends]], user_ids[targets[targets_are_friends]])
+        )
+        self._warn_about_unresolved_links()
 
-        mutual_friends = {}
-        for friend_id, mutual_friends_dicts in network["mutual_friends"].items():
-            mutual_friends[friend_id] = FriendSet([Friend(**friend_dict) for friend_dict in mutual_friends_dicts])
+    def _load_json_network(self, filename):
+        friend_list_is_loaded = False
+        pending_mutual_friend_entries = {}
+        with open(filename, "r", encoding="utf-8") as file:
+            reader = JsonStreamReader(file)
+            for key in reader.iter_object():
+                if key == "version":
+                    version = reader.read_value()
+                    if version > NETWORK_JSON_VERSION:
+                        raise ValueError(f"Unsupported network file version {version}")
+                elif key == "friend_list":
+                    self._add_friends(Friend(**friend_dict) for friend_dict in reader.iter_array())
+                    friend_list_is_loaded = True
+                elif key == "mutual_friends":
+                    for friend_id in reader.iter_object():
+                        mutual_friend_entries = list(reader.iter_array())
+                        if friend_list_is_loaded:
+                            self._add_mutual_friends(friend_id, mutual_friend_entries)
+                        else:
+                            pending_mutual_friend_entries[friend_id] = mutual_friend_entries
+                else:
+                    reader.read_value()
+
+        for friend_id, mutual_friend_entries in pending_mutual_friend_entries.items():
+            self._add_mutual_friends(friend_id, mutual_friend_entries)
+
+        self._warn_about_unresolved_links()
+
+    def _add_friends(self, friends: Iterable[Friend]):
+        self.friends.extend(friends)
+        self.graph.add_nodes_from([
+            (user_id, dict(name=name)) for user_id, name in zip(self.friends.user_id, self.friends.name)
+        ])
 
-        self.mutual_friends = mutual_friends
+    def _add_mutual_friends(self, friend_id, mutual_friend_entries):
+        # Version 1 files store whole friend records, version 2 files store user_id references
+        references = [entry if isinstance(entry, str) else entry["link"] for entry in mutual_friend_entries]
+        positions_by_user_id = iter(self.friends.positions_of(
+            user_id=[entry for entry in mutual_friend_entries if isinstance(entry, str)]
+        ))
+        positions_by_link = iter(self.friends.positions_of(
+            link=[entry["link"] for entry in mutual_friend_entries if not isinstance(entry, str)]
+        ))
+        positions = [
+            next(positions_by_user_id) if isinstance(entry, str) else next(positions_by_link)
+            for entry in mutual_friend_entries
+        ]
+        self.unresolved_links.update(
+            reference for reference, position in zip(references, positions) if position is None
+        )
 
-        self.calculate_graph()
-        self.compute_positions()
+        mutual_friends = self.friends.take(position for position in positions if position is not None)
+        self.mutual_friends[friend_id] = mutual_friends
+        self.graph.add_edges_from((friend_id, mutual_friend_id) for mutual_friend_id in mutual_friends.user_id)
 
-    def save_network(self, output_file_name):
-        with open(output_file_name, "w") as outfile:
-            json.dump(
-                dict(
-                    friend_list=[vars(friend) for friend in self.friends],
-                    mutual_friends={
-                        friend: [vars(mutual_friend) for mutual_friend in mutual_friends]
-                        for friend, mutual_friends in self.mutual_friends.items()
-                    }
-                ),
-                outfile
-            )
+    def save_network(self, output_file_name, file_format="json"):
+        save_network_file(output_file_name, self.friends, self.mutual_friends, file_format)
 
     def anonymize(self):
         def get_hash(string):
             return hashlib.sha256(string.encode()).hexdigest()
 
+        def get_anonymous_friend(friend):
+            anonymous_id = get_hash(friend.user_id)
+            return Friend(user_id=anonymous_id, name=anonymous_id, link=anonymous_id, gender=friend.gender)
+
+        # The mutual friends that are in the friend list become views of the anonymized friend list, and the ones that
+        # are not are anonymized as records of their own
+        mutual_friend_entries = {
+            friend_id: [
+                position if position is not None else get_anonymous_friend(mutual_friend)
+                for position, mutual_friend in zip(self.friends.positions_of(link=mutual_friends.link), mutual_friends)
+            ]
+            for friend_id, mutual_friends in self.mutual_friends.items()
+        }
+
         for friend in self.friends:
-            user_id = friend.user_id
-            anonymous_id = get_hash(user_id)
+            anonymous_id = get_hash(friend.user_id)
             friend.user_id = anonymous_id
             friend.name = anonymous_id
             friend.link = anonymous_id
 
-            self.mutual_friends[anonymous_id] = self.mutual_friends.pop(user_id)
-
-        for _, mutual_friends in self.mutual_friends.items():
-            for mutual_friend in mutual_friends:
-                anonymous_id = get_hash(mutual_friend.user_id)
-                mutual_friend.user_id = anonymous_id
-                mutual_friend.name = anonymous_id
-                mutual_friend.link = anonymous_id
+        self.mutual_friends = {
+            get_hash(friend_id): (
+                self.friends.take(entries)
+                if all(isinstance(entry, int) for entry in entries)
+                else FriendSet([self.friends[entry] if isinstance(entry, int) else entry for entry in entries])
+            )
+            for friend_id, entries in mutual_friend_entries.items()
+        }
 
     def calculate_graph(self):
         self.graph = nx.Graph()
-        self.graph.add_nodes_from([(friend.user_id, dict(name=friend.name)) for friend in self.friends])
+        self.graph.add_nodes_from([
+            (user_id, dict(name=name)) for user_id, name in zip(self.friends.user_id, self.friends.name)
+        ])
         self.graph.add_edges_from(self._get_network_edges())
-        self.compute_positions()
 
     def _get_network_edges(self):
-        friends_info = self.get_friends_info()
+        # The first friend with a link wins, as in the binary network files
+        user_id_by_link: Dict[str, str] = {}
+        for link, user_id in zip(self.friends.link, self.friends.user_id):
+            user_id_by_link.setdefault(link, user_id)
 
         edges = []
+        unresolved_links = set()
         for friend_id, mutual_friends in self.mutual_friends.items():
-            edges += [(
-                friend_id,
-                friends_info.iloc[(friends_info["link"] == friend.link).idxmax()].user_id
-            ) for friend in mutual_friends]
+            for mutual_friend in mutual_friends:
+                mutual_friend_id = user_id_by_link.get(mutual_friend.link)
+                if mutual_friend_id is None:
+                    unresolved_links.add(mutual_friend.link)
+                    continue
+
+                edges.append((friend_id, mutual_friend_id))
+
+        self.unresolved_links = unresolved_links
+        self._warn_about_unresolved_links()
 
         return edges
 
+    def _warn_about_unresolved_links(self):
+        if self.unresolved_links:
+            warnings.warn(
+                f"{len(self.unresolved_links)} mutual friend links do not belong to any friend and were ignored"
+            )
+
     def get_friends_info(self):
-        return pd.DataFrame([vars(friend) for friend in self.friends])
+        return pd.DataFrame({attribute: getattr(self.friends, attribute) for attribute in Friend.ATTRIBUTES})
 
     def filter_biggest_component(self):
         biggest_component_nodes = max(nx.connected_components(self.graph), key=len)
-        self.graph = self.graph.subgraph(biggest_component_nodes)
-        self.compute_positions()
+        if len(biggest_component_nodes) < self.graph.number_of_nodes():
+            self.graph = self.graph.subgraph(biggest_component_nodes)
+
+    @property
+    def graph(self) -> nx.Graph:
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph: nx.Graph):
+        self._graph = graph
+        self._positions_are_outdated = True
+        self._graph_fingerprint: Optional[str] = None
+
+    @property
+    def graph_fingerprint(self) -> str:
+        # Only the fingerprint of a frozen graph is memoized, since any other graph can be edited in place and a stale
+        # fingerprint would return the communities of another graph
+        if not nx.is_frozen(self.graph):
+            return graph_fingerprint(self.graph)
+
+        if self._graph_fingerprint is None:
+            self._graph_fingerprint = graph_fingerprint(self.graph)
+
+        return self._graph_fingerprint
+
+    @property
+    def node_positions(self) -> Dict:
+        if self._positions_are_outdated:
+            self._node_positions = self._layout(self.graph, seed=self._layout_seed)
+            self._positions_are_outdated = False
+
+        return self._node_positions
+
+    @node_positions.setter
+    def node_positions(self, node_positions: Dict):
+        self._node_positions = node_positions
+        self._positions_are_outdated = False
 
     def compute_positions(self, layout=nx.spring_layout, seed=None):
-        self.node_positions = layout(self.graph, seed=seed)
+        self._layout = LAYOUTS[layout] if isinstance(layout, str) else layout
+        self._layout_seed = seed
+        self._positions_are_outdated = True
+
+    def detect_communities(
+            self, algorithm="fluid", k: Optional[int] = None, seed=None, cache: Optional[CommunityCache] = None
+    ) -> List[Set]:
+        if cache is None:
+            return detect_communities(self.graph, algorithm, k, seed)
+
+        return cache.get_communities(self.graph, algorithm, k, seed, fingerprint=self.graph_fingerprint)
+
+    def community_dendrogram(self, max_communities=10, seed=None) -> Dict[int, List[Set]]:
+        return community_dendrogram(self.graph, max_communities, seed=seed)
+
+    def balanced_partition(self, min_size=8, max_size=12, seed=None) -> List[Set]:
+        return balanced_partition(self.graph, min_size, max_size, seed=seed)
 
     def communities_to_node_community_map(self, communities):
         node_community_map = {}
@@ -125,7 +311,12 @@ class FriendNetwork(object):
         return pd.Series(node_community_map).reindex(self.graph.nodes).fillna(0).astype("int64")
 
     def draw_graph_matplotlib(
-            self, node_scores: Dict[str, float] = None, communities: Tuple[Set] = None, label_proportion=0.1
+            self,
+            node_scores: Dict[str, float] = None,
+            communities: Tuple[Set] = None,
+            label_proportion=0.1,
+            rasterized=False,
+            density: Optional[bool] = None,
     ):
         def get_random_labels(p):
             labels = {}
@@ -135,7 +326,7 @@ class FriendNetwork(object):
 
             return labels
 
-        color = None
+        color = "#1f78b4"
 
         if node_scores is not None:
             node_scores_series = pd.Series(node_scores).loc[list(self.graph.nodes)]
@@ -147,27 +338,81 @@ class FriendNetwork(object):
                 node: self.graph.nodes[node]["name"]
                 for node in nodes_with_score_higher_than_threshold
             }
-            color = node_scores_series
+            color = node_scores_series.values
         else:
             labels = get_random_labels(label_proportion)
             if communities is not None:
                 node_community_map = self.communities_to_node_community_map(communities)
-                color = cm.get_cmap('Paired')(node_community_map.values)
+                color = plt.get_cmap('Paired')(node_community_map.values)
+
+        nodes, positions, edges = self._get_drawing_arrays()
 
         fig, ax = plt.subplots(1, 1, figsize=(20, 20))
+        ax.set_axis_off()
+
+        if density is None:
+            density = len(edges) > self.MATPLOTLIB_DENSITY_THRESHOLD
 
-        return nx.draw(
-            self.graph,
-            pos=self.node_positions,
-            node_size=45,
-            node_color=color,
-            edge_color=(0, 0, 0, 0.1),
-            ax=ax,
-            with_labels=True,
-            labels=labels
+        if density:
+            self._draw_edge_density(ax, positions, edges)
+        else:
+            ax.add_collection(LineCollection(
+                positions[edges], colors=[(0, 0, 0, 0.1)], linewidths=1, rasterized=rasterized, zorder=1
+            ))
+
+        ax.scatter(positions[:, 0], positions[:, 1], s=45, c=color, rasterized=rasterized, zorder=2)
+        nx.draw_networkx_labels(self.graph, pos=self.node_positions, labels=labels, ax=ax)
+        ax.autoscale_view()
+
+        return fig
+
+    def _draw_edge_density(self, ax, positions, edges):
+        # Edges are sampled once per pixel they cross and accumulated in a 2D histogram, as datashader does
+        if len(edges) == 0:
+            return
+
+        minimum = positions.min(axis=0)
+        extent = np.maximum(positions.max(axis=0) - minimum, 1e-9)
+        resolution = self.DENSITY_RESOLUTION
+        pixels = np.minimum((positions - minimum) / extent * resolution, resolution - 1e-6)
+
+        histogram = np.zeros(resolution * resolution)
+        for chunk_start in range(0, len(edges), self.DENSITY_CHUNK_SIZE):
+            chunk = edges[chunk_start:chunk_start + self.DENSITY_CHUNK_SIZE]
+            starts, ends = pixels[chunk[:, 0]], pixels[chunk[:, 1]]
+            steps = np.maximum(np.ceil(np.abs(ends - starts).max(axis=1)), 1).astype(np.int64)
+
+            samples_edge = np.repeat(np.arange(len(chunk)), steps)
+            samples_step = np.arange(len(samples_edge)) - np.repeat(np.cumsum(steps) - steps, steps)
+            fractions = ((samples_step + 0.5) / steps[samples_edge])[:, None]
+            samples = (starts[samples_edge] + fractions * (ends - starts)[samples_edge]).astype(np.int64)
+            histogram += np.bincount(samples[:, 1] * resolution + samples[:, 0], minlength=len(histogram))
+
+        ax.imshow(
+            np.ma.masked_equal(histogram.reshape(resolution, resolution), 0),
+            origin="lower",
+            extent=(minimum[0], minimum[0] + extent[0], minimum[1], minimum[1] + extent[1]),
+            aspect="auto",
+            cmap="Greys",
+            norm=LogNorm(),
+            interpolation="nearest",
+            zorder=1,
         )
 
-    def draw_graph_plotly(self, node_scores: Dict[str, float] = None, communities: Tuple[Set] = None):
+    def _get_drawing_arrays(self) -> Tuple[list, np.ndarray, np.ndarray]:
+        nodes = list(self.graph.nodes)
+        positions = np.array([self.node_positions[node] for node in nodes], dtype=float).reshape(-1, 2)
+
+        node_indexes = {node: index for index, node in enumerate(nodes)}
+        edges = np.array(
+            [(node_indexes[a], node_indexes[b]) for a, b in self.graph.edges()], dtype=np.int64
+        ).reshape(-1, 2)
+
+        return nodes, positions, edges
+
+    def draw_graph_plotly(
+            self, node_scores: Dict[str, float] = None, communities: Tuple[Set] = None, webgl: Optional[bool] = None
+    ):
         def get_nodes_color():
             if node_scores is None and communities is None:
                 return None, None
@@ -182,26 +427,29 @@ class FriendNetwork(object):
 
             return color, custom_data
 
-        positions = [position for _, position in self.node_positions.items()]
-        x, y = np.vstack(positions).T
-
-        lines = []
-        for a, b in self.graph.edges():
-            xa, ya = self.node_positions[a]
-            xb, yb = self.node_positions[b]
-
-            lines.append(
-                go.Scatter(
-                    x=[xa, xb],
-                    y=[ya, yb],
-                    line_color="black",
-                    line_width=1,
-                    opacity=0.2,
-                    showlegend=False,
-                    hovertemplate=None,
-                    mode="lines"
-                )
+        nodes, positions, edges = self._get_drawing_arrays()
+        x, y = positions.T
+
+        # Every edge is a segment followed by a NaN gap, so all of them fit in a single trace
+        edges_x = np.column_stack([x[edges[:, 0]], x[edges[:, 1]], np.full(len(edges), np.nan)]).ravel()
+        edges_y = np.column_stack([y[edges[:, 0]], y[edges[:, 1]], np.full(len(edges), np.nan)]).ravel()
+
+        if webgl is None:
+            webgl = len(nodes) + len(edges) > self.PLOTLY_WEBGL_THRESHOLD
+        scatter = go.Scattergl if webgl else go.Scatter
+
+        lines = [
+            scatter(
+                x=edges_x,
+                y=edges_y,
+                line_color="black",
+                line_width=1,
+                opacity=0.2,
+                showlegend=False,
+                hoverinfo="skip",
+                mode="lines"
             )
+        ]
 
         color, custom_data = get_nodes_color()
 
@@ -209,7 +457,7 @@ class FriendNetwork(object):
 
         return go.Figure(
             data=lines + [
-                go.Scatter(
+                scatter(
                     x=x,
                     y=y,
                     mode="markers",
@@ -220,7 +468,7 @@ class FriendNetwork(object):
                         colorscale=cmap,
                     ),
                     customdata=custom_data,
-                    text=[name for _, name in nx.get_node_attributes(self.graph, "name").items()],
+                    text=[self.graph.nodes[node].get("name") for node in nodes],
                     hovertemplate="%{text} (%{customdata})<extra></extra>" if custom_data is not None else "%{text}<extra></extra>",
                     showlegend=False,
                 )
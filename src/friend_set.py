@@ -1,57 +1,154 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional, Sized, Tuple
+
+import numpy as np
 
 from src.friend import Friend
+from src.friend_table import FriendTable
 
 
 class FriendSet(object):
-    def __init__(self, friends: List[Friend]):
-        self.friends = friends
+    INDEXED_ATTRIBUTES = ("user_id", "link", "name")
 
-    def __iter__(self):
-        self.i = 0
-        return self
+    def __init__(self, friends: Iterable[Friend]):
+        self.friends = list(friends)
+
+    @property
+    def friends(self) -> List[Friend]:
+        return list(self)
+
+    @friends.setter
+    def friends(self, friends: Iterable[Friend]):
+        self._table = FriendTable()
+        self._rows: Optional[np.ndarray] = None
+        self._indexes: Dict[str, Tuple[Optional[int], Dict[str, List[int]]]] = {}
+        self.extend(friends)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> "FriendSet":
+        friend_set = cls([])
+        friend_set._table = FriendTable.from_columns(columns)
+        return friend_set
+
+    def append(self, friend: Friend):
+        self.extend([friend])
+
+    def extend(self, friends: Iterable[Friend]):
+        if self._rows is not None:
+            self._detach()
 
-    def __next__(self):
-        if self.i < len(self.friends):
-            friend = self.friends[self.i]
-            self.i += 1
-            return friend
+        if isinstance(friends, Sized):
+            self._table.reserve(self._table.size + len(friends))
 
-        raise StopIteration
+        for friend in friends:
+            self._table.append(friend)
+
+    def take(self, positions: Iterable[int]) -> "FriendSet":
+        friend_set = FriendSet([])
+        friend_set._table = self._table
+        friend_set._rows = self._get_rows()[np.fromiter(positions, dtype=np.int64)].astype(np.int32)
+        return friend_set
+
+    def positions_of(self, **filter_values) -> List[Optional[int]]:
+        if len(filter_values) != 1:
+            raise ValueError("Batch lookups must be done on exactly one attribute")
+
+        [(attribute, values)] = filter_values.items()
+        index = self._get_index(attribute)
+        return [index[value][0] if value in index else None for value in values]
+
+    def __iter__(self):
+        return (self._table.row(row) for row in self._get_rows())
+
+    def __len__(self):
+        return self._table.size if self._rows is None else len(self._rows)
 
     def __getitem__(self, item):
-        return self.friends[item]
+        rows = self._get_rows()[item]
+        if isinstance(rows, np.ndarray):
+            return [self._table.row(row) for row in rows]
+
+        return self._table.row(rows)
+
+    def __setitem__(self, item, friend):
+        row = self._get_rows()[item]
+        for attribute in Friend.ATTRIBUTES:
+            self._table.set(attribute, row, getattr(friend, attribute))
 
-    def __getattr__(self, attr):
-        try:
-            return [getattr(friend, attr) for friend in self.friends]
-        except AttributeError:
+    def __getattr__(self, attr) -> np.ndarray:
+        if attr not in Friend.ATTRIBUTES:
             raise AttributeError(f"'FriendSet' object has no attribute '{attr}'")
 
+        column = self._table.column(attr)
+        return column if self._rows is None else column[self._rows]
+
     def __repr__(self):
         return "FriendSet:\n" + "\n".join(
-            [repr(friend) for friend in self.friends]
+            [repr(friend) for friend in self]
         )
 
     def __eq__(self, other):
-        if len(self.friends) != len(other.friends):
+        if len(self) != len(other):
             return False
 
-        for friend, friend_other in zip(self.friends, other.friends):
+        for friend, friend_other in zip(self, other):
             if friend != friend_other:
                 return False
 
         return True
 
-    def filter(self, **filter_attributes):
-        for friend in self.friends:
-            friend_attributes = vars(friend)
-            friend_relevant_attributes = {
-                key: value
-                for key, value in friend_attributes.items()
-                if key in filter_attributes
-            }
-            if friend_relevant_attributes == filter_attributes:
+    def filter(self, **filter_attributes) -> Friend:
+        for friend in self._get_candidates(filter_attributes):
+            if self._has_attributes(friend, filter_attributes):
                 return friend
 
         raise ValueError("There is no friend with those attributes")
+
+    def filter_all(self, **filter_attributes) -> "FriendSet":
+        return FriendSet(
+            friend
+            for friend in self._get_candidates(filter_attributes)
+            if self._has_attributes(friend, filter_attributes)
+        )
+
+    def filter_many(self, **filter_values) -> "FriendSet":
+        if len(filter_values) != 1:
+            raise ValueError("Batch lookups must be done on exactly one attribute")
+
+        [(attribute, values)] = filter_values.items()
+        return FriendSet(self.filter(**{attribute: value}) for value in values)
+
+    def _get_rows(self) -> np.ndarray:
+        return np.arange(self._table.size) if self._rows is None else self._rows
+
+    def _detach(self):
+        friends = list(self)
+        self._table = FriendTable()
+        self._rows = None
+        self._indexes = {}
+        self.extend(friends)
+
+    def _get_candidates(self, filter_attributes):
+        for attribute in self.INDEXED_ATTRIBUTES:
+            if attribute in filter_attributes:
+                positions = self._get_index(attribute).get(filter_attributes[attribute], [])
+                return [self[position] for position in positions]
+
+        return self
+
+    def _get_index(self, attribute) -> Dict[str, List[int]]:
+        version, index = self._indexes.get(attribute, (None, {}))
+        if version != self._table.version:
+            index = {}
+            for position, value in enumerate(getattr(self, attribute)):
+                index.setdefault(value, []).append(position)
+
+            self._indexes[attribute] = (self._table.version, index)
+
+        return index
+
+    @staticmethod
+    def _has_attributes(friend, attributes):
+        return all(
+            attribute in Friend.ATTRIBUTES and getattr(friend, attribute) == value
+            for attribute, value in attributes.items()
+        )
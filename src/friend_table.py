@@ -0,0 +1,99 @@
+import sys
+from typing import Dict
+
+import numpy as np
+
+from src.friend import Friend
+
+
+class FriendTable(object):
+    INITIAL_CAPACITY = 16
+    INTERNED_ATTRIBUTES = ("gender",)
+
+    def __init__(self):
+        self.size = 0
+        self.version = 0
+        self._columns = {
+            attribute: np.empty(self.INITIAL_CAPACITY, dtype=object)
+            for attribute in Friend.ATTRIBUTES
+        }
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> "FriendTable":
+        table = cls()
+        table.size = len(columns[Friend.ATTRIBUTES[0]])
+        table._columns = {
+            attribute: np.array([table._intern(attribute, value) for value in columns[attribute]], dtype=object)
+            if attribute in cls.INTERNED_ATTRIBUTES else np.asarray(columns[attribute], dtype=object)
+            for attribute in Friend.ATTRIBUTES
+        }
+        return table
+
+    @property
+    def capacity(self):
+        return len(self._columns[Friend.ATTRIBUTES[0]])
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+
+        for attribute, column in self._columns.items():
+            reserved_column = np.empty(capacity, dtype=object)
+            reserved_column[:self.size] = column[:self.size]
+            self._columns[attribute] = reserved_column
+
+    def append(self, friend: Friend) -> int:
+        if self.size == self.capacity:
+            self.reserve(max(2 * self.capacity, self.INITIAL_CAPACITY))
+
+        row = self.size
+        for attribute, column in self._columns.items():
+            column[row] = self._intern(attribute, getattr(friend, attribute))
+
+        self.size += 1
+        self.version += 1
+        return row
+
+    def get(self, attribute, row):
+        return self._columns[attribute][row]
+
+    def set(self, attribute, row, value):
+        self._columns[attribute][row] = self._intern(attribute, value)
+        self.version += 1
+
+    def column(self, attribute) -> np.ndarray:
+        view = self._columns[attribute][:self.size]
+        view.flags.writeable = False
+        return view
+
+    def row(self, row) -> "FriendRow":
+        return FriendRow(self, row)
+
+    def _intern(self, attribute, value):
+        if attribute in self.INTERNED_ATTRIBUTES and isinstance(value, str):
+            return sys.intern(value)
+
+        return value
+
+
+def _column_property(attribute):
+    def getter(self):
+        return self._table.get(attribute, self._row)
+
+    def setter(self, value):
+        self._table.set(attribute, self._row, value)
+
+    return property(getter, setter)
+
+
+class FriendRow(Friend):
+    __slots__ = ("_table", "_row")
+
+    user_id = _column_property("user_id")
+    name = _column_property("name")
+    link = _column_property("link")
+    gender = _column_property("gender")
+
+    def __init__(self, table: FriendTable, row: int):
+        self._table = table
+        self._row = row
@@ -0,0 +1,304 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+import json
+import random
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple, Type
+
+import requests
+
+from src import facebook_graphql
+from src.rate_limiter import RateLimiter
+
+
+# Error codes that Facebook answers with when too many requests are made: rate limit exceeded, feature temporarily
+# blocked and account temporarily blocked
+THROTTLING_ERROR_CODES = {368, 1390008, 1675004, 3252001}
+THROTTLING_MESSAGES = ("rate limit", "temporarily blocked", "too many requests")
+
+# Errors are returned as JSON preceded by a prefix that prevents them from being executed as scripts
+JSON_PREFIX = b"for (;;);"
+
+
+class GraphQLError(Exception):
+    pass
+
+
+class TransientError(GraphQLError):
+    pass
+
+
+class ThrottledError(TransientError):
+    def __init__(self, message, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_response(status, content: bytes, retry_after: Optional[str] = None) -> dict:
+    if status == 429:
+        raise ThrottledError("HTTP 429 Too Many Requests", _parse_retry_after(retry_after))
+    if status >= 500:
+        raise TransientError(f"HTTP {status}")
+    if status >= 400:
+        raise GraphQLError(f"HTTP {status}")
+
+    if content.startswith(JSON_PREFIX):
+        content = content[len(JSON_PREFIX):]
+    try:
+        api_info = json.loads(content)
+    except ValueError:
+        # An HTML page instead of JSON means that the session is not valid anymore, trying again does not help
+        raise GraphQLError("The response is not JSON") from None
+
+    if "data" not in api_info:
+        errors = api_info.get("errors") or [dict(code=api_info.get("error"), message=api_info.get("errorSummary"))]
+        for error in errors:
+            message = str(error.get("message") or error.get("summary") or "").lower()
+            if error.get("code") in THROTTLING_ERROR_CODES or any(text in message for text in THROTTLING_MESSAGES):
+                raise ThrottledError(f"Throttled by Facebook: {error}")
+
+        raise GraphQLError(f"Facebook answered with errors: {errors}")
+
+    return api_info
+
+
+def _parse_retry_after(retry_after: Optional[str], clock: Callable[[], float] = time.time) -> Optional[float]:
+    # Retry-After is either a number of seconds or an HTTP date
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - clock())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_backoff_delay(attempt, base=1.0, maximum=60.0, random_fraction: Callable[[], float] = random.random) -> float:
+    # Half of the exponential delay is fixed and the other half is random, so that the retries of concurrent requests
+    # do not hit the server at the same time
+    delay = min(maximum, base * 2 ** attempt)
+    return delay / 2 + random_fraction() * delay / 2
+
+
+# Additive increase and multiplicative decrease of the request rate, the number of requests in flight and the size of
+# the pages: they grow slowly while requests succeed and are halved as soon as Facebook throttles the scanner
+class AdaptiveLimits(object):
+    SUCCESSES_TO_GROW = 20
+    MIN_PAGE_SIZE_SCALE = 0.5
+    MAX_PAGE_SIZE_SCALE = 3.0
+    PAGE_SIZE_SCALE_STEP = 0.25
+    RATE_STEP = 0.1
+    REQUESTS_PER_SECOND_AFTER_THROTTLING = 5.0
+    MIN_REQUESTS_PER_SECOND = 1.0
+    MAX_REQUESTS_PER_SECOND_WITHOUT_CAP = 50.0
+
+    def __init__(self, max_concurrency=1, rate_limiter: Optional[RateLimiter] = None):
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.page_size_scale = 1.0
+        self.rate_limiter = rate_limiter
+        # The configured rate is a cap that the growth must never exceed
+        self.max_requests_per_second = rate_limiter.max_requests_per_second if rate_limiter is not None else None
+        self.min_requests_per_second = min(
+            self.MIN_REQUESTS_PER_SECOND, self.max_requests_per_second or self.MIN_REQUESTS_PER_SECOND
+        )
+
+        self._successes = 0
+        self._running = 0
+        self._decreases = 0
+        self._condition = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def decreases(self) -> int:
+        return self._decreases
+
+    def page_size(self, default) -> int:
+        return max(1, round(default * self.page_size_scale))
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._running < self.concurrency)
+            self._running += 1
+            decreases = self._decreases
+        try:
+            yield decreases
+        finally:
+            self._release_slot()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        # Coroutines wait for their turn without blocking the event loop, sharing the running requests with the threads
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._running < self.concurrency:
+                    self._running += 1
+                    decreases = self._decreases
+                    break
+
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+        try:
+            yield decreases
+        finally:
+            self._release_slot()
+
+    def record_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes < self.SUCCESSES_TO_GROW:
+                return
+
+            self._successes = 0
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.page_size_scale = min(self.MAX_PAGE_SIZE_SCALE, self.page_size_scale + self.PAGE_SIZE_SCALE_STEP)
+            if self.rate_limiter is not None and self.rate_limiter.max_requests_per_second:
+                self.rate_limiter.max_requests_per_second = min(
+                    self.max_requests_per_second or self.MAX_REQUESTS_PER_SECOND_WITHOUT_CAP,
+                    self.rate_limiter.max_requests_per_second * (1 + self.RATE_STEP),
+                )
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+    def record_throttling(self, decreases_before_request: Optional[int] = None):
+        with self._condition:
+            self._successes = 0
+            # The other requests that were in flight when the limits were decreased are throttled too, but they were
+            # sent with the old limits, so they must not decrease them again
+            if decreases_before_request is not None and decreases_before_request < self._decreases:
+                return
+
+            self._decreases += 1
+            self.concurrency = max(1, self.concurrency // 2)
+            self.page_size_scale = max(self.MIN_PAGE_SIZE_SCALE, self.page_size_scale / 2)
+            if self.rate_limiter is not None:
+                self.rate_limiter.max_requests_per_second = (
+                    max(self.min_requests_per_second, self.rate_limiter.max_requests_per_second / 2)
+                    if self.rate_limiter.max_requests_per_second
+                    else self.REQUESTS_PER_SECOND_AFTER_THROTTLING
+                )
+
+    def _release_slot(self):
+        with self._condition:
+            self._running -= 1
+            self._condition.notify()
+            self._wake_async_waiters()
+
+    def _wake_async_waiters(self):
+        # Every waiting coroutine checks the limit again, from the thread of its own event loop
+        for loop, waiter in self._async_waiters:
+            loop.call_soon_threadsafe(_set_result_if_pending, waiter)
+        self._async_waiters = []
+
+
+def _set_result_if_pending(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Retries the requests that fail for a reason that can go away, waiting for a slot of the adaptive limits and for the rate
+# limiter before every attempt. The sync and async clients share it, so both follow the same policy
+class RetryPolicy(object):
+    MAX_RETRIES = 5
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 60.0
+
+    def __init__(
+            self,
+            rate_limiter: RateLimiter,
+            limits: AdaptiveLimits,
+            max_retries=MAX_RETRIES,
+            sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate_limiter = rate_limiter
+        self.limits = limits
+        self.max_retries = max_retries
+        self._sleep = sleep
+
+    def call(self, send: Callable[[], dict], retried_errors: Tuple[Type[Exception], ...] = ()) -> dict:
+        for attempt in range(self.max_retries + 1):
+            with self.limits.slot() as decreases_before_request:
+                self.rate_limiter.wait()
+                try:
+                    api_info = send()
+                except retried_errors + (TransientError,) as error:
+                    delay = self._get_retry_delay(error, attempt, decreases_before_request)
+                else:
+                    self.limits.record_success()
+                    return api_info
+
+            self._sleep(delay)
+
+        raise self._get_no_attempts_error()
+
+    async def call_async(
+            self, send: Callable[[], Awaitable[dict]], retried_errors: Tuple[Type[Exception], ...] = ()
+    ) -> dict:
+        for attempt in range(self.max_retries + 1):
+            async with self.limits.async_slot() as decreases_before_request:
+                await self.rate_limiter.wait_async()
+                try:
+                    api_info = await send()
+                except retried_errors + (TransientError,) as error:
+                    delay = self._get_retry_delay(error, attempt, decreases_before_request)
+                else:
+                    self.limits.record_success()
+                    return api_info
+
+            await asyncio.sleep(delay)
+
+        raise self._get_no_attempts_error()
+
+    def _get_retry_delay(self, error: Exception, attempt, decreases_before_request) -> float:
+        if isinstance(error, ThrottledError):
+            self.limits.record_throttling(decreases_before_request)
+        if attempt == self.max_retries:
+            raise error
+
+        retry_after = getattr(error, "retry_after", None) or 0
+        return max(retry_after, get_backoff_delay(attempt, self.BACKOFF_BASE, self.BACKOFF_MAX))
+
+    def _get_no_attempts_error(self) -> ValueError:
+        # The last attempt either returns or raises, so this is only reached when there are no attempts at all
+        return ValueError(f"max_retries must not be negative, but it is {self.max_retries}")
+
+
+class GraphQLClient(object):
+    TIMEOUT = 30
+
+    def __init__(
+            self,
+            session: requests.Session,
+            rate_limiter: Optional[RateLimiter] = None,
+            limits: Optional[AdaptiveLimits] = None,
+            url=facebook_graphql.GRAPHQL_URL,
+            sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.session = session
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.limits = limits or AdaptiveLimits(rate_limiter=self.rate_limiter)
+        self.url = url
+        self.retry_policy = RetryPolicy(self.rate_limiter, self.limits, sleep=sleep)
+
+    @property
+    def max_retries(self) -> int:
+        return self.retry_policy.max_retries
+
+    @max_retries.setter
+    def max_retries(self, max_retries: int):
+        self.retry_policy.max_retries = max_retries
+
+    def post(self, headers, data) -> dict:
+        def send() -> dict:
+            response = self.session.post(self.url, headers=headers, data=data, timeout=self.TIMEOUT)
+            return parse_response(response.status_code, response.content, response.headers.get("Retry-After"))
+
+        return self.retry_policy.call(send, (requests.RequestException,))
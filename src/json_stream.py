@@ -0,0 +1,103 @@
+import json
+from typing import Any, Iterator, TextIO
+
+
+class JsonStreamReader(object):
+    CHUNK_SIZE = 1 << 16
+    WHITESPACE = " \t\n\r"
+
+    def __init__(self, file: TextIO, chunk_size: int = CHUNK_SIZE):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._end_of_file = False
+
+    def iter_object(self) -> Iterator[str]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._position += 1
+            return
+
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise self._error("Expecting property name")
+
+            self._expect(":")
+            yield key
+
+            if self._read_separator("}"):
+                return
+
+    def iter_array(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._position += 1
+            return
+
+        while True:
+            yield self.read_value()
+
+            if self._read_separator("]"):
+                return
+
+    def read_value(self) -> Any:
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if self._end_of_file:
+                    raise
+                self._read_chunk()
+                continue
+
+            if end == len(self._buffer) and not self._end_of_file:
+                self._read_chunk()
+                continue
+
+            self._position = end
+            return value
+
+    def _read_separator(self, closing_char) -> bool:
+        char = self._peek()
+        self._position += 1
+        if char == closing_char:
+            return True
+        if char != ",":
+            raise self._error(f"Expecting ',' or '{closing_char}' delimiter")
+
+        return False
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise self._error(f"Expecting '{char}'")
+
+        self._position += 1
+
+    def _peek(self) -> str:
+        self._skip_whitespace()
+        return self._buffer[self._position] if self._position < len(self._buffer) else ""
+
+    def _skip_whitespace(self):
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in self.WHITESPACE:
+                self._position += 1
+
+            if self._position < len(self._buffer) or self._end_of_file:
+                return
+
+            self._read_chunk()
+
+    def _read_chunk(self):
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._end_of_file = True
+
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+
+    def _error(self, message) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self._buffer, self._position)
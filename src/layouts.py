@@ -0,0 +1,160 @@
+from typing import Dict, List, Tuple
+
+import networkx as nx
+import numpy as np
+
+
+# Fruchterman-Reingold layout, like nx.spring_layout, but the repulsion of the quadtree cells that are seen from a node
+# under an angle smaller than theta is approximated by their center of mass. Each iteration costs O(n log n).
+def barnes_hut_layout(graph: nx.Graph, seed=None, iterations=50, theta=0.8) -> Dict:
+    nodes = list(graph.nodes)
+    if len(nodes) == 0:
+        return {}
+    if len(nodes) == 1:
+        return {nodes[0]: np.zeros(2)}
+
+    node_indexes = {node: index for index, node in enumerate(nodes)}
+    edges = np.array(
+        [(node_indexes[u], node_indexes[v]) for u, v in graph.edges if u != v], dtype=np.int64
+    ).reshape(-1, 2)
+
+    positions = np.random.default_rng(seed).random((len(nodes), 2))
+    optimal_distance = np.sqrt(1 / len(nodes))
+    temperature = 0.1
+    cooling_step = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        displacement = (
+            _get_repulsive_forces(positions, optimal_distance, theta)
+            + _get_attractive_forces(positions, edges, optimal_distance)
+        )
+        length = np.maximum(np.linalg.norm(displacement, axis=1), 0.01)
+        positions += displacement * (temperature / length)[:, None]
+        temperature -= cooling_step
+
+    positions = positions - positions.mean(axis=0)
+    positions /= np.abs(positions).max()
+
+    return dict(zip(nodes, positions))
+
+
+def _get_attractive_forces(positions, edges, optimal_distance) -> np.ndarray:
+    delta = positions[edges[:, 0]] - positions[edges[:, 1]]
+    distance = np.maximum(np.linalg.norm(delta, axis=1), 0.01)
+    forces = delta * (distance / optimal_distance)[:, None]
+
+    attraction = np.zeros_like(positions)
+    for dimension in range(2):
+        attraction[:, dimension] -= np.bincount(edges[:, 0], forces[:, dimension], minlength=len(positions))
+        attraction[:, dimension] += np.bincount(edges[:, 1], forces[:, dimension], minlength=len(positions))
+
+    return attraction
+
+
+def _get_repulsive_forces(positions, optimal_distance, theta) -> np.ndarray:
+    quadtree = _Quadtree(positions)
+    repulsion = np.zeros_like(positions)
+
+    node = np.arange(len(positions))
+    cell = np.zeros(len(positions), dtype=np.int64)
+    for level in range(quadtree.depth + 1):
+        counts = quadtree.counts[level][cell]
+        centers_of_mass = quadtree.centers_of_mass[level][cell]
+        node_is_inside = quadtree.node_cells[level][node] == cell
+
+        if level == quadtree.depth:
+            # The rest of the nodes of the deepest cell of a node act as a single body
+            counts = counts - node_is_inside
+            centers_of_mass = np.where(
+                node_is_inside[:, None],
+                (centers_of_mass * (counts + 1)[:, None] - positions[node]) / np.maximum(counts, 1)[:, None],
+                centers_of_mass,
+            )
+
+        delta = positions[node] - centers_of_mass
+        distance_squared = np.maximum((delta ** 2).sum(axis=1), 1e-4)
+
+        if level == quadtree.depth:
+            is_far_enough = counts > 0
+        else:
+            is_far_enough = ~node_is_inside & (
+                (counts == 1) | (quadtree.cell_sizes[level] ** 2 < theta ** 2 * distance_squared)
+            )
+
+        forces = delta[is_far_enough] * (
+            counts[is_far_enough] * optimal_distance ** 2 / distance_squared[is_far_enough]
+        )[:, None]
+        for dimension in range(2):
+            repulsion[:, dimension] += np.bincount(node[is_far_enough], forces[:, dimension], minlength=len(positions))
+
+        if level == quadtree.depth:
+            break
+
+        must_be_opened = ~is_far_enough & ~(node_is_inside & (counts == 1))
+        node, cell = quadtree.get_children(level, node[must_be_opened], cell[must_be_opened])
+
+    return repulsion
+
+
+class _Quadtree(object):
+    MAX_DEPTH = 16
+
+    def __init__(self, positions):
+        minimum = positions.min(axis=0)
+        extent = max((positions.max(axis=0) - minimum).max(), 1e-9) * (1 + 1e-9)
+        self.depth = int(min(self.MAX_DEPTH, np.ceil(np.log2(len(positions)) / 2) + 2))
+        self.cell_sizes = extent / 2.0 ** np.arange(self.depth + 1)
+
+        grid_coordinates = ((positions - minimum) / extent * 2 ** self.depth).astype(np.uint64)
+        morton_codes = self._spread_bits(grid_coordinates[:, 0]) | (self._spread_bits(grid_coordinates[:, 1]) << 1)
+
+        self.codes: List[np.ndarray] = []
+        self.node_cells: List[np.ndarray] = []
+        self.counts: List[np.ndarray] = []
+        self.centers_of_mass: List[np.ndarray] = []
+        for level in range(self.depth + 1):
+            level_codes = morton_codes >> np.uint64(2 * (self.depth - level))
+            codes, node_cells, counts = np.unique(level_codes, return_inverse=True, return_counts=True)
+            node_cells = node_cells.reshape(-1)
+            centers_of_mass = np.stack(
+                [np.bincount(node_cells, positions[:, dimension]) / counts for dimension in range(2)], axis=1
+            )
+            self.codes.append(codes)
+            self.node_cells.append(node_cells)
+            self.counts.append(counts)
+            self.centers_of_mass.append(centers_of_mass)
+
+        self._children_ranges = [self._get_children_ranges(level) for level in range(self.depth)]
+
+    def get_children(self, level, node, cell) -> Tuple[np.ndarray, np.ndarray]:
+        first_child, end_child = self._children_ranges[level]
+        number_of_children = end_child[cell] - first_child[cell]
+        child_offsets = np.arange(number_of_children.sum()) - np.repeat(
+            np.cumsum(number_of_children) - number_of_children, number_of_children
+        )
+        return (
+            np.repeat(node, number_of_children),
+            np.repeat(first_child[cell], number_of_children) + child_offsets,
+        )
+
+    def _get_children_ranges(self, level) -> Tuple[np.ndarray, np.ndarray]:
+        parent_codes = self.codes[level + 1] >> np.uint64(2)
+        return (
+            np.searchsorted(parent_codes, self.codes[level], side="left"),
+            np.searchsorted(parent_codes, self.codes[level], side="right"),
+        )
+
+    @staticmethod
+    def _spread_bits(values) -> np.ndarray:
+        values = values & np.uint64(0xFFFF)
+        values = (values | (values << np.uint64(8))) & np.uint64(0x00FF00FF)
+        values = (values | (values << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+        values = (values | (values << np.uint64(2))) & np.uint64(0x33333333)
+        values = (values | (values << np.uint64(1))) & np.uint64(0x55555555)
+        return values
+
+
+LAYOUTS = dict(
+    spring=nx.spring_layout,
+    barnes_hut=barnes_hut_layout,
+)
@@ -0,0 +1,185 @@
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.friend import Friend
+
+
+MAGIC = b"FNETBIN\0"
+VERSION = 2
+
+_HEADER = struct.Struct("<8sIIIIQ")
+# Version 2 counts the mutual friends that are not in the friend list and the people that have a list of mutual
+# friends but are not in the friend list, which version 1 files silently dropped
+_HEADER_EXTENSION = struct.Struct("<II")
+_ALIGNMENT = 8
+
+
+class BinaryNetworkFile(object):
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            magic, version, friend_count, string_count, _, edge_count = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{filename} is not a binary network file")
+            if version not in (1, VERSION):
+                raise ValueError(f"Unsupported binary network file version {version}")
+
+            other_record_count, other_source_count = (
+                _HEADER_EXTENSION.unpack(file.read(_HEADER_EXTENSION.size)) if version > 1 else (0, 0)
+            )
+            sections = _Sections(filename, file.tell())
+
+        self.friend_count = friend_count
+        self.edge_count = edge_count
+
+        # Friends come first in the records, followed by the mutual friends that are not in the friend list. The
+        # edges of the friends come first too, followed by the edges of the people that are not in the friend list
+        self.string_offsets = sections.read(np.int64, (string_count + 1,))
+        self.string_data = sections.read(np.uint8, (int(self.string_offsets[-1]),))
+        self.record_attributes = sections.read(np.int32, (friend_count + other_record_count, len(Friend.ATTRIBUTES)))
+        self.other_source_ids = sections.read(np.int32, (other_source_count,))
+        self.edge_indptr = sections.read(np.int64, (friend_count + other_source_count + 1,))
+        self.edge_indices = sections.read(np.int32, (edge_count,))
+
+    @staticmethod
+    def is_binary_network_file(filename) -> bool:
+        with open(filename, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+
+    def get_strings(self) -> np.ndarray:
+        data = self.string_data.tobytes()
+        offsets = self.string_offsets.tolist()
+        strings = np.empty(len(offsets), dtype=object)
+        strings[:-1] = [data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+        return strings
+
+    def get_record_columns(self) -> Dict[str, np.ndarray]:
+        strings = self.get_strings()
+        return {
+            attribute: strings[self.record_attributes[:, column]]
+            for column, attribute in enumerate(Friend.ATTRIBUTES)
+        }
+
+    def get_friend_columns(self) -> Dict[str, np.ndarray]:
+        return {attribute: column[:self.friend_count] for attribute, column in self.get_record_columns().items()}
+
+    def get_other_source_ids(self) -> np.ndarray:
+        return self.get_strings()[self.other_source_ids]
+
+    def get_mutual_friend_positions(self, position) -> np.ndarray:
+        return self.edge_indices[self.edge_indptr[position]:self.edge_indptr[position + 1]]
+
+    def get_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        sources = np.repeat(np.arange(len(self.edge_indptr) - 1, dtype=np.int32), np.diff(self.edge_indptr))
+        return sources, np.asarray(self.edge_indices)
+
+
+class _Sections(object):
+    def __init__(self, filename, offset):
+        self._filename = filename
+        self._offset = offset
+
+    def read(self, dtype, shape) -> np.ndarray:
+        self._offset = _align(self._offset)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if size == 0:
+            return np.empty(shape, dtype=dtype)
+
+        section: np.ndarray = np.memmap(self._filename, dtype=dtype, mode="r", offset=self._offset, shape=shape)
+        self._offset += size
+        return section
+
+
+def load_network_binary(filename) -> Tuple[List[Friend], Dict[str, List[Friend]]]:
+    network_file = BinaryNetworkFile(filename)
+    columns = network_file.get_record_columns()
+    records = [Friend(**dict(zip(columns, values))) for values in zip(*columns.values())]
+    friends = records[:network_file.friend_count]
+
+    source_ids = [friend.user_id for friend in friends] + network_file.get_other_source_ids().tolist()
+    mutual_friends = {
+        source_id: [records[position] for position in network_file.get_mutual_friend_positions(row)]
+        for row, source_id in enumerate(source_ids)
+    }
+    return friends, mutual_friends
+
+
+def save_network_binary(output_file_name, friends: Iterable[Friend], mutual_friends: Dict[str, Iterable[Friend]]):
+    friend_list = list(friends)
+    position_by_link: Dict[str, int] = {}
+    for position, friend in enumerate(friend_list):
+        position_by_link.setdefault(friend.link, position)
+
+    other_records: List[Friend] = []
+    position_by_other_record: Dict[Tuple, int] = {}
+
+    def get_position(mutual_friend: Friend) -> int:
+        if mutual_friend.link in position_by_link:
+            return position_by_link[mutual_friend.link]
+
+        record = tuple(getattr(mutual_friend, attribute) for attribute in Friend.ATTRIBUTES)
+        if record not in position_by_other_record:
+            position_by_other_record[record] = len(friend_list) + len(other_records)
+            other_records.append(mutual_friend)
+        return position_by_other_record[record]
+
+    edge_lists: List[List[int]] = [[] for _ in friend_list]
+    other_source_ids = []
+    position_by_user_id = {friend.user_id: position for position, friend in enumerate(friend_list)}
+    for friend_id, friend_mutual_friends in mutual_friends.items():
+        edge_list = [get_position(mutual_friend) for mutual_friend in friend_mutual_friends]
+        if friend_id in position_by_user_id:
+            edge_lists[position_by_user_id[friend_id]] = edge_list
+        else:
+            other_source_ids.append(friend_id)
+            edge_lists.append(edge_list)
+
+    string_table = _StringTable()
+    records = friend_list + other_records
+    record_attributes = np.array(
+        [[string_table.add(getattr(record, attribute)) for attribute in Friend.ATTRIBUTES] for record in records],
+        dtype=np.int32,
+    ).reshape(len(records), len(Friend.ATTRIBUTES))
+    other_source_string_indexes = np.array(
+        [string_table.add(source_id) for source_id in other_source_ids], dtype=np.int32
+    )
+
+    edge_indptr = np.zeros(len(edge_lists) + 1, dtype=np.int64)
+    np.cumsum([len(edge_list) for edge_list in edge_lists], out=edge_indptr[1:])
+    edge_indices = np.fromiter(
+        (position for edge_list in edge_lists for position in edge_list), dtype=np.int32, count=int(edge_indptr[-1])
+    )
+
+    string_offsets, string_data = string_table.encode()
+
+    with open(output_file_name, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(friend_list), len(string_offsets) - 1, 0, len(edge_indices)))
+        file.write(_HEADER_EXTENSION.pack(len(other_records), len(other_source_ids)))
+        sections = (
+            string_offsets, string_data, record_attributes, other_source_string_indexes, edge_indptr, edge_indices
+        )
+        for section in sections:
+            file.write(b"\0" * (_align(file.tell()) - file.tell()))
+            file.write(np.ascontiguousarray(section).tobytes())
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class _StringTable(object):
+    def __init__(self):
+        self._indexes: Dict[str, int] = {}
+
+    def add(self, string: Optional[str]) -> int:
+        if string is None:
+            return -1
+
+        return self._indexes.setdefault(string, len(self._indexes))
+
+    def encode(self) -> Tuple[np.ndarray, np.ndarray]:
+        encoded_strings = [string.encode("utf-8") for string in self._indexes]
+        offsets = np.zeros(len(encoded_strings) + 1, dtype=np.int64)
+        np.cumsum([len(encoded_string) for encoded_string in encoded_strings], out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(encoded_strings), dtype=np.uint8)
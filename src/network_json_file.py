@@ -0,0 +1,59 @@
+import json
+from typing import Dict, Iterable, List, Tuple
+
+from src.friend import Friend
+
+
+VERSION = 2
+
+
+def load_network_json(filename) -> Tuple[List[Friend], Dict[str, List[Friend]]]:
+    with open(filename, "r", encoding="utf-8") as file:
+        network = json.load(file)
+
+    version = network.get("version", 1)
+    if version > VERSION:
+        raise ValueError(f"Unsupported network file version {version}")
+
+    friends = [Friend(**friend_dict) for friend_dict in network["friend_list"]]
+    friend_by_user_id = {friend.user_id: friend for friend in friends}
+
+    # Version 1 files store whole friend records, version 2 files store user_id references
+    def from_reference(entry) -> Friend:
+        if isinstance(entry, str):
+            return friend_by_user_id.get(entry) or Friend(user_id=entry)
+
+        return Friend(**entry)
+
+    mutual_friends = {
+        friend_id: [from_reference(entry) for entry in entries]
+        for friend_id, entries in network["mutual_friends"].items()
+    }
+    return friends, mutual_friends
+
+
+def save_network_json(output_file_name, friends: Iterable[Friend], mutual_friends: Dict[str, Iterable[Friend]]):
+    friend_list = [friend.to_dict() for friend in friends]
+    friend_user_ids = {friend_dict["user_id"] for friend_dict in friend_list}
+    user_id_by_link = {friend_dict["link"]: friend_dict["user_id"] for friend_dict in friend_list}
+
+    def to_reference(mutual_friend: Friend):
+        if mutual_friend.user_id in friend_user_ids:
+            return mutual_friend.user_id
+        if mutual_friend.link in user_id_by_link:
+            return user_id_by_link[mutual_friend.link]
+
+        return mutual_friend.to_dict()
+
+    with open(output_file_name, "w") as outfile:
+        json.dump(
+            dict(
+                version=VERSION,
+                friend_list=friend_list,
+                mutual_friends={
+                    friend: [to_reference(mutual_friend) for mutual_friend in friend_mutual_friends]
+                    for friend, friend_mutual_friends in mutual_friends.items()
+                }
+            ),
+            outfile
+        )
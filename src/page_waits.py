@@ -0,0 +1,108 @@
+from collections import deque
+import threading
+import time
+from typing import Callable
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.wait import WebDriverWait
+
+
+# Timeout that follows the load times that are observed, so that slow connections are given more time and fast ones
+# do not wait for nothing when a page will not change anymore
+class AdaptiveTimeout(object):
+    def __init__(self, initial, minimum, maximum, factor=3.0, window=50):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self._durations = deque(maxlen=window)
+
+    @property
+    def value(self) -> float:
+        if not self._durations:
+            return self.initial
+
+        return min(self.maximum, max(self.minimum, self.factor * max(self._durations)))
+
+    def record(self, duration):
+        self._durations.append(duration)
+
+
+class PageWaiter(object):
+    POLL_FREQUENCY = 0.1
+    QUIET_PERIOD = 0.3
+
+    # Resolves when the page has changed and then stayed unchanged during the quiet period, or after the timeout
+    DOM_SETTLED_SCRIPT = """
+        const [quietPeriod, timeout, done] = arguments;
+        const start = performance.now();
+        let lastMutation = null;
+        const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+        observer.observe(document, {childList: true, subtree: true, attributes: true});
+        const timer = setInterval(() => {
+            const now = performance.now();
+            const settled = lastMutation !== null && now - lastMutation >= quietPeriod;
+            if (settled || now - start >= timeout) {
+                clearInterval(timer);
+                observer.disconnect();
+                done(settled);
+            }
+        }, 50);
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.page_load_timeout = AdaptiveTimeout(initial=10, minimum=2, maximum=30)
+        self.content_load_timeout = AdaptiveTimeout(initial=5, minimum=1, maximum=20)
+
+        self.total_wait_time = 0.0
+        self.number_of_waits = 0
+        self.number_of_timeouts = 0
+        self._lock = threading.Lock()
+
+    def wait_until(self, driver, condition: Callable, timeout) -> bool:
+        start = self.clock()
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=self.POLL_FREQUENCY).until(condition)
+            is_fulfilled = True
+        except TimeoutException:
+            is_fulfilled = False
+
+        self._record_wait(self.clock() - start, is_fulfilled)
+        return is_fulfilled
+
+    def wait_for_page(self, driver, condition: Callable) -> bool:
+        start = self.clock()
+        is_loaded = self.wait_until(driver, condition, self.page_load_timeout.value)
+        if is_loaded:
+            self.page_load_timeout.record(self.clock() - start)
+
+        return is_loaded
+
+    def wait_for_content(self, driver) -> bool:
+        timeout = self.content_load_timeout.value
+        driver.set_script_timeout(timeout + 5)
+
+        start = self.clock()
+        is_settled = bool(
+            driver.execute_async_script(self.DOM_SETTLED_SCRIPT, self.QUIET_PERIOD * 1000, timeout * 1000)
+        )
+        duration = self.clock() - start
+
+        self._record_wait(duration, is_settled)
+        if is_settled:
+            self.content_load_timeout.record(duration)
+
+        return is_settled
+
+    def report(self) -> str:
+        return (
+            f"Time spent waiting for pages: {self.total_wait_time:.1f} s in {self.number_of_waits} waits "
+            f"({self.number_of_timeouts} timed out)"
+        )
+
+    def _record_wait(self, duration, is_fulfilled):
+        with self._lock:
+            self.total_wait_time += duration
+            self.number_of_waits += 1
+            self.number_of_timeouts += not is_fulfilled
@@ -0,0 +1,36 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter(object):
+    def __init__(self, max_requests_per_second: Optional[float] = None, clock=time.monotonic, sleep=time.sleep):
+        self.max_requests_per_second = max_requests_per_second
+        self._clock = clock
+        self._sleep = sleep
+        self._next_request_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self._book_request()
+        if delay > 0:
+            self._sleep(delay)
+
+    async def wait_async(self):
+        # Same schedule as wait, so threads and coroutines can share one limiter
+        delay = self._book_request()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _book_request(self) -> float:
+        if not self.max_requests_per_second:
+            return 0.0
+
+        # Every caller books the next free slot, so concurrent callers are spread evenly instead of bursting
+        with self._lock:
+            now = self._clock()
+            request_time = max(now, self._next_request_time)
+            self._next_request_time = request_time + 1 / self.max_requests_per_second
+
+        return request_time - now
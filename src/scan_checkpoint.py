@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+from src.friend import Friend
+
+
+VERSION = 1
+
+
+# Append-only log of the progress of a scan. Every page read from Facebook is one JSON line that is flushed to disk
+# before the next request, so a scan that crashes can be resumed from its last page instead of from the beginning.
+# The file is only resumed by the scan that wrote it: a checkpoint of another scan is discarded and started again.
+class ScanCheckpoint(object):
+    def __init__(self, file_name, scan_id: Optional[str] = None):
+        self.file_name = file_name
+        self.scan_id = scan_id
+
+        self.friends: List[Friend] = []
+        self.friend_list_page_info = dict(has_next_page=True, end_cursor=None)
+        self.mutual_friends: Dict[str, List[Friend]] = {}
+        self.mutual_friends_page_info: Dict[str, dict] = {}
+        self.scanned_friend_ids: Set[str] = set()
+
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(self.file_name, "a")
+        if self._file.tell() == 0:
+            self._write(dict(version=VERSION, scan_id=self.scan_id))
+
+    def record_friends_page(self, friends: List[Friend], page_info: dict):
+        self._write(dict(type="friends", friends=[friend.to_dict() for friend in friends], page_info=page_info))
+
+    def record_mutual_friends_page(
+            self,
+            friend_id,
+            mutual_friends: List[Friend],
+            cursor: Optional[str] = None,
+            page_info: Optional[dict] = None,
+    ):
+        self._write(
+            dict(
+                type="mutual_friends",
+                friend_id=friend_id,
+                cursor=cursor,
+                friends=[friend.to_dict() for friend in mutual_friends],
+                page_info=page_info or dict(has_next_page=False, end_cursor=None),
+            )
+        )
+
+    def record_scanned_friend(self, friend_id):
+        self._write(dict(type="scanned", friend_id=friend_id))
+
+    def close(self):
+        self._file.close()
+
+    def _write(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _load(self):
+        if not os.path.exists(self.file_name):
+            return
+
+        valid_length = 0
+        with open(self.file_name, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line is incomplete when the process died while writing it
+                    break
+
+                if "version" in record and record.get("scan_id") != self.scan_id:
+                    # The header is the first line, so nothing of the other scan has been applied yet
+                    break
+
+                valid_length += len(line)
+                self._apply(record)
+
+        with open(self.file_name, "r+b") as file:
+            file.truncate(valid_length)
+
+    def _apply(self, record):
+        if "version" in record:
+            if record["version"] != VERSION:
+                raise ValueError(f"Unsupported scan checkpoint version {record['version']}")
+            return
+
+        if record["type"] == "friends":
+            self.friends += [Friend(**friend) for friend in record["friends"]]
+            self.friend_list_page_info = record["page_info"]
+        elif record["type"] == "mutual_friends":
+            friend_id = record["friend_id"]
+            # A page read without cursor starts the list again, for instance when a friend is read again after a crash
+            if record["cursor"] is None:
+                self.mutual_friends[friend_id] = []
+            self.mutual_friends[friend_id] += [Friend(**friend) for friend in record["friends"]]
+            self.mutual_friends_page_info[friend_id] = record["page_info"]
+        elif record["type"] == "scanned":
+            self.scanned_friend_ids.add(record["friend_id"])
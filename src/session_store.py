@@ -0,0 +1,83 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+
+class StoredSession(NamedTuple):
+    cookies: Dict[str, str]
+    fb_dtsg_token: str
+    created_at: float
+
+
+# Cookies and fb_dtsg token of logged-in sessions, so that a scan does not have to open a browser to log in again.
+# Sessions are encrypted with a key derived from the Facebook password, which is never stored.
+class SessionStore(object):
+    MAX_AGE = 7 * 24 * 60 * 60
+    REQUIRED_COOKIES = ("c_user", "xs")
+    KEY_DERIVATION_ITERATIONS = 390000
+    SALT_SIZE = 16
+
+    def __init__(self, directory, max_age=MAX_AGE, clock: Callable[[], float] = time.time):
+        self.directory = directory
+        self.max_age = max_age
+        self.clock = clock
+
+    def save(self, user, password, cookies: Dict[str, str], fb_dtsg_token):
+        salt = os.urandom(self.SALT_SIZE)
+        session = json.dumps(dict(cookies=cookies, fb_dtsg_token=fb_dtsg_token, created_at=self.clock()))
+        encrypted_session = Fernet(self._derive_key(password, salt)).encrypt(session.encode())
+
+        os.makedirs(self.directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(salt + encrypted_session)
+        os.replace(temporary_path, self._get_path(user))
+
+    def load(self, user, password) -> Optional[StoredSession]:
+        try:
+            with open(self._get_path(user), "rb") as file:
+                content = file.read()
+        except FileNotFoundError:
+            return None
+
+        salt, encrypted_session = content[:self.SALT_SIZE], content[self.SALT_SIZE:]
+        try:
+            session = StoredSession(**json.loads(Fernet(self._derive_key(password, salt)).decrypt(encrypted_session)))
+        except InvalidToken:
+            # Wrong password, or a file that was not written by this store
+            return None
+
+        if not self._is_valid(session):
+            return None
+
+        return session
+
+    def delete(self, user):
+        try:
+            os.remove(self._get_path(user))
+        except FileNotFoundError:
+            pass
+
+    def _is_valid(self, session: StoredSession) -> bool:
+        if self.clock() - session.created_at > self.max_age:
+            return False
+
+        return all(session.cookies.get(cookie) for cookie in self.REQUIRED_COOKIES) and bool(session.fb_dtsg_token)
+
+    def _derive_key(self, password, salt) -> bytes:
+        key_derivation = PBKDF2HMAC(
+            algorithm=hashes.SHA256(), length=32, salt=salt, iterations=self.KEY_DERIVATION_ITERATIONS
+        )
+        return base64.urlsafe_b64encode(key_derivation.derive(password.encode()))
+
+    def _get_path(self, user) -> str:
+        # The name of the file does not reveal the user
+        return os.path.join(self.directory, hashlib.sha256(user.encode()).hexdigest() + ".session")
@@ -1,12 +1,16 @@
 import os
 from pathlib import Path
+import tempfile
 from unittest import mock
 
 from django.conf import settings
 from django.core.files import File
 from django.test import Client, override_settings, TestCase
+import networkx as nx
 
+from core.analysis_cache import analysis_cache, community_cache
 from core.models import ScanInstance
+from src.communities import COMMUNITY_ALGORITHMS
 from src.friend_network import FriendNetwork
 
 
@@ -14,6 +18,16 @@ from src.friend_network import FriendNetwork
     MEDIA_ROOT=os.path.join("tests", "helpers", "media")
 )
 class AnalysisViewTests(TestCase):
+    def setUp(self) -> None:
+        analysis_cache.clear()
+        community_cache.clear()
+
+        community_cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(community_cache_dir.cleanup)
+        community_cache_settings = override_settings(COMMUNITY_CACHE_DIR=community_cache_dir.name)
+        community_cache_settings.enable()
+        self.addCleanup(community_cache_settings.disable)
+
     def tearDown(self) -> None:
         temp_dir = os.path.join(settings.MEDIA_ROOT, "temp")
         for f in os.listdir(temp_dir):
@@ -47,3 +61,101 @@ class AnalysisViewTests(TestCase):
         filter_biggest_component.assert_called_once()
         draw_graph_plotly.assert_called_once()
         plot.assert_called_once()
+
+    @mock.patch("plotly.offline.plot", return_value="")
+    @mock.patch.object(FriendNetwork, "draw_graph_plotly")
+    @mock.patch.object(FriendNetwork, "load_network", autospec=True, side_effect=FriendNetwork.load_network)
+    def test_network_is_prepared_once_for_repeated_requests(self, load_network, draw_graph_plotly, _):
+        # Given
+        with open("tests/helpers/network_example.json", "rb") as file:
+            instance = ScanInstance.objects.create(user="pepito", file=File(file, name="pepito.json"))
+        client = Client()
+        # When
+        client.get(f"/analysis/{instance.pk}")
+        client.get(f"/analysis/{instance.pk}")
+        client.post(f"/analysis/{instance.pk}", dict(num_communities=1))
+        # Then
+        load_network.assert_called_once()
+        self.assertEqual(3, draw_graph_plotly.call_count)
+        self.assertEqual(1, len(analysis_cache))
+
+    @mock.patch("plotly.offline.plot", return_value="")
+    @mock.patch.object(FriendNetwork, "draw_graph_plotly")
+    @mock.patch.object(FriendNetwork, "compute_positions")
+    def test_stored_layout_is_used_instead_of_computing_positions(self, compute_positions, draw_graph_plotly, _):
+        # Given
+        with open("tests/helpers/network_example.json", "rb") as file:
+            instance = ScanInstance.objects.create(
+                user="pepito",
+                file=File(file, name="pepito.json"),
+                layout={"123": [0.5, -0.5], "456": [-0.5, 0.5]},
+            )
+        # When
+        Client().get(f"/analysis/{instance.pk}")
+        # Then
+        network = analysis_cache.get_network(instance.pk, instance.file_path)
+        self.assertEqual([0.5, -0.5], network.node_positions["123"].tolist())
+        self.assertEqual([-0.5, 0.5], network.node_positions["456"].tolist())
+        self.assertNotIn(mock.call(seed=0), compute_positions.call_args_list)
+
+    @mock.patch("plotly.offline.plot", return_value="")
+    @mock.patch.object(FriendNetwork, "draw_graph_plotly")
+    def test_communities_are_detected_once_per_algorithm_and_number_of_communities(self, draw_graph_plotly, _):
+        # Given
+        with open("tests/helpers/network_example.json", "rb") as file:
+            instance = ScanInstance.objects.create(user="pepito", file=File(file, name="pepito.json"))
+        fluid = mock.MagicMock(side_effect=COMMUNITY_ALGORITHMS["fluid"])
+        louvain = mock.MagicMock(side_effect=COMMUNITY_ALGORITHMS["louvain"])
+        client = Client()
+        # When
+        with mock.patch.dict(COMMUNITY_ALGORITHMS, fluid=fluid, louvain=louvain):
+            client.post(f"/analysis/{instance.pk}", dict(algorithm="fluid", num_communities=1))
+            client.post(f"/analysis/{instance.pk}", dict(algorithm="fluid", num_communities=2))
+            client.post(f"/analysis/{instance.pk}", dict(algorithm="fluid", num_communities=1))
+            response = client.post(f"/analysis/{instance.pk}", dict(algorithm="louvain", num_communities=""))
+        # Then
+        self.assertEqual(2, fluid.call_count)
+        louvain.assert_called_once()
+        self.assertEqual([{"123", "456"}], draw_graph_plotly.call_args.kwargs["communities"])
+        self.assertContains(response, '<option value="louvain" selected>')
+        self.assertEqual(3, len(os.listdir(settings.COMMUNITY_CACHE_DIR)))
+
+    @mock.patch("plotly.offline.plot", return_value="")
+    @mock.patch.object(FriendNetwork, "detect_communities")
+    @mock.patch.object(FriendNetwork, "draw_graph_plotly")
+    def test_invalid_community_detection_is_shown_as_form_error(self, draw_graph_plotly, detect_communities, _):
+        # Given
+        with open("tests/helpers/network_example.json", "rb") as file:
+            instance = ScanInstance.objects.create(user="pepito", file=File(file, name="pepito.json"))
+        client = Client()
+        for data, error in [
+            (dict(algorithm="fluid", num_communities=""), "The algorithm fluid needs the number of communities"),
+            (dict(algorithm="unknown", num_communities="2"), "Select a valid choice"),
+            (dict(algorithm="louvain", num_communities="many"), "Enter a whole number"),
+            (dict(algorithm="fluid", num_communities="13"), "Ensure this value is less than or equal to 12"),
+            (dict(algorithm="fluid", num_communities="3"), "The network only has 2 friends"),
+        ]:
+            with self.subTest(data=data):
+                # When
+                response = client.post(f"/analysis/{instance.pk}", data)
+                # Then
+                self.assertContains(response, error)
+        detect_communities.assert_not_called()
+        draw_graph_plotly.assert_called_with()
+
+    @mock.patch("plotly.offline.plot", return_value="")
+    @mock.patch.object(
+        FriendNetwork, "detect_communities", side_effect=nx.NetworkXError("Fluid Communities require connected Graphs.")
+    )
+    @mock.patch.object(FriendNetwork, "draw_graph_plotly")
+    def test_failed_community_detection_is_shown_as_form_error(self, draw_graph_plotly, _, __):
+        # Given
+        with open("tests/helpers/network_example.json", "rb") as file:
+            instance = ScanInstance.objects.create(user="pepito", file=File(file, name="pepito.json"))
+        # When
+        response = Client().post(f"/analysis/{instance.pk}", dict(algorithm="fluid", num_communities="2"))
+        # Then
+        self.assertContains(
+            response, "The communities could not be detected: Fluid Communities require connected Graphs."
+        )
+        draw_graph_plotly.assert_called_with()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+from unittest import mock, TestCase
+
+import networkx as nx
+
+from core.analysis_cache import AnalysisCache
+from src.friend_network import FriendNetwork
+
+
+def prepare_network(filename, layout=None):
+    network = FriendNetwork()
+    network.graph = nx.path_graph(10)
+    return network
+
+
+@mock.patch.object(AnalysisCache, "_prepare_network", side_effect=prepare_network)
+class AnalysisCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_file(self, name, content):
+        filename = os.path.join(self.directory.name, name)
+        with open(filename, "w") as file:
+            file.write(content)
+
+        return filename
+
+    def test_networks_are_reused_while_the_file_content_does_not_change(self, prepare):
+        # Given
+        cache = AnalysisCache(max_bytes=10 ** 9)
+        filename = self.create_file("network.json", "first scan")
+        # When
+        first_network = cache.get_network(1, filename)
+        second_network = cache.get_network(1, filename)
+        # Then
+        self.assertIs(first_network, second_network)
+        prepare.assert_called_once_with(filename, None)
+
+        # When
+        self.create_file("network.json", "second scan, longer")
+        third_network = cache.get_network(1, filename)
+        # Then
+        self.assertIsNot(first_network, third_network)
+        self.assertEqual(2, prepare.call_count)
+
+    def test_least_recently_used_networks_are_evicted_when_memory_budget_is_exceeded(self, prepare):
+        # Given
+        network_size = 10 * AnalysisCache.NODE_BYTES + 9 * AnalysisCache.EDGE_BYTES
+        cache = AnalysisCache(max_bytes=2 * network_size)
+        filenames = [self.create_file(f"network_{i}.json", f"scan {i}") for i in range(3)]
+        cache.get_network(0, filenames[0])
+        cache.get_network(1, filenames[1])
+        cache.get_network(0, filenames[0])
+        # When
+        cache.get_network(2, filenames[2])
+        # Then
+        self.assertEqual(2, len(cache))
+        self.assertEqual(2 * network_size, cache.size)
+        cache.get_network(0, filenames[0])
+        self.assertEqual(3, prepare.call_count)
+        cache.get_network(1, filenames[1])
+        self.assertEqual(4, prepare.call_count)
+
+    def test_file_hashes_are_forgotten_with_old_file_versions_and_evicted_networks(self, _):
+        # Given
+        network_size = 10 * AnalysisCache.NODE_BYTES + 9 * AnalysisCache.EDGE_BYTES
+        cache = AnalysisCache(max_bytes=network_size)
+        first_filename = self.create_file("network_0.json", "scan 0")
+        cache.get_network(0, first_filename)
+        self.create_file("network_0.json", "scan 0, longer")
+        cache.get_network(0, first_filename)
+        # When
+        cache.get_network(1, self.create_file("network_1.json", "scan 1"))
+        # Then
+        self.assertEqual(1, len(cache))
+        self.assertEqual(1, len(cache._file_hashes))
+
+
+class PrepareNetworkTests(TestCase):
+    def test_prepared_networks_cannot_be_edited(self):
+        # When
+        network = AnalysisCache._prepare_network("tests/helpers/network_example.json")
+        # Then
+        self.assertTrue(nx.is_frozen(network.graph))
+        self.assertRaises(nx.NetworkXError, network.graph.add_edge, "123", "789")
@@ -0,0 +1,58 @@
+import threading
+import time
+from unittest import TestCase
+
+from src.browser_pool import BrowserPool
+
+
+class BrowserPoolTests(TestCase):
+    def test_every_item_is_read_once_by_some_browser(self):
+        # Given
+        pool = BrowserPool(["browser 1", "browser 2", "browser 3"])
+        used_browsers = set()
+
+        def read_page(browser, item):
+            used_browsers.add(browser)
+            time.sleep(0.01)
+            return item * 2
+
+        # When
+        results = dict(pool.map_unordered(read_page, range(12)))
+        # Then
+        self.assertEqual({item: item * 2 for item in range(12)}, results)
+        self.assertEqual({"browser 1", "browser 2", "browser 3"}, used_browsers)
+
+    def test_a_browser_is_never_used_by_two_threads_at_the_same_time(self):
+        # Given
+        pool = BrowserPool(["browser 1", "browser 2"])
+        browsers_in_use = []
+        lock = threading.Lock()
+
+        def read_page(browser, item):
+            with lock:
+                self.assertNotIn(browser, browsers_in_use)
+                browsers_in_use.append(browser)
+            time.sleep(0.01)
+            with lock:
+                browsers_in_use.remove(browser)
+
+        # When
+        results = list(pool.map_unordered(read_page, range(10)))
+        # Then
+        self.assertEqual(10, len(results))
+
+    def test_errors_are_raised_and_stop_the_pool(self):
+        # Given
+        pool = BrowserPool(["browser 1", "browser 2"])
+        read_items = []
+
+        def read_page(_, item):
+            read_items.append(item)
+            if item == 0:
+                raise ValueError("Page could not be loaded")
+            time.sleep(0.01)
+
+        # Then
+        with self.assertRaises(ValueError):
+            list(pool.map_unordered(read_page, range(100)))
+        self.assertLess(len(read_items), 100)
@@ -0,0 +1,196 @@
+import os
+import tempfile
+import time
+from unittest import mock, TestCase
+
+import networkx as nx
+
+from src.communities import (
+    balanced_partition,
+    COMMUNITY_ALGORITHMS,
+    community_dendrogram,
+    CommunityCache,
+    detect_communities,
+    graph_fingerprint,
+)
+
+
+class CommunityDetectionTests(TestCase):
+    def setUp(self) -> None:
+        self.graph = nx.relabel_nodes(nx.connected_caveman_graph(3, 5), str)
+
+    def test_every_algorithm_divides_the_graph_into_communities(self):
+        for algorithm in COMMUNITY_ALGORITHMS:
+            with self.subTest(algorithm=algorithm):
+                # When
+                communities = detect_communities(self.graph, algorithm, k=3, seed=0)
+                # Then
+                self.assertEqual(set(self.graph.nodes), set.union(*communities))
+                self.assertEqual(len(self.graph), sum(len(nodes) for nodes in communities))
+                self.assertEqual(sorted(map(len, communities), reverse=True), list(map(len, communities)))
+
+    def test_number_of_communities_is_respected(self):
+        for algorithm in ("fluid", "greedy_modularity"):
+            with self.subTest(algorithm=algorithm):
+                self.assertEqual(2, len(detect_communities(self.graph, algorithm, k=2, seed=0)))
+
+    def test_fluid_communities_need_the_number_of_communities(self):
+        self.assertRaises(ValueError, detect_communities, self.graph, "fluid")
+
+    def test_unknown_algorithm_raises_error(self):
+        self.assertRaises(ValueError, detect_communities, self.graph, "unknown", 2)
+
+    def test_graph_fingerprint_does_not_depend_on_insertion_order(self):
+        # Given
+        graph = nx.Graph()
+        graph.add_edges_from([("1", "2"), ("2", "3")])
+        same_graph = nx.Graph()
+        same_graph.add_edges_from([("3", "2"), ("2", "1")])
+        different_graph = nx.Graph()
+        different_graph.add_edges_from([("1", "2"), ("1", "3")])
+        # Then
+        self.assertEqual(graph_fingerprint(graph), graph_fingerprint(same_graph))
+        self.assertNotEqual(graph_fingerprint(graph), graph_fingerprint(different_graph))
+
+
+class CommunityCacheTests(TestCase):
+    def setUp(self) -> None:
+        self.graph = nx.relabel_nodes(nx.connected_caveman_graph(3, 5), str)
+        self.fluid = mock.MagicMock(side_effect=COMMUNITY_ALGORITHMS["fluid"])
+        self.louvain = mock.MagicMock(side_effect=COMMUNITY_ALGORITHMS["louvain"])
+        patcher = mock.patch.dict(COMMUNITY_ALGORITHMS, fluid=self.fluid, louvain=self.louvain)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_communities_are_detected_once_per_algorithm_k_and_seed(self):
+        # Given
+        cache = CommunityCache()
+        # When
+        first_communities = cache.get_communities(self.graph, "fluid", 2, seed=0)
+        cache.get_communities(self.graph, "fluid", 3, seed=0)
+        second_communities = cache.get_communities(self.graph, "fluid", 2, seed=0)
+        cache.get_communities(self.graph, "fluid", 2, seed=1)
+        # Then
+        self.assertIs(first_communities, second_communities)
+        self.assertEqual(3, self.fluid.call_count)
+        self.assertEqual(3, len(cache))
+
+    def test_number_of_communities_is_ignored_by_algorithms_that_choose_it(self):
+        # Given
+        cache = CommunityCache()
+        # When
+        cache.get_communities(self.graph, "louvain", 2, seed=0)
+        cache.get_communities(self.graph, "louvain", 3, seed=0)
+        # Then
+        self.louvain.assert_called_once()
+
+    def test_communities_are_shared_through_the_cache_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Given
+            communities = CommunityCache(directory).get_communities(self.graph, "fluid", 3, seed=0)
+            # When
+            loaded_communities = CommunityCache(directory).get_communities(self.graph, "fluid", 3, seed=0)
+            # Then
+            self.fluid.assert_called_once()
+            self.assertEqual(communities, loaded_communities)
+            self.assertEqual(1, len([name for name in os.listdir(directory) if name.endswith(".json")]))
+
+
+class CommunityDendrogramTests(TestCase):
+    def test_every_division_refines_the_previous_one(self):
+        # Given
+        graph = nx.relabel_nodes(nx.connected_caveman_graph(6, 8), str)
+        # When
+        dendrogram = community_dendrogram(graph, 8, seed=0)
+        # Then
+        self.assertEqual(list(range(2, 9)), list(dendrogram))
+        for k, communities in dendrogram.items():
+            self.assertEqual(k, len(communities))
+            self.assertEqual(set(graph.nodes), set.union(*communities))
+            if k > 2:
+                self.assertTrue(all(
+                    any(nodes <= previous_nodes for previous_nodes in dendrogram[k - 1]) for nodes in communities
+                ))
+
+    def test_cliques_are_found(self):
+        # Given
+        graph = nx.relabel_nodes(nx.connected_caveman_graph(6, 8), str)
+        # When
+        communities = community_dendrogram(graph, 6, seed=0)[6]
+        # Then
+        self.assertEqual(
+            sorted(sorted(map(int, nodes)) for nodes in communities),
+            [list(range(start, start + 8)) for start in range(0, 48, 8)],
+        )
+
+    def test_disconnected_graphs_start_with_their_components(self):
+        # Given
+        graph = nx.disjoint_union(nx.complete_graph(5), nx.complete_graph(4))
+        graph.add_node(9)
+        # When
+        dendrogram = community_dendrogram(graph, 4)
+        # Then
+        self.assertEqual([3, 4], list(dendrogram))
+        self.assertEqual([{0, 1, 2, 3, 4}, {5, 6, 7, 8}, {9}], dendrogram[3])
+
+    def test_divisions_stop_when_communities_cannot_be_split(self):
+        self.assertEqual({2: [{0}, {1}]}, community_dendrogram(nx.path_graph(2), 10))
+
+    def test_is_fast_on_big_graphs(self):
+        # Given
+        graph = nx.planted_partition_graph(20, 250, 0.05, 0.0005, seed=0)
+        # When
+        start = time.perf_counter()
+        dendrogram = community_dendrogram(graph, 20, seed=0)
+        elapsed_time = time.perf_counter() - start
+        # Then
+        self.assertEqual(20, len(dendrogram[20]))
+        self.assertLess(elapsed_time, 10)
+
+
+class BalancedPartitionTests(TestCase):
+    def test_cliques_are_seated_together(self):
+        # Given
+        graph = nx.relabel_nodes(nx.connected_caveman_graph(10, 10), str)
+        # When
+        groups = balanced_partition(graph, 8, 12, seed=0)
+        # Then
+        self.assertEqual(
+            sorted(sorted(map(int, nodes)) for nodes in groups),
+            [list(range(start, start + 10)) for start in range(0, 100, 10)],
+        )
+
+    def test_every_group_size_is_within_the_limits(self):
+        # Given
+        graph = nx.gnm_random_graph(103, 300, seed=1)
+        graph.add_nodes_from(range(103, 110))
+        # When
+        groups = balanced_partition(graph, 8, 12, seed=0)
+        # Then
+        self.assertEqual(set(graph.nodes), set.union(*groups))
+        self.assertEqual(len(graph), sum(len(nodes) for nodes in groups))
+        self.assertTrue(all(8 <= len(nodes) <= 12 for nodes in groups))
+
+    def test_oversized_communities_are_split_between_tables(self):
+        # Given
+        graph = nx.disjoint_union(nx.complete_graph(16), nx.complete_graph(8))
+        # When
+        groups = balanced_partition(graph, 8, 8, seed=0)
+        # Then
+        self.assertEqual([set(range(16, 24))], [nodes for nodes in groups if nodes == set(range(16, 24))])
+        self.assertTrue(all(nodes < set(range(16)) for nodes in groups if nodes != set(range(16, 24))))
+
+    def test_impossible_sizes_raise_error(self):
+        self.assertRaises(ValueError, balanced_partition, nx.path_graph(13), 8, 12)
+        self.assertRaises(ValueError, balanced_partition, nx.path_graph(13), 8, 6)
+
+    def test_is_fast_on_big_graphs(self):
+        # Given
+        graph = nx.connected_watts_strogatz_graph(2000, 10, 0.1, seed=0)
+        # When
+        start = time.perf_counter()
+        groups = balanced_partition(graph, 8, 12, seed=0)
+        elapsed_time = time.perf_counter() - start
+        # Then
+        self.assertTrue(all(8 <= len(nodes) <= 12 for nodes in groups))
+        self.assertLess(elapsed_time, 10)
@@ -0,0 +1,32 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management import call_command
+from django.test import override_settings, TestCase
+
+from core.models import ScanInstance
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join("tests", "helpers", "media")
+)
+class ComputeScanLayoutsCommandTests(TestCase):
+    def tearDown(self) -> None:
+        temp_dir = os.path.join(settings.MEDIA_ROOT, "networks")
+        for f in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, f))
+
+    def test_compute_layouts_of_scans_without_one(self):
+        # Given
+        with open("tests/helpers/network_example.json", "rb") as file:
+            ScanInstance.objects.create(user="Pepito", file=File(file, name="pepito.json"))
+        with open("tests/helpers/network_example.json", "rb") as file:
+            ScanInstance.objects.create(user="Jorgito", file=File(file, name="jorgito.json"), layout={"123": [0, 0]})
+        # When
+        call_command("compute_scan_layouts")
+        # Then
+        pepito_layout = ScanInstance.objects.get(user="Pepito").layout
+        self.assertEqual({"123", "456"}, set(pepito_layout))
+        self.assertEqual(2, len(pepito_layout["123"]))
+        self.assertEqual({"123": [0, 0]}, ScanInstance.objects.get(user="Jorgito").layout)
@@ -0,0 +1,44 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management import call_command
+from django.test import override_settings, TestCase
+
+from core.models import ScanInstance
+from src.friend_network import FriendNetwork
+from src.network_binary_file import BinaryNetworkFile
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join("tests", "helpers", "media")
+)
+class ConvertNetworkFilesCommandTests(TestCase):
+    def tearDown(self) -> None:
+        temp_dir = os.path.join(settings.MEDIA_ROOT, "networks")
+        for f in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, f))
+
+    def test_convert_network_files_to_binary_and_back(self):
+        # Given
+        with open("tests/helpers/network_example.json", "rb") as file:
+            ScanInstance.objects.create(user="Pepito", file=File(file, name="pepito.json"))
+        media_path = Path(settings.MEDIA_ROOT)
+        # When
+        call_command("convert_network_files", "binary", "--delete-originals")
+        # Then
+        instance = ScanInstance.objects.get(user="Pepito")
+        self.assertEqual("networks/pepito.fnet", instance.file.name)
+        self.assertTrue(BinaryNetworkFile.is_binary_network_file(media_path.joinpath(instance.file.name)))
+        self.assertFalse(media_path.joinpath("networks", "pepito.json").exists())
+
+        # When
+        call_command("convert_network_files", "json")
+        # Then
+        instance = ScanInstance.objects.get(user="Pepito")
+        self.assertEqual("networks/pepito.json", instance.file.name)
+        network = FriendNetwork()
+        network.load_network(str(media_path.joinpath(instance.file.name)))
+        self.assertEqual(["123", "456"], list(network.friends.user_id))
+        self.assertEqual({("123", "456")}, {tuple(sorted(edge)) for edge in network.graph.edges})
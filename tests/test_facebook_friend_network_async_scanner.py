@@ -0,0 +1,256 @@
+import asyncio
+import json
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, mock
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.facebook_friend_network_async_scanner import AsyncFacebookFriendNetworkGraphQLScanner
+from src.friend import Friend
+from src.network_binary_file import load_network_binary
+from src.network_json_file import load_network_json
+from src.rate_limiter import RateLimiter
+
+
+def user_node(user_id):
+    return dict(
+        node=dict(id=user_id, name=f"Friend {user_id}", url=f"friend{user_id}.com", gender="MALE", __typename="User")
+    )
+
+
+class FakeGraphQLServer(object):
+    def __init__(self, number_of_friends, delay=0.0):
+        self.friend_ids = [str(i) for i in range(number_of_friends)]
+        self.delay = delay
+        self.running_requests = 0
+        self.max_running_requests = 0
+        self.requests = []
+
+    async def handle(self, request):
+        form = await request.post()
+        variables = json.loads(form["variables"])
+        self.requests.append((form["fb_api_req_friendly_name"], variables))
+
+        self.running_requests += 1
+        self.max_running_requests = max(self.max_running_requests, self.running_requests)
+        await asyncio.sleep(self.delay)
+        self.running_requests -= 1
+
+        if form["fb_api_req_friendly_name"] == "FriendingCometFriendsListPaginationQuery":
+            return web.json_response(self.get_friend_list_page(variables["cursor"]))
+
+        return web.json_response(self.get_mutual_friends_page(variables["sourceID"], variables.get("cursor")))
+
+    def get_friend_list_page(self, cursor):
+        start = int(cursor or 0)
+        end = min(start + 30, len(self.friend_ids))
+        return dict(data=dict(viewer=dict(all_friends=dict(
+            edges=[user_node(user_id) for user_id in self.friend_ids[start:end]],
+            page_info=dict(has_next_page=end < len(self.friend_ids), end_cursor=str(end)),
+        ))))
+
+    def get_mutual_friends_page(self, friend_id, cursor):
+        # Every friend has the two friends that follow it in the list as mutual friends, one per page
+        position = self.friend_ids.index(friend_id)
+        page = int(cursor or 0)
+        mutual_friend_id = self.friend_ids[(position + page + 1) % len(self.friend_ids)]
+        return dict(data=dict(profile_list=dict(list_items=dict(
+            edges=[user_node(mutual_friend_id)],
+            page_info=dict(has_next_page=page == 0, end_cursor=str(page + 1)),
+        ))))
+
+
+class AsyncFacebookFriendNetworkGraphQLScannerTests(IsolatedAsyncioTestCase):
+    async def start_server(self, graphql_server: FakeGraphQLServer) -> str:
+        app = web.Application()
+        app.router.add_post("/api/graphql/", graphql_server.handle)
+        server = TestServer(app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        return str(server.make_url("/api/graphql/"))
+
+    async def test_scan_network(self):
+        # Given
+        graphql_server = FakeGraphQLServer(number_of_friends=40)
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner(dict(c_user="1"), "token", concurrency=5)
+        scanner.GRAPHQL_URL = await self.start_server(graphql_server)
+        messages = []
+        # When
+        await scanner.scan_network(notify=messages.append)
+        # Then
+        self.assertEqual(graphql_server.friend_ids, [friend.user_id for friend in scanner.friends])
+        self.assertEqual(graphql_server.friend_ids, list(scanner.mutual_friends))
+        self.assertEqual(
+            [
+                Friend(user_id="1", name="Friend 1", link="friend1.com"),
+                Friend(user_id="2", name="Friend 2", link="friend2.com"),
+            ],
+            scanner.mutual_friends["0"],
+        )
+        self.assertEqual(2 + 2 * 40, len(graphql_server.requests))
+        self.assertEqual(
+            (
+                "CometProfileListDialogListRefetchQuery",
+                dict(listType="MUTUAL_FRIENDS", sourceID="0", scale=1.5, cursor="1", count=10),
+            ),
+            [request for request in graphql_server.requests if request[1].get("sourceID") == "0"][1],
+        )
+        self.assertEqual(40 + 3, len(messages))
+        self.assertEqual("Finished scanning network", messages[-1])
+
+    async def test_concurrency_is_limited(self):
+        # Given
+        graphql_server = FakeGraphQLServer(number_of_friends=20, delay=0.02)
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner({}, "token", concurrency=4)
+        scanner.GRAPHQL_URL = await self.start_server(graphql_server)
+        # When
+        await scanner.scan_network()
+        # Then
+        self.assertEqual(4, graphql_server.max_running_requests)
+
+    async def test_cancelling_the_scan_cancels_pending_requests(self):
+        # Given
+        graphql_server = FakeGraphQLServer(number_of_friends=20, delay=0.05)
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner({}, "token", concurrency=2)
+        scanner.GRAPHQL_URL = await self.start_server(graphql_server)
+        scan = asyncio.create_task(scanner.scan_network())
+        # When
+        await asyncio.sleep(0.2)
+        scan.cancel()
+        # Then
+        with self.assertRaises(asyncio.CancelledError):
+            await scan
+        number_of_requests = len(graphql_server.requests)
+        await asyncio.sleep(0.2)
+        self.assertEqual(number_of_requests, len(graphql_server.requests))
+        self.assertLess(number_of_requests, 2 + 2 * 20)
+        self.assertIsNone(scanner._session)
+
+    async def test_scanner_from_logged_in_scanner_shares_its_session_and_rate_limit(self):
+        # Given
+        scanner = mock.MagicMock(_fb_dtsg_token="token", rate_limiter=RateLimiter(3))
+        scanner.session.cookies.get_dict.return_value = dict(c_user="1")
+        # When
+        async_scanner = AsyncFacebookFriendNetworkGraphQLScanner.from_scanner(scanner, concurrency=4)
+        # Then
+        self.assertEqual(dict(c_user="1"), async_scanner.cookies)
+        self.assertEqual("token", async_scanner._fb_dtsg_token)
+        self.assertEqual(4, async_scanner.concurrency)
+        self.assertIs(scanner.rate_limiter, async_scanner.rate_limiter)
+
+    async def test_save_network(self):
+        # Given
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner({}, "token")
+        scanner.friends = [
+            Friend(user_id="111", name="Pedro", link="pedro.com"),
+            Friend(user_id="222", name="Rufus", link="rufusbajista.com"),
+        ]
+        scanner.mutual_friends = {"111": [scanner.friends[1]], "222": [scanner.friends[0]]}
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for file_format, extension, load_network in (
+                ("json", ".json", load_network_json), ("binary", ".fnet", load_network_binary)
+        ):
+            with self.subTest(file_format=file_format):
+                file_name = os.path.join(directory.name, f"network{extension}")
+                # When
+                scanner.save_network(file_name, file_format=file_format)
+                # Then
+                friends, mutual_friends = load_network(file_name)
+                self.assertEqual(scanner.friends, friends)
+                self.assertEqual(scanner.mutual_friends, mutual_friends)
+
+        self.assertRaises(ValueError, scanner.save_network, os.path.join(directory.name, "network"), "csv")
+
+    async def test_requests_outside_a_session_raise_error(self):
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner({}, "token")
+        with self.assertRaises(RuntimeError):
+            await scanner.read_mutual_friends_from_graphql_api("1")
+
+    async def test_negative_number_of_retries_is_an_error(self):
+        # Given
+        graphql_server = FakeGraphQLServer(number_of_friends=3)
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner({}, "token")
+        scanner.GRAPHQL_URL = await self.start_server(graphql_server)
+        scanner.max_retries = -1
+        # Then
+        with self.assertRaises(ValueError):
+            await scanner.scan_network()
+        self.assertEqual([], graphql_server.requests)
+
+    @mock.patch("src.graphql_client.get_backoff_delay", return_value=0)
+    async def test_failed_requests_are_retried(self, _):
+        # Given
+        graphql_server = FakeGraphQLServer(number_of_friends=3)
+        handle = graphql_server.handle
+        failures = [web.Response(status=503), web.json_response(dict(error=1675004, errorSummary="Rate limit"))]
+
+        async def handle_with_failures(request):
+            if failures:
+                await request.read()
+                return failures.pop(0)
+            return await handle(request)
+
+        graphql_server.handle = handle_with_failures
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner({}, "token")
+        scanner.GRAPHQL_URL = await self.start_server(graphql_server)
+        # When
+        await scanner.scan_network()
+        # Then
+        self.assertEqual(["0", "1", "2"], list(scanner.mutual_friends))
+        self.assertEqual(0.5, scanner.limits.page_size_scale)
+
+    @mock.patch("src.graphql_client.get_backoff_delay", return_value=0)
+    async def test_throttling_lowers_the_number_of_requests_in_flight(self, _):
+        # Given
+        graphql_server = FakeGraphQLServer(number_of_friends=8, delay=0.05)
+        handle = graphql_server.handle
+        throttled_requests = []
+
+        async def handle_with_throttling(request):
+            # The friend list is read before any mutual friends, so every later request runs with the lower limit
+            if not throttled_requests:
+                throttled_requests.append(await request.read())
+                return web.json_response(dict(error=1675004, errorSummary="Rate limit"))
+            return await handle(request)
+
+        graphql_server.handle = handle_with_throttling
+        # Without a cap the throttling would set a rate so low that the requests never overlap
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner(
+            {}, "token", concurrency=4, rate_limiter=RateLimiter(1000)
+        )
+        scanner.GRAPHQL_URL = await self.start_server(graphql_server)
+        # When
+        await scanner.scan_network()
+        # Then
+        self.assertEqual(graphql_server.friend_ids, list(scanner.mutual_friends))
+        self.assertEqual(2, scanner.limits.concurrency)
+        self.assertEqual(2, graphql_server.max_running_requests)
+
+    @mock.patch("src.graphql_client.get_backoff_delay", return_value=0)
+    async def test_requests_in_flight_do_not_decrease_limits_again(self, _):
+        # Given
+        graphql_server = FakeGraphQLServer(number_of_friends=4, delay=0.3)
+        handle = graphql_server.handle
+        throttled_requests = []
+
+        async def handle_with_throttling(request):
+            form = await request.post()
+            is_friend_list_request = form["fb_api_req_friendly_name"] == "FriendingCometFriendsListPaginationQuery"
+            # The first mutual friends requests are all in flight when they are throttled
+            if not is_friend_list_request and len(throttled_requests) < 4:
+                throttled_requests.append(form["variables"])
+                await asyncio.sleep(graphql_server.delay)
+                return web.json_response(dict(error=1675004, errorSummary="Rate limit"))
+            return await handle(request)
+
+        graphql_server.handle = handle_with_throttling
+        scanner = AsyncFacebookFriendNetworkGraphQLScanner({}, "token", concurrency=4, rate_limiter=RateLimiter(8))
+        scanner.GRAPHQL_URL = await self.start_server(graphql_server)
+        # When
+        await scanner.scan_network()
+        # Then
+        self.assertEqual(["0", "1", "2", "3"], list(scanner.mutual_friends))
+        self.assertEqual(4, scanner.rate_limiter.max_requests_per_second)
@@ -1,11 +1,19 @@
 import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 from unittest import mock, TestCase
 import urllib
 
+import requests
 import requests_mock
 
 from src.facebook_friend_network_graphql_scanner import FacebookFriendNetworkGraphQLScanner
 from src.friend import Friend
+from src.graphql_client import GraphQLError
+from src.session_store import StoredSession
 
 
 @mock.patch.object(FacebookFriendNetworkGraphQLScanner, "_log_into_facebook", return_value=None)
@@ -245,3 +253,226 @@ class FacebookFriendNetworkGraphQLScannerTests(TestCase):
             ],
             read_mutual_friends.call_args_list
         )
+
+    @mock.patch.object(FacebookFriendNetworkGraphQLScanner, "read_all_friends_from_graphql_api")
+    def test_scan_network_without_notifications(self, _, __):
+        # Given
+        ffn = FacebookFriendNetworkGraphQLScanner("username", "password")
+        ffn.friends = [Friend(user_id="222", name="Andrew", link="http://www.facebook.com/andrew")]
+
+        def read_mutual_friends(user_id):
+            ffn.mutual_friends[user_id] = []
+
+        # When
+        with mock.patch.object(ffn, "read_mutual_friends_from_graphql_api", side_effect=read_mutual_friends):
+            with mock.patch("builtins.print") as print_mock:
+                ffn.scan_network(notify=None)
+        # Then
+        self.assertEqual({"222": []}, ffn.mutual_friends)
+        print_mock.assert_not_called()
+
+    @mock.patch.object(FacebookFriendNetworkGraphQLScanner, "read_all_friends_from_graphql_api")
+    def test_scan_network_reads_friends_concurrently(self, _, __):
+        # Given
+        ffn = FacebookFriendNetworkGraphQLScanner("username", "password", concurrency=4)
+        ffn.friends = [Friend(user_id=str(i), name=f"Friend {i}", link=f"friend{i}.com") for i in range(8)]
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def read_mutual_friends(user_id):
+            with lock:
+                running.append(user_id)
+                max_running.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(user_id)
+            ffn.mutual_friends[user_id] = [Friend(user_id="111", name="Pedro", link="iampedro.com")]
+
+        notify = mock.MagicMock()
+        # When
+        with mock.patch.object(ffn, "read_mutual_friends_from_graphql_api", side_effect=read_mutual_friends):
+            ffn.scan_network(notify=notify)
+        # Then
+        self.assertEqual(4, max(max_running))
+        self.assertEqual([friend.user_id for friend in ffn.friends], list(ffn.mutual_friends))
+        self.assertEqual(8, notify.call_count)
+        adapter = ffn.session.get_adapter("https://www.facebook.com")
+        self.assertEqual(10, adapter.poolmanager.connection_pool_kw["maxsize"])
+
+    @mock.patch.object(FacebookFriendNetworkGraphQLScanner, "read_all_friends_from_graphql_api")
+    def test_failed_friend_stops_reading_the_other_friends(self, _, __):
+        # Given
+        ffn = FacebookFriendNetworkGraphQLScanner("username", "password", concurrency=2)
+        ffn.friends = [Friend(user_id=str(i), name=f"Friend {i}", link=f"friend{i}.com") for i in range(200)]
+        read_user_ids = []
+
+        def read_mutual_friends(user_id):
+            read_user_ids.append(user_id)
+            if user_id == "0":
+                raise GraphQLError("Session expired")
+            time.sleep(0.05)
+            ffn.mutual_friends[user_id] = []
+
+        # When
+        with mock.patch.object(ffn, "read_mutual_friends_from_graphql_api", side_effect=read_mutual_friends):
+            self.assertRaises(GraphQLError, ffn.scan_network, notify=mock.MagicMock())
+        # Then
+        self.assertLess(len(read_user_ids), 10)
+
+    @requests_mock.Mocker()
+    def test_requests_wait_for_the_rate_limiter(self, _, req_mock):
+        # Given
+        req_mock.post(
+            "https://www.facebook.com/api/graphql/",
+            json=dict(data=dict(profile_list=dict(list_items=dict(
+                edges=[], page_info=dict(has_next_page=False, end_cursor=None)
+            )))),
+        )
+        ffn = FacebookFriendNetworkGraphQLScanner("username", "password", max_requests_per_second=5)
+        # When
+        with mock.patch.object(ffn.rate_limiter, "wait") as wait:
+            ffn.read_mutual_friends_from_graphql_api("12345")
+        # Then
+        self.assertEqual(5, ffn.rate_limiter.max_requests_per_second)
+        wait.assert_called_once()
+
+    @requests_mock.Mocker()
+    def test_resume_scan_from_checkpoint(self, _, req_mock):
+        # Given
+        def user_node(user_id):
+            return dict(node=dict(id=user_id, name=f"Friend {user_id}", url=f"friend{user_id}.com", __typename="User"))
+
+        def graphql_response(request, _):
+            form = urllib.parse.parse_qs(request.text)
+            variables = json.loads(form["variables"][0])
+            if form["fb_api_req_friendly_name"][0] == "FriendingCometFriendsListPaginationQuery":
+                return dict(data=dict(viewer=dict(all_friends=dict(
+                    edges=[dict(node=dict(user_node(user_id)["node"], gender="MALE")) for user_id in ("1", "2")],
+                    page_info=dict(has_next_page=False, end_cursor=None),
+                ))))
+
+            is_first_page = "cursor" not in variables
+            return dict(data=dict(profile_list=dict(list_items=dict(
+                edges=[user_node("3" if is_first_page else "4")],
+                page_info=dict(has_next_page=is_first_page, end_cursor="page2"),
+            ))))
+
+        # The connection is lost while reading the second page of mutual friends of the second friend
+        def fail_on_fifth_request(request, context):
+            if req_mock.call_count == 5:
+                raise requests.ConnectionError("Connection lost")
+            return graphql_response(request, context)
+
+        checkpoint_file = os.path.join(tempfile.mkdtemp(), "scan.jsonl")
+        self.addCleanup(shutil.rmtree, os.path.dirname(checkpoint_file))
+
+        req_mock.post("https://www.facebook.com/api/graphql/", json=fail_on_fifth_request)
+        failing_ffn = FacebookFriendNetworkGraphQLScanner("username", "password")
+        failing_ffn.graphql_client.max_retries = 0
+        with self.assertRaises(requests.ConnectionError):
+            failing_ffn.scan_network(notify=mock.MagicMock(), checkpoint_file=checkpoint_file)
+
+        req_mock.reset_mock()
+        req_mock.post("https://www.facebook.com/api/graphql/", json=graphql_response)
+        ffn = FacebookFriendNetworkGraphQLScanner("username", "password")
+        # When
+        ffn.scan_network(notify=mock.MagicMock(), checkpoint_file=checkpoint_file)
+        # Then
+        self.assertEqual(1, req_mock.call_count)
+        last_request_variables = json.loads(urllib.parse.parse_qs(req_mock.last_request.text)["variables"][0])
+        self.assertEqual("page2", last_request_variables["cursor"])
+        self.assertEqual(["1", "2"], [friend.user_id for friend in ffn.friends])
+        expected_mutual_friends = [
+            Friend(user_id="3", name="Friend 3", link="friend3.com"),
+            Friend(user_id="4", name="Friend 4", link="friend4.com"),
+        ]
+        self.assertEqual(dict([("1", expected_mutual_friends), ("2", expected_mutual_friends)]), ffn.mutual_friends)
+        self.assertIsNone(ffn.checkpoint)
+
+    @mock.patch.object(FacebookFriendNetworkGraphQLScanner, "read_all_friends_from_graphql_api")
+    def test_incremental_scan_only_reads_new_and_refreshed_friends(self, _, __):
+        # Given
+        friends = [Friend(user_id=str(i), name=f"Friend {i}", link=f"friend{i}.com") for i in range(6)]
+        removed_friend = Friend(user_id="9", name="Friend 9", link="friend9.com")
+        previous_mutual_friends = {
+            "0": [friends[1], removed_friend],
+            "1": [friends[0]],
+            "2": [],
+            "3": [],
+            "4": [],
+            "9": [friends[0]],
+        }
+        ffn = FacebookFriendNetworkGraphQLScanner("username", "password")
+        ffn.friends = friends
+
+        def read_mutual_friends(user_id):
+            ffn.mutual_friends[user_id] = [friends[0]] if user_id == "5" else []
+
+        # When
+        number_of_reused_friends = ffn.reuse_mutual_friends(previous_mutual_friends, refresh_fraction=0.2, seed=0)
+        with mock.patch.object(
+                ffn, "read_mutual_friends_from_graphql_api", side_effect=read_mutual_friends
+        ) as read_mutual_friends_mock:
+            ffn.scan_network(notify=mock.MagicMock())
+        # Then
+        self.assertEqual(4, number_of_reused_friends)
+        self.assertEqual(
+            [mock.call("3"), mock.call("5")],
+            read_mutual_friends_mock.call_args_list
+        )
+        self.assertEqual([friend.user_id for friend in friends], list(ffn.mutual_friends))
+        self.assertEqual([friends[1], friends[5]], ffn.mutual_friends["0"])
+        self.assertEqual([friends[0]], ffn.mutual_friends["1"])
+
+    @requests_mock.Mocker()
+    def test_scanner_from_session_does_not_open_browser(self, log_into_facebook, req_mock):
+        # Given
+        req_mock.post(
+            "https://www.facebook.com/api/graphql/",
+            json=dict(data=dict(profile_list=dict(list_items=dict(
+                edges=[], page_info=dict(has_next_page=False, end_cursor=None)
+            )))),
+        )
+        # When
+        ffn = FacebookFriendNetworkGraphQLScanner.from_session(dict(c_user="1234", xs="secret"), "token")
+        ffn.read_mutual_friends_from_graphql_api("12345")
+        # Then
+        self.driver_creation_mock.Chrome.assert_not_called()
+        log_into_facebook.assert_not_called()
+        self.assertEqual("c_user=1234; xs=secret", req_mock.last_request.headers["Cookie"])
+        self.assertIn("fb_dtsg=token", req_mock.last_request.text)
+
+    @requests_mock.Mocker()
+    def test_log_in_reuses_stored_session_while_it_is_alive(self, log_into_facebook, req_mock):
+        # Given
+        req_mock.post(
+            "https://www.facebook.com/api/graphql/",
+            json=dict(data=dict(viewer=dict(all_friends=dict(
+                edges=[], page_info=dict(has_next_page=False, end_cursor=None)
+            )))),
+        )
+        session_store = mock.MagicMock()
+        session_store.load.return_value = StoredSession(dict(c_user="1234", xs="secret"), "token", 0)
+        # When
+        ffn = FacebookFriendNetworkGraphQLScanner.log_in("username", "password", session_store, concurrency=4)
+        # Then
+        self.driver_creation_mock.Chrome.assert_not_called()
+        self.assertEqual("token", ffn._fb_dtsg_token)
+        self.assertEqual(4, ffn.concurrency)
+        session_store.save.assert_not_called()
+
+    @requests_mock.Mocker()
+    def test_log_in_with_browser_when_stored_session_has_expired(self, log_into_facebook, req_mock):
+        # Given
+        req_mock.post("https://www.facebook.com/api/graphql/", text="for (;;);{\"error\":1357001}")
+        session_store = mock.MagicMock()
+        session_store.load.return_value = StoredSession(dict(c_user="1234", xs="secret"), "token", 0)
+        # When
+        ffn = FacebookFriendNetworkGraphQLScanner.log_in("username", "password", session_store)
+        # Then
+        log_into_facebook.assert_called_once()
+        session_store.delete.assert_called_once_with("username")
+        session_store.save.assert_called_once_with(
+            "username", "password", ffn.session.cookies.get_dict(), ffn._fb_dtsg_token
+        )
@@ -1,14 +1,19 @@
+import itertools
 import json
 import os
+import time
 from unittest import mock, TestCase
 
 import requests_mock
 from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.keys import Keys
 from webdriver_manager.chrome import ChromeDriverManager
 
 from src.facebook_friend_network_scanner import FacebookFriendNetworkScanner
 from src.friend import Friend
+from src.network_binary_file import BinaryNetworkFile
+from src.page_waits import PageWaiter
 
 
 @mock.patch.object(FacebookFriendNetworkScanner, "_log_into_facebook", return_value=None)
@@ -59,6 +64,7 @@ class FacebookFriendNetworkScannerTests(TestCase):
 
         self.assertEqual(
             dict(
+                version=2,
                 friend_list=[
                     dict(user_id="111", name="Pedro", link="pedro.com", gender=None),
                     dict(user_id="222", name="Rufus", link="rufusbajista.com", gender=None),
@@ -66,13 +72,8 @@ class FacebookFriendNetworkScannerTests(TestCase):
                     dict(user_id="444", name="AleyDani", link="dosecuatorianosymedio.com", gender=None),
                 ],
                 mutual_friends={
-                    "111": [
-                        dict(user_id="222", name="Rufus", link="rufusbajista.com", gender=None)
-                    ],
-                    "444": [
-                        dict(user_id="222", name="Rufus", link="rufusbajista.com", gender=None),
-                        dict(user_id="333", name="Juni", link="juni.com", gender=None),
-                    ]
+                    "111": ["222"],
+                    "444": ["222", "333"],
                 }
             ),
             saved_data
@@ -80,6 +81,26 @@ class FacebookFriendNetworkScannerTests(TestCase):
         # Finally
         os.remove("tests/helpers/output_file.json")
 
+    def test_save_network_to_binary_file(self, _):
+        # Given
+        ffn = FacebookFriendNetworkScanner("username", "password")
+        ffn.friends = [
+            Friend(user_id="111", name="Pedro", link="pedro.com"),
+            Friend(user_id="222", name="Rufus", link="rufusbajista.com"),
+        ]
+        ffn.mutual_friends["111"] = [
+            Friend(user_id="222", name="Rufus", link="rufusbajista.com"),
+        ]
+        # When
+        ffn.save_network("tests/helpers/output_file.fnet", file_format="binary")
+        # Then
+        network_file = BinaryNetworkFile("tests/helpers/output_file.fnet")
+        self.assertEqual(["Pedro", "Rufus"], list(network_file.get_friend_columns()["name"]))
+        self.assertEqual([1], list(network_file.get_mutual_friend_positions(0)))
+        # Finally
+        del network_file
+        os.remove("tests/helpers/output_file.fnet")
+
     def test_infer_user_id_from_profile_link_if_mutual_friend_user_id_is_missing(self, _):
         # Given
         ffn = FacebookFriendNetworkScanner("username", "password")
@@ -330,3 +351,88 @@ class FacebookFriendNetworkScannerTests(TestCase):
         ffn.scan_network(notify)
         # Then
         self.assertLess(0, notify.call_count)
+
+    @mock.patch(
+        "src.facebook_friend_network_scanner.FacebookFriendNetworkScanner.read_mutual_friends_from_friend_profile",
+        autospec=True
+    )
+    @mock.patch.object(FacebookFriendNetworkScanner, "read_all_friends_from_graphql_api")
+    def test_scan_network_with_many_browsers(self, _, read_mutual_friends, __):
+        # Given
+        drivers = [self.driver_mock, mock.MagicMock(), mock.MagicMock()]
+        self.driver_creation_mock.Chrome.side_effect = drivers
+        self.driver_mock.get_cookies.return_value = [dict(name="c_user", value="1234", sameSite="None")]
+        ffn = FacebookFriendNetworkScanner("username", "password", browsers=3)
+        ffn.friends = [Friend(user_id=str(i), name=f"Friend {i}", link=f"friend{i}.com") for i in range(9)]
+        used_drivers = set()
+
+        def read_mutual_friends_function(obj, user_id, driver):
+            used_drivers.add(driver)
+            time.sleep(0.01)
+            obj.mutual_friends[user_id] = [Friend(user_id="111", name="Pedro", link="iampedro.com")]
+
+        read_mutual_friends.side_effect = read_mutual_friends_function
+        # When
+        ffn.scan_network()
+        # Then
+        self.assertEqual(set(drivers), used_drivers)
+        self.assertEqual([friend.user_id for friend in ffn.friends], list(ffn.mutual_friends))
+        for driver in drivers[1:]:
+            driver.add_cookie.assert_called_once_with(dict(name="c_user", value="1234"))
+            driver.quit.assert_called_once()
+        self.driver_mock.quit.assert_not_called()
+
+    def test_get_common_friends_with_one_call_to_the_browser(self, _):
+        # Given
+        self.driver_mock.execute_script.return_value = [
+            ["https://www.facebook.com/ana.girbesalborch", "Ana Giral\n12 mutual friends"],
+            ["https://www.facebook.com/borja.tuby", "Borja Canet Rodriguez"],
+        ]
+        # When
+        friends = FacebookFriendNetworkScanner._get_mutual_friends_from_mutual_friends_html(self.driver_mock)
+        # Then
+        self.assertEqual(
+            [
+                Friend(name="Ana Giral", link="https://www.facebook.com/ana.girbesalborch"),
+                Friend(name="Borja Canet Rodriguez", link="https://www.facebook.com/borja.tuby"),
+            ],
+            friends
+        )
+        self.driver_mock.execute_script.assert_called_once()
+        self.driver_mock.find_elements_by_css_selector.assert_not_called()
+
+    def test_get_common_friends_fails_without_mutual_friends_panel(self, _):
+        # Given
+        self.driver_mock.execute_script.return_value = None
+        # Then
+        with self.assertRaises(NoSuchElementException):
+            FacebookFriendNetworkScanner._get_mutual_friends_from_mutual_friends_html(self.driver_mock)
+
+    @mock.patch.object(
+        FacebookFriendNetworkScanner, "_mutual_friends_page_is_loading", side_effect=[True, True, True, True, False]
+    )
+    def test_keep_scrolling_after_a_timeout_while_the_page_is_loading(self, _, __):
+        # Given
+        ffn = FacebookFriendNetworkScanner("username", "password")
+        ffn.page_waiter = PageWaiter()
+        self.driver_mock.execute_async_script.side_effect = [True, False, True, True]
+        # When
+        ffn._wait_until_all_mutual_friends_are_loaded()
+        # Then
+        self.assertEqual(4, self.driver_mock.find_element_by_xpath("//body").send_keys.call_count)
+        self.assertEqual(5, ffn.page_waiter.number_of_waits)
+        self.assertEqual(1, ffn.page_waiter.number_of_timeouts)
+
+    @mock.patch.object(FacebookFriendNetworkScanner, "_mutual_friends_page_is_loading", return_value=True)
+    def test_error_when_the_page_is_loading_but_nothing_else_is_loaded(self, _, __):
+        # Given
+        ffn = FacebookFriendNetworkScanner("username", "password")
+        clock_times = itertools.count(step=1)
+        ffn.page_waiter = PageWaiter(clock=lambda: next(clock_times))
+        self.driver_mock.execute_async_script.side_effect = itertools.chain([True], itertools.repeat(False))
+        # When
+        with self.assertRaises(TimeoutException):
+            ffn._wait_until_all_mutual_friends_are_loaded()
+        # Then
+        send_keys = self.driver_mock.find_element_by_xpath("//body").send_keys
+        self.assertLess(send_keys.call_count, ffn.page_waiter.content_load_timeout.maximum)
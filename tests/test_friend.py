@@ -15,7 +15,7 @@ class FriendTests(TestCase):
         # When
         self.assertEqual(
             {'user_id': '123', 'name': 'Andrés', 'link': 'andrew.com', 'gender': 'MALE'},
-            vars(friend)
+            friend.to_dict()
         )
 
     def test_string_representation(self):
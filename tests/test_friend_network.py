@@ -1,8 +1,16 @@
-from unittest import TestCase
+import hashlib
+import json
+import os
+import tempfile
+from unittest import mock, TestCase
 
+from matplotlib.collections import LineCollection
+import matplotlib.pyplot as plt
+import networkx as nx
 import pandas as pd
 from pandas._testing import assert_series_equal
 
+from src.communities import CommunityCache, graph_fingerprint
 from src.friend import Friend
 from src.friend_network import FriendNetwork
 from src.friend_set import FriendSet
@@ -56,3 +64,350 @@ class FacebookFriendNetworkTests(TestCase):
             pd.Series([1, 2, 1, 2, 1, 2, 1, 0, 2], index=["1", "2", "3", "4", "5", "6", "7", "8", "9"]),
             community_mapping
         )
+
+    def test_edges_with_links_that_do_not_belong_to_any_friend_are_reported_and_ignored(self):
+        # Given
+        friends = FriendSet([
+            Friend(user_id="1", name="Ruf", link="ruf.com"),
+            Friend(user_id="2", name="Pau", link="pau.com"),
+        ])
+        mutual_friends = {
+            "1": FriendSet([Friend(user_id="2", name="Pau", link="pau.com")]),
+            "2": FriendSet([
+                Friend(user_id="1", name="Ruf", link="ruf.com"),
+                Friend(user_id="3", name="Stranger", link="stranger.com"),
+            ]),
+        }
+        # When
+        with self.assertWarns(UserWarning):
+            ffn = FriendNetwork(friends=friends, mutual_friends=mutual_friends)
+        # Then
+        self.assertEqual({"stranger.com"}, ffn.unresolved_links)
+        self.assertEqual({("1", "2")}, {tuple(sorted(edge)) for edge in ffn.graph.edges})
+        self.assertEqual({"1", "2"}, set(ffn.graph.nodes))
+
+    def test_edges_of_sample_network_are_built(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.load_network("sample_data/my_anonymized_network.json")
+        # When
+        edges = ffn._get_network_edges()
+        # Then
+        self.assertEqual(3690, len(edges))
+        self.assertEqual(set(), ffn.unresolved_links)
+
+    def test_get_person_friends(self):
+        # Given
+        ffn = FriendNetwork(
+            friends=FriendSet([
+                Friend(user_id="1", name="Ruf", link="ruf.com"),
+                Friend(user_id="2", name="Pau", link="pau.com"),
+                Friend(user_id="3", name="Juni", link="juni.com"),
+            ]),
+            mutual_friends={
+                "1": FriendSet([Friend(user_id="2", name="Pau", link="pau.com")]),
+                "3": FriendSet([Friend(user_id="1", name="Ruf", link="ruf.com")]),
+            }
+        )
+        # When
+        friend_names = ffn.get_person_friend_names(name="Ruf")
+        # Then
+        self.assertEqual({"Pau", "Juni"}, set(friend_names))
+
+    def test_load_network_with_mutual_friends_before_friend_list(self):
+        # Given
+        with open("tests/helpers/network_example.json", "r") as file:
+            network = json.load(file)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "network.json")
+            with open(filename, "w") as file:
+                json.dump(dict(mutual_friends=network["mutual_friends"], friend_list=network["friend_list"]), file)
+
+            ffn = FriendNetwork()
+            # When
+            ffn.load_network(filename)
+        # Then
+        self.assertEqual(
+            {"123": FriendSet([Friend(user_id="456", name="Pau", link="pau.com")])},
+            {"123": ffn.mutual_friends["123"]}
+        )
+        self.assertEqual({("123", "456")}, {tuple(sorted(edge)) for edge in ffn.graph.edges})
+
+    def test_loaded_mutual_friends_are_views_of_the_friend_list(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.load_network("tests/helpers/network_example.json")
+        # When
+        ffn.friends.filter(user_id="456").name = "Pau Gasol"
+        # Then
+        self.assertEqual(["Pau Gasol"], list(ffn.mutual_friends["123"].name))
+
+    def test_anonymize_hashes_every_friend_once(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.load_network("tests/helpers/network_example.json")
+        anonymous_ruf = hashlib.sha256("123".encode()).hexdigest()
+        anonymous_pau = hashlib.sha256("456".encode()).hexdigest()
+        # When
+        ffn.anonymize()
+        # Then
+        self.assertEqual([anonymous_ruf, anonymous_pau], list(ffn.friends.user_id))
+        self.assertEqual([anonymous_pau], list(ffn.mutual_friends[anonymous_ruf].link))
+        self.assertEqual([anonymous_ruf], list(ffn.mutual_friends[anonymous_pau].name))
+
+    def test_anonymize_keeps_the_mutual_friends_that_are_not_in_the_friend_list(self):
+        # Given
+        friends = FriendSet([
+            Friend(user_id="1", name="Ruf", link="ruf.com"),
+            Friend(user_id="2", name="Pau", link="pau.com"),
+        ])
+        mutual_friends = {
+            "1": FriendSet([Friend(user_id="2", name="Pau", link="pau.com")]),
+            "2": FriendSet([
+                Friend(user_id="1", name="Ruf", link="ruf.com"),
+                Friend(user_id="3", name="Stranger", link="stranger.com", gender="FEMALE"),
+            ]),
+        }
+        with self.assertWarns(UserWarning):
+            ffn = FriendNetwork(friends=friends, mutual_friends=mutual_friends)
+        anonymous_ids = {user_id: hashlib.sha256(user_id.encode()).hexdigest() for user_id in ("1", "2", "3")}
+        # When
+        ffn.anonymize()
+        # Then
+        self.assertEqual([anonymous_ids["2"]], list(ffn.mutual_friends[anonymous_ids["1"]].link))
+        self.assertEqual(
+            [anonymous_ids["1"], anonymous_ids["3"]], list(ffn.mutual_friends[anonymous_ids["2"]].link)
+        )
+        self.assertEqual([None, "FEMALE"], list(ffn.mutual_friends[anonymous_ids["2"]].gender))
+
+    def test_edges_resolve_repeated_links_to_the_first_friend(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.friends = FriendSet([
+            Friend(user_id="1", name="Ruf", link="ruf.com"),
+            Friend(user_id="2", name="Pau", link="pau.com"),
+            Friend(user_id="3", name="Ruf again", link="ruf.com"),
+        ])
+        ffn.mutual_friends = {"2": FriendSet([Friend(user_id="1", name="Ruf", link="ruf.com")])}
+        # When
+        edges = ffn._get_network_edges()
+        # Then
+        self.assertEqual([("2", "1")], edges)
+
+    def test_save_network_stores_mutual_friends_as_references_and_loads_it_back(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.load_network("tests/helpers/network_example.json")
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "network.json")
+            # When
+            ffn.save_network(filename)
+            with open(filename, "r") as file:
+                saved_network = json.load(file)
+
+            loaded_ffn = FriendNetwork()
+            loaded_ffn.load_network(filename)
+        # Then
+        self.assertEqual(2, saved_network["version"])
+        self.assertEqual({"123": ["456"], "456": ["123"]}, saved_network["mutual_friends"])
+        self.assertEqual(ffn.friends, loaded_ffn.friends)
+        self.assertEqual(ffn.mutual_friends, loaded_ffn.mutual_friends)
+        self.assertEqual({("123", "456")}, {tuple(sorted(edge)) for edge in loaded_ffn.graph.edges})
+
+    def test_mutual_friends_that_are_not_in_the_friend_list_are_saved_as_whole_records(self):
+        # Given
+        ffn = FriendNetwork(
+            friends=FriendSet([Friend(user_id="1", name="Ruf", link="ruf.com")]),
+            mutual_friends={"1": FriendSet([Friend(name="Stranger", link="stranger.com")])},
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "network.json")
+            # When
+            ffn.save_network(filename)
+            with open(filename, "r") as file:
+                saved_network = json.load(file)
+        # Then
+        self.assertEqual(
+            {"1": [dict(user_id=None, name="Stranger", link="stranger.com", gender=None)]},
+            saved_network["mutual_friends"]
+        )
+
+    def test_load_network_from_a_newer_file_version_raises_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "network.json")
+            with open(filename, "w") as file:
+                json.dump(dict(version=3, friend_list=[], mutual_friends={}), file)
+
+            self.assertRaises(ValueError, FriendNetwork().load_network, filename)
+
+    def test_positions_are_computed_once_and_only_when_they_are_needed(self):
+        # Given
+        layout = mock.MagicMock(side_effect=lambda graph, seed: nx.circular_layout(graph))
+        ffn = FriendNetwork()
+        ffn.compute_positions(layout=layout, seed=0)
+        # When
+        ffn.load_network("tests/helpers/network_example.json")
+        ffn.filter_biggest_component()
+        ffn.compute_positions(layout=layout, seed=0)
+        # Then
+        layout.assert_not_called()
+
+        # When
+        first_positions = ffn.node_positions
+        second_positions = ffn.node_positions
+        # Then
+        layout.assert_called_once_with(ffn.graph, seed=0)
+        self.assertIs(first_positions, second_positions)
+        self.assertEqual({"123", "456"}, set(first_positions))
+
+    def test_layout_can_be_selected_by_name(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.load_network("tests/helpers/network_example.json")
+        layout = mock.MagicMock(side_effect=lambda graph, seed: nx.circular_layout(graph))
+        # When
+        with mock.patch.dict("src.friend_network.LAYOUTS", barnes_hut=layout):
+            ffn.compute_positions(layout="barnes_hut", seed=0)
+        positions = ffn.node_positions
+        # Then
+        layout.assert_called_once_with(ffn.graph, seed=0)
+        self.assertEqual({"123", "456"}, set(positions))
+
+    def test_positions_are_recomputed_when_the_graph_changes(self):
+        # Given
+        layout = mock.MagicMock(side_effect=lambda graph, seed: nx.circular_layout(graph))
+        ffn = FriendNetwork()
+        ffn.load_network("tests/helpers/network_example.json")
+        ffn.graph.add_node("789")
+        ffn.compute_positions(layout=layout)
+        self.assertEqual({"123", "456", "789"}, set(ffn.node_positions))
+        # When
+        ffn.filter_biggest_component()
+        # Then
+        self.assertEqual({"123", "456"}, set(ffn.node_positions))
+        self.assertEqual(2, layout.call_count)
+
+    def test_draw_graph_plotly_packs_every_edge_in_a_single_trace(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.path_graph(4)
+        nx.set_node_attributes(ffn.graph, {node: f"Friend {node}" for node in ffn.graph.nodes}, "name")
+        ffn.node_positions = {node: (node, -node) for node in reversed(list(ffn.graph.nodes))}
+        # When
+        figure = ffn.draw_graph_plotly(communities=({0, 1}, {2, 3}))
+        # Then
+        edges_trace, nodes_trace = figure.data
+        self.assertEqual("scatter", edges_trace.type)
+        self.assertEqual(3 * 3, len(edges_trace.x))
+        self.assertEqual([0, 1], list(edges_trace.x[:2]))
+        self.assertEqual([0, 1, 2, 3], list(nodes_trace.x))
+        self.assertEqual(("Friend 0", "Friend 1", "Friend 2", "Friend 3"), nodes_trace.text)
+        self.assertEqual([1, 1, 2, 2], list(nodes_trace.marker.color))
+
+    def test_draw_graph_plotly_uses_webgl_for_big_graphs(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.connected_watts_strogatz_graph(2000, 6, 0.1, seed=0)
+        ffn.node_positions = nx.circular_layout(ffn.graph)
+        # When
+        figure = ffn.draw_graph_plotly()
+        # Then
+        self.assertEqual(["scattergl", "scattergl"], [trace.type for trace in figure.data])
+
+    def test_draw_graph_matplotlib_draws_edges_and_nodes_as_single_collections(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.path_graph(4)
+        nx.set_node_attributes(ffn.graph, {node: f"Friend {node}" for node in ffn.graph.nodes}, "name")
+        ffn.node_positions = nx.circular_layout(ffn.graph)
+        # When
+        figure = ffn.draw_graph_matplotlib(communities=({0, 1}, {2, 3}), label_proportion=1, rasterized=True)
+        # Then
+        [ax] = figure.axes
+        edges_collection, nodes_collection = ax.collections
+        self.assertIsInstance(edges_collection, LineCollection)
+        self.assertEqual(3, len(edges_collection.get_segments()))
+        self.assertEqual(4, len(nodes_collection.get_offsets()))
+        self.assertTrue(edges_collection.get_rasterized())
+        self.assertEqual({"Friend 0", "Friend 1", "Friend 2", "Friend 3"}, {text.get_text() for text in ax.texts})
+        plt.close(figure)
+
+    def test_draw_graph_matplotlib_aggregates_edges_of_big_graphs_into_a_density_image(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.connected_watts_strogatz_graph(2000, 10, 0.1, seed=0)
+        ffn.node_positions = nx.circular_layout(ffn.graph)
+        # When
+        with mock.patch.object(FriendNetwork, "MATPLOTLIB_DENSITY_THRESHOLD", 1000):
+            figure = ffn.draw_graph_matplotlib(label_proportion=0)
+        # Then
+        [ax] = figure.axes
+        [image] = ax.images
+        self.assertGreater(image.get_array().count(), 0)
+        self.assertEqual(1, len(ax.collections))
+        plt.close(figure)
+
+    def test_detect_communities_uses_the_cache_until_the_graph_changes(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.relabel_nodes(nx.connected_caveman_graph(3, 5), str)
+        cache = CommunityCache()
+        # When
+        first_communities = ffn.detect_communities("fluid", 3, seed=0, cache=cache)
+        second_communities = ffn.detect_communities("fluid", 3, seed=0, cache=cache)
+        ffn.graph.add_edge("0", "15")
+        ffn.detect_communities("fluid", 3, seed=0, cache=cache)
+        # Then
+        self.assertIs(first_communities, second_communities)
+        self.assertEqual(2, len(cache))
+
+    def test_graph_fingerprint_changes_with_edits_that_keep_the_size_of_the_graph(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.relabel_nodes(nx.connected_caveman_graph(3, 5), str)
+        fingerprint = ffn.graph_fingerprint
+        # When
+        ffn.graph.remove_edge("1", "2")
+        ffn.graph.add_edge("1", "7")
+        # Then
+        self.assertNotEqual(fingerprint, ffn.graph_fingerprint)
+
+    def test_graph_fingerprint_of_a_frozen_graph_is_computed_once_until_the_graph_is_replaced(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.freeze(nx.relabel_nodes(nx.connected_caveman_graph(3, 5), str))
+        # When
+        with mock.patch("src.friend_network.graph_fingerprint", side_effect=graph_fingerprint) as fingerprint:
+            first_fingerprint = ffn.graph_fingerprint
+            second_fingerprint = ffn.graph_fingerprint
+            graph = nx.Graph(ffn.graph)
+            graph.remove_edge("1", "2")
+            graph.add_edge("1", "7")
+            ffn.graph = nx.freeze(graph)
+            third_fingerprint = ffn.graph_fingerprint
+        # Then
+        self.assertEqual(first_fingerprint, second_fingerprint)
+        self.assertNotEqual(first_fingerprint, third_fingerprint)
+        self.assertEqual(2, fingerprint.call_count)
+
+    def test_community_dendrogram_has_a_division_for_every_number_of_communities(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.relabel_nodes(nx.connected_caveman_graph(4, 8), str)
+        # When
+        dendrogram = ffn.community_dendrogram(max_communities=4, seed=0)
+        # Then
+        self.assertEqual([2, 3, 4], list(dendrogram))
+        self.assertEqual([8, 8, 8, 8], [len(nodes) for nodes in dendrogram[4]])
+
+    def test_balanced_partition_seats_friends_in_tables(self):
+        # Given
+        ffn = FriendNetwork()
+        ffn.graph = nx.relabel_nodes(nx.connected_caveman_graph(3, 10), str)
+        # When
+        tables = ffn.balanced_partition(min_size=8, max_size=12, seed=0)
+        # Then
+        self.assertEqual([10, 10, 10], [len(nodes) for nodes in tables])
@@ -1,4 +1,4 @@
-from unittest import TestCase
+from unittest import mock, TestCase
 
 from src.friend import Friend
 from src.friend_set import FriendSet
@@ -48,7 +48,7 @@ class FriendSetTests(TestCase):
         # Then
         self.assertEqual(
             ["pedro.com", "rufusbajista.com", "juni.com", "dosecuatorianosymedio.com"],
-            links
+            list(links)
         )
 
     def test_get_list_of_non_existent_attribute_raises_attribute_error(self):
@@ -98,3 +98,67 @@ class FriendSetTests(TestCase):
         self.assertEqual(friend_set_equal, self.friends_set)
         self.assertNotEqual(friend_set_different, self.friends_set)
         self.assertNotEqual(friend_set_different_length, self.friends_set)
+
+    def test_filter_all_returns_every_friend_with_those_attributes(self):
+        # Given
+        friend_set = FriendSet([
+            Friend(user_id="111", name="Juni", link="juni.com", gender="FEMALE"),
+            Friend(user_id="222", name="Rufus", link="rufusbajista.com"),
+            Friend(user_id="333", name="Juni", link="juni2.com", gender="FEMALE"),
+        ])
+        # When
+        friends = friend_set.filter_all(name="Juni", gender="FEMALE")
+        # Then
+        self.assertEqual(
+            FriendSet([
+                Friend(user_id="111", name="Juni", link="juni.com", gender="FEMALE"),
+                Friend(user_id="333", name="Juni", link="juni2.com", gender="FEMALE"),
+            ]),
+            friends
+        )
+        self.assertEqual(0, len(friend_set.filter_all(name="Juni", gender="MALE")))
+
+    def test_filter_many_looks_up_friends_in_the_given_order(self):
+        # When
+        friends = self.friends_set.filter_many(user_id=["444", "111"])
+        # Then
+        self.assertEqual(
+            FriendSet([
+                Friend(user_id="444", name="AleyDani", link="dosecuatorianosymedio.com"),
+                Friend(user_id="111", name="Pedro", link="pedro.com"),
+            ]),
+            friends
+        )
+        self.assertRaises(ValueError, self.friends_set.filter_many, user_id=["111", "999"])
+
+    def test_indexes_are_invalidated_when_the_set_is_mutated(self):
+        # Given
+        friend_set = FriendSet([Friend(user_id="111", name="Pedro", link="pedro.com")])
+        self.assertRaises(ValueError, friend_set.filter, user_id="222")
+        # When
+        friend_set.append(Friend(user_id="222", name="Rufus", link="rufusbajista.com"))
+        # Then
+        self.assertEqual(
+            Friend(user_id="222", name="Rufus", link="rufusbajista.com"),
+            friend_set.filter(user_id="222")
+        )
+
+        # When
+        friend_set[0] = Friend(user_id="333", name="Juni", link="juni.com")
+        # Then
+        self.assertEqual(Friend(user_id="333", name="Juni", link="juni.com"), friend_set.filter(link="juni.com"))
+        self.assertRaises(ValueError, friend_set.filter, link="pedro.com")
+
+    def test_lookups_by_user_id_do_not_scan_the_whole_set(self):
+        # Given
+        friend_set = FriendSet([
+            Friend(user_id=str(i), name=f"Friend {i}", link=f"friend{i}.com")
+            for i in range(5000)
+        ])
+        user_ids = [str(i) for i in range(0, 5000, 50)]
+        # When
+        with mock.patch.object(FriendSet, "_has_attributes", wraps=FriendSet._has_attributes) as has_attributes:
+            friends = friend_set.filter_many(user_id=user_ids)
+        # Then
+        self.assertEqual(user_ids, list(friends.user_id))
+        self.assertEqual(user_ids, [friend.user_id for (friend, _), _ in has_attributes.call_args_list])
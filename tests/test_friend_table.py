@@ -0,0 +1,65 @@
+import tracemalloc
+from unittest import TestCase
+
+import numpy as np
+
+from src.friend import Friend
+from src.friend_set import FriendSet
+from src.friend_table import FriendRow, FriendTable
+
+
+class FriendTableTests(TestCase):
+    def test_rows_are_views_of_the_table(self):
+        # Given
+        table = FriendTable()
+        row = table.append(Friend(user_id="111", name="Pedro", link="pedro.com", gender="MALE"))
+        friend = table.row(row)
+        # When
+        friend.name = "Pedro Pablo"
+        # Then
+        self.assertIsInstance(friend, FriendRow)
+        self.assertEqual("Pedro Pablo", table.get("name", row))
+        self.assertEqual(
+            {"user_id": "111", "name": "Pedro Pablo", "link": "pedro.com", "gender": "MALE"},
+            table.row(row).to_dict()
+        )
+
+    def test_table_grows_beyond_its_initial_capacity(self):
+        # Given
+        table = FriendTable()
+        # When
+        for i in range(3 * FriendTable.INITIAL_CAPACITY):
+            table.append(Friend(user_id=str(i)))
+        # Then
+        self.assertEqual(3 * FriendTable.INITIAL_CAPACITY, table.size)
+        self.assertEqual([str(i) for i in range(3 * FriendTable.INITIAL_CAPACITY)], list(table.column("user_id")))
+
+    def test_columns_are_read_only_views_without_copies(self):
+        # Given
+        table = FriendTable()
+        table.append(Friend(user_id="111"))
+        table.append(Friend(user_id="222"))
+        # When
+        first_column = table.column("user_id")
+        second_column = table.column("user_id")
+        # Then
+        self.assertTrue(np.shares_memory(first_column, second_column))
+        self.assertFalse(first_column.flags.writeable)
+
+    def test_friend_set_takes_less_memory_than_friend_objects(self):
+        # Given
+        friends_info = [
+            dict(user_id=str(i), name=f"Friend {i}", link=f"friend{i}.com", gender="MALE")
+            for i in range(10000)
+        ]
+        tracemalloc.start()
+        # When
+        start, _ = tracemalloc.get_traced_memory()
+        friends = [Friend(**friend_info) for friend_info in friends_info]
+        after_friends, _ = tracemalloc.get_traced_memory()
+        friend_set = FriendSet(friends)
+        after_friend_set, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Then
+        self.assertEqual(10000, len(friend_set))
+        self.assertLess(2 * (after_friend_set - after_friends), after_friends - start)
@@ -0,0 +1,189 @@
+from email.utils import formatdate
+import json
+import time
+from unittest import mock, TestCase
+
+import requests
+import requests_mock
+
+from src.graphql_client import (
+    AdaptiveLimits, get_backoff_delay, GraphQLClient, GraphQLError, parse_response, ThrottledError, TransientError
+)
+from src.rate_limiter import RateLimiter
+
+
+GRAPHQL_URL = "https://www.facebook.com/api/graphql/"
+FRIEND_LIST = dict(data=dict(viewer=dict(all_friends=dict(edges=[], page_info=dict(has_next_page=False)))))
+
+
+class ParseResponseTests(TestCase):
+    def test_parse_data(self):
+        self.assertEqual(FRIEND_LIST, parse_response(200, json.dumps(FRIEND_LIST).encode()))
+
+    def test_detect_throttling(self):
+        with self.assertRaises(ThrottledError):
+            parse_response(200, b'for (;;);{"error":1675004,"errorSummary":"Rate limit exceeded"}')
+        with self.assertRaises(ThrottledError):
+            parse_response(200, json.dumps(dict(errors=[dict(message="Rate limit exceeded")])).encode())
+        with self.assertRaises(ThrottledError) as context:
+            parse_response(429, b"", retry_after="7")
+        self.assertEqual(7, context.exception.retry_after)
+
+    def test_retry_after_can_be_an_http_date(self):
+        for retry_after, expected_delay in [
+            (formatdate(time.time() + 30, usegmt=True), 30),
+            ("Wed, 21 Oct 2015 07:28:00 GMT", 0),
+            ("soon", None),
+        ]:
+            with self.subTest(retry_after=retry_after):
+                with self.assertRaises(ThrottledError) as context:
+                    parse_response(429, b"", retry_after=retry_after)
+                if expected_delay is None:
+                    self.assertIsNone(context.exception.retry_after)
+                else:
+                    self.assertAlmostEqual(expected_delay, context.exception.retry_after, delta=2)
+
+    def test_server_errors_are_transient(self):
+        with self.assertRaises(TransientError):
+            parse_response(503, b"")
+
+    def test_other_errors_are_not_transient(self):
+        for status, content in [(200, b'for (;;);{"error":1357001}'), (200, b"<html></html>"), (404, b"")]:
+            with self.subTest(status=status, content=content):
+                with self.assertRaises(GraphQLError) as context:
+                    parse_response(status, content)
+                self.assertNotIsInstance(context.exception, TransientError)
+
+
+class BackoffTests(TestCase):
+    def test_delay_grows_exponentially_with_jitter(self):
+        self.assertEqual(4, get_backoff_delay(3, random_fraction=lambda: 0))
+        self.assertEqual(8, get_backoff_delay(3, random_fraction=lambda: 1))
+        self.assertEqual(60, get_backoff_delay(20, maximum=60, random_fraction=lambda: 1))
+
+
+class AdaptiveLimitsTests(TestCase):
+    def test_limits_grow_while_requests_succeed(self):
+        # Given
+        rate_limiter = RateLimiter(20)
+        limits = AdaptiveLimits(max_concurrency=8, rate_limiter=rate_limiter)
+        limits.concurrency = 2
+        rate_limiter.max_requests_per_second = 10
+        # When
+        for _ in range(AdaptiveLimits.SUCCESSES_TO_GROW):
+            limits.record_success()
+        # Then
+        self.assertEqual(3, limits.concurrency)
+        self.assertEqual(12, limits.page_size(10))
+        self.assertAlmostEqual(11, rate_limiter.max_requests_per_second)
+
+    def test_request_rate_never_grows_above_its_cap(self):
+        for cap, expected_rate in [(2, 2), (None, AdaptiveLimits.MAX_REQUESTS_PER_SECOND_WITHOUT_CAP)]:
+            with self.subTest(cap=cap):
+                # Given
+                rate_limiter = RateLimiter(cap)
+                limits = AdaptiveLimits(max_concurrency=8, rate_limiter=rate_limiter)
+                limits.record_throttling()
+                # When
+                for _ in range(1000):
+                    limits.record_success()
+                # Then
+                self.assertAlmostEqual(expected_rate, rate_limiter.max_requests_per_second)
+
+    def test_limits_are_halved_when_throttled(self):
+        # Given
+        rate_limiter = RateLimiter()
+        limits = AdaptiveLimits(max_concurrency=8, rate_limiter=rate_limiter)
+        # When
+        limits.record_throttling()
+        # Then
+        self.assertEqual(4, limits.concurrency)
+        self.assertEqual(5, limits.page_size(10))
+        self.assertEqual(AdaptiveLimits.REQUESTS_PER_SECOND_AFTER_THROTTLING, rate_limiter.max_requests_per_second)
+        # When
+        limits.record_throttling()
+        # Then
+        self.assertEqual(AdaptiveLimits.REQUESTS_PER_SECOND_AFTER_THROTTLING / 2, rate_limiter.max_requests_per_second)
+
+    def test_requests_in_flight_do_not_decrease_limits_again(self):
+        # Given
+        rate_limiter = RateLimiter(4)
+        limits = AdaptiveLimits(max_concurrency=8, rate_limiter=rate_limiter)
+        with limits.slot() as first_request, limits.slot() as second_request:
+            # When
+            limits.record_throttling(first_request)
+            limits.record_throttling(second_request)
+        # Then
+        self.assertEqual(4, limits.concurrency)
+        self.assertEqual(2, rate_limiter.max_requests_per_second)
+        # When
+        for _ in range(3):
+            with limits.slot() as request:
+                limits.record_throttling(request)
+        # Then
+        self.assertEqual(AdaptiveLimits.MIN_REQUESTS_PER_SECOND, rate_limiter.max_requests_per_second)
+
+
+class GraphQLClientTests(TestCase):
+    def setUp(self):
+        self.sleep = mock.MagicMock()
+        self.client = GraphQLClient(requests.session(), sleep=self.sleep)
+
+    @requests_mock.Mocker()
+    def test_transient_failures_are_retried(self, req_mock):
+        # Given
+        req_mock.post(GRAPHQL_URL, [
+            dict(exc=requests.ConnectionError),
+            dict(status_code=502),
+            dict(json=FRIEND_LIST),
+        ])
+        # When
+        api_info = self.client.post({}, "")
+        # Then
+        self.assertEqual(FRIEND_LIST, api_info)
+        self.assertEqual(3, req_mock.call_count)
+        self.assertEqual(2, self.sleep.call_count)
+        self.assertEqual(GraphQLClient.TIMEOUT, req_mock.last_request.timeout)
+
+    @requests_mock.Mocker()
+    def test_throttling_slows_down_requests(self, req_mock):
+        # Given
+        req_mock.post(GRAPHQL_URL, [
+            dict(status_code=429, headers={"Retry-After": "30"}),
+            dict(json=FRIEND_LIST),
+        ])
+        # When
+        self.client.post({}, "")
+        # Then
+        self.sleep.assert_called_once_with(30)
+        self.assertEqual(
+            AdaptiveLimits.REQUESTS_PER_SECOND_AFTER_THROTTLING, self.client.rate_limiter.max_requests_per_second
+        )
+
+    @requests_mock.Mocker()
+    def test_error_is_raised_when_retries_are_exhausted(self, req_mock):
+        # Given
+        req_mock.post(GRAPHQL_URL, status_code=500)
+        self.client.max_retries = 2
+        # Then
+        with self.assertRaises(TransientError):
+            self.client.post({}, "")
+        self.assertEqual(3, req_mock.call_count)
+
+    @requests_mock.Mocker()
+    def test_negative_number_of_retries_is_an_error(self, req_mock):
+        # Given
+        self.client.max_retries = -1
+        # Then
+        with self.assertRaises(ValueError):
+            self.client.post({}, "")
+        self.assertEqual(0, req_mock.call_count)
+
+    @requests_mock.Mocker()
+    def test_permanent_errors_are_not_retried(self, req_mock):
+        # Given
+        req_mock.post(GRAPHQL_URL, text='for (;;);{"error":1357001}')
+        # Then
+        with self.assertRaises(GraphQLError):
+            self.client.post({}, "")
+        self.assertEqual(1, req_mock.call_count)
@@ -0,0 +1,49 @@
+import io
+import json
+from unittest import TestCase
+
+from src.json_stream import JsonStreamReader
+
+
+class JsonStreamReaderTests(TestCase):
+    def test_iterate_through_nested_objects_and_arrays_in_small_chunks(self):
+        # Given
+        document = {
+            "friend_list": [{"user_id": "1", "name": "Ruf"}, {"user_id": "22", "name": "Pau"}],
+            "count": 12345,
+            "mutual_friends": {"1": [{"link": "pau.com"}], "22": [], "333": ["1", "22"]},
+        }
+        reader = JsonStreamReader(io.StringIO(json.dumps(document, indent=2)), chunk_size=3)
+        # When
+        read_document = {}
+        for key in reader.iter_object():
+            if key == "friend_list":
+                read_document[key] = list(reader.iter_array())
+            elif key == "mutual_friends":
+                read_document[key] = {friend_id: list(reader.iter_array()) for friend_id in reader.iter_object()}
+            else:
+                read_document[key] = reader.read_value()
+        # Then
+        self.assertEqual(document, read_document)
+
+    def test_empty_containers(self):
+        # Given
+        reader = JsonStreamReader(io.StringIO('{"friend_list": [ ], "mutual_friends": {}}'), chunk_size=1)
+        # When
+        keys = []
+        for key in reader.iter_object():
+            keys.append(key)
+            if key == "friend_list":
+                self.assertEqual([], list(reader.iter_array()))
+            else:
+                self.assertEqual([], list(reader.iter_object()))
+        # Then
+        self.assertEqual(["friend_list", "mutual_friends"], keys)
+
+    def test_malformed_document_raises_json_decode_error(self):
+        # Given
+        reader = JsonStreamReader(io.StringIO('{"friend_list": [1, 2 3]}'))
+        # Then
+        with self.assertRaises(json.JSONDecodeError):
+            for _ in reader.iter_object():
+                list(reader.iter_array())
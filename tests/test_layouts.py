@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+import networkx as nx
+import numpy as np
+
+from src.layouts import _get_repulsive_forces, barnes_hut_layout, LAYOUTS
+
+
+class BarnesHutLayoutTests(TestCase):
+    def test_empty_and_single_node_graphs(self):
+        # Given
+        graph = nx.Graph()
+        # When
+        empty_positions = barnes_hut_layout(graph)
+        graph.add_node("123")
+        single_positions = barnes_hut_layout(graph)
+        # Then
+        self.assertEqual({}, empty_positions)
+        self.assertEqual(["123"], list(single_positions))
+        np.testing.assert_array_equal([0, 0], single_positions["123"])
+
+    def test_every_node_gets_a_position_inside_the_unit_square(self):
+        # Given
+        graph = nx.connected_watts_strogatz_graph(200, 4, 0.1, seed=0)
+        # When
+        positions = barnes_hut_layout(graph, seed=0)
+        # Then
+        self.assertEqual(set(graph.nodes), set(positions))
+        coordinates = np.array(list(positions.values()))
+        self.assertEqual((200, 2), coordinates.shape)
+        self.assertLessEqual(np.abs(coordinates).max(), 1 + 1e-9)
+
+    def test_same_seed_gives_same_layout(self):
+        # Given
+        graph = nx.connected_watts_strogatz_graph(100, 4, 0.1, seed=0)
+        # When
+        first_positions = barnes_hut_layout(graph, seed=1)
+        second_positions = barnes_hut_layout(graph, seed=1)
+        # Then
+        for node in graph.nodes:
+            np.testing.assert_array_equal(first_positions[node], second_positions[node])
+
+    def test_repulsive_forces_are_close_to_the_exact_ones(self):
+        # Given
+        positions = np.random.default_rng(0).random((100, 2))
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance_squared = np.maximum((delta ** 2).sum(axis=2), 1e-4)
+        np.fill_diagonal(distance_squared, np.inf)
+        expected_forces = (delta * (0.01 / distance_squared)[:, :, None]).sum(axis=1)
+        # When
+        forces = _get_repulsive_forces(positions, 0.1, theta=0.8)
+        # Then
+        self.assertLess(np.linalg.norm(forces - expected_forces), 5e-2 * np.linalg.norm(expected_forces))
+
+    def test_communities_are_drawn_apart(self):
+        # Given
+        graph = nx.disjoint_union(nx.complete_graph(30), nx.complete_graph(30))
+        graph.add_edge(0, 30)
+        # When
+        positions = barnes_hut_layout(graph, seed=0)
+        # Then
+        coordinates = np.array([positions[node] for node in graph.nodes])
+        first_center, second_center = coordinates[:30].mean(axis=0), coordinates[30:].mean(axis=0)
+        spread = max(coordinates[:30].std(axis=0).max(), coordinates[30:].std(axis=0).max())
+        self.assertGreater(np.linalg.norm(first_center - second_center), 3 * spread)
+
+    def test_every_layout_places_every_node(self):
+        # Given
+        graph = nx.connected_watts_strogatz_graph(60, 4, 0.1, seed=0)
+        for name, layout in LAYOUTS.items():
+            with self.subTest(layout=name):
+                # When
+                positions = layout(graph, seed=0)
+                # Then
+                self.assertEqual(set(graph.nodes), set(positions))
@@ -0,0 +1,150 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from src.friend import Friend
+from src.friend_network import convert_network_file, FriendNetwork
+from src.friend_set import FriendSet
+from src.network_binary_file import BinaryNetworkFile, load_network_binary, save_network_binary
+from src.network_json_file import load_network_json, save_network_json
+
+
+class BinaryNetworkFileTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "network.fnet")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @staticmethod
+    def get_network_with_mutual_friends_that_are_not_friends():
+        pedro = Friend(user_id="111", name="Pedro", link="pedro.com", gender="MALE")
+        rufus = Friend(user_id="222", name="Rufus", link="rufusbajista.com")
+        mutual_friends = {
+            "111": [rufus, Friend(user_id="999", name="Hidden", link="hidden.com")],
+            "222": [Friend(user_id="999", name="Hidden", link="hidden.com")],
+            "999": [pedro],
+        }
+        return [pedro, rufus], mutual_friends
+
+    @staticmethod
+    def to_dicts(friends, mutual_friends):
+        return (
+            [friend.to_dict() for friend in friends],
+            {
+                friend_id: [mutual_friend.to_dict() for mutual_friend in friend_mutual_friends]
+                for friend_id, friend_mutual_friends in mutual_friends.items()
+            },
+        )
+
+    def test_save_friends_as_string_table_and_mutual_friends_as_csr_edges(self):
+        # Given
+        friends = [
+            Friend(user_id="111", name="Pedro", link="pedro.com", gender="MALE"),
+            Friend(user_id="222", name="Rufus", link="rufusbajista.com"),
+            Friend(user_id="333", name="Juni", link="juni.com", gender="FEMALE"),
+        ]
+        mutual_friends = {
+            "111": [Friend(user_id="333", name="Juni", link="juni.com")],
+            "333": [
+                Friend(user_id="111", name="Pedro", link="pedro.com"),
+                Friend(user_id="222", name="Rufus", link="rufusbajista.com"),
+            ],
+        }
+        # When
+        save_network_binary(self.filename, friends, mutual_friends)
+        network_file = BinaryNetworkFile(self.filename)
+        # Then
+        self.assertEqual(3, network_file.friend_count)
+        self.assertEqual(3, network_file.edge_count)
+        self.assertIsInstance(network_file.edge_indices, np.memmap)
+        self.assertEqual(np.int32, network_file.edge_indices.dtype)
+        self.assertEqual([0, 1, 1, 3], list(network_file.edge_indptr))
+        self.assertEqual([2], list(network_file.get_mutual_friend_positions(0)))
+        self.assertEqual([0, 1], list(network_file.get_mutual_friend_positions(2)))
+        columns = network_file.get_friend_columns()
+        self.assertEqual(["Pedro", "Rufus", "Juni"], list(columns["name"]))
+        self.assertEqual(["MALE", None, "FEMALE"], list(columns["gender"]))
+
+    def test_keep_mutual_friends_that_are_not_friends(self):
+        # Given
+        friends, mutual_friends = self.get_network_with_mutual_friends_that_are_not_friends()
+        # When
+        save_network_binary(self.filename, friends, mutual_friends)
+        network_file = BinaryNetworkFile(self.filename)
+        loaded_friends, loaded_mutual_friends = load_network_binary(self.filename)
+        # Then
+        self.assertEqual(2, network_file.friend_count)
+        self.assertEqual([2, 0], list(network_file.edge_indices[[1, 3]]))
+        self.assertEqual(["999"], list(network_file.get_other_source_ids()))
+        self.assertEqual(
+            self.to_dicts(friends, mutual_friends), self.to_dicts(loaded_friends, loaded_mutual_friends)
+        )
+
+    def test_convert_to_binary_and_back_keeps_mutual_friends_that_are_not_friends(self):
+        # Given
+        friends, mutual_friends = self.get_network_with_mutual_friends_that_are_not_friends()
+        json_filename = os.path.join(self.directory.name, "network.json")
+        converted_json_filename = os.path.join(self.directory.name, "converted_network.json")
+        save_network_json(json_filename, friends, mutual_friends)
+        # When
+        convert_network_file(json_filename, self.filename, "binary")
+        convert_network_file(self.filename, converted_json_filename, "json")
+        # Then
+        self.assertEqual(
+            self.to_dicts(*load_network_json(json_filename)), self.to_dicts(*load_network_json(converted_json_filename))
+        )
+
+    def test_binary_and_json_networks_leave_out_the_same_mutual_friends(self):
+        # Given
+        friends, mutual_friends = self.get_network_with_mutual_friends_that_are_not_friends()
+        json_filename = os.path.join(self.directory.name, "network.json")
+        save_network_json(json_filename, friends, mutual_friends)
+        save_network_binary(self.filename, friends, mutual_friends)
+        json_network = FriendNetwork()
+        binary_network = FriendNetwork()
+        # When
+        with self.assertWarns(UserWarning):
+            json_network.load_network(json_filename)
+        with self.assertWarns(UserWarning):
+            binary_network.load_network(self.filename)
+        # Then
+        self.assertEqual({"hidden.com"}, binary_network.unresolved_links)
+        self.assertEqual(json_network.unresolved_links, binary_network.unresolved_links)
+        self.assertEqual(json_network.mutual_friends, binary_network.mutual_friends)
+        self.assertEqual(
+            {tuple(sorted(edge)) for edge in json_network.graph.edges},
+            {tuple(sorted(edge)) for edge in binary_network.graph.edges},
+        )
+
+    def test_json_files_are_not_binary_network_files(self):
+        self.assertFalse(BinaryNetworkFile.is_binary_network_file("tests/helpers/network_example.json"))
+        self.assertRaises(ValueError, BinaryNetworkFile, "tests/helpers/network_example.json")
+
+    def test_load_binary_network_file_into_friend_network(self):
+        # Given
+        json_network = FriendNetwork()
+        json_network.load_network("tests/helpers/network_example.json")
+        json_network.save_network(self.filename, file_format="binary")
+        # When
+        binary_network = FriendNetwork()
+        binary_network.load_network(self.filename)
+        # Then
+        self.assertEqual(json_network.friends, binary_network.friends)
+        self.assertEqual(
+            {"123": FriendSet([Friend(user_id="456", name="Pau", link="pau.com")]),
+             "456": FriendSet([Friend(user_id="123", name="Ruf", link="ruf.com")])},
+            binary_network.mutual_friends
+        )
+        self.assertEqual({("123", "456")}, {tuple(sorted(edge)) for edge in binary_network.graph.edges})
+
+    def test_empty_network(self):
+        # When
+        save_network_binary(self.filename, [], {})
+        network_file = BinaryNetworkFile(self.filename)
+        # Then
+        self.assertEqual(0, network_file.friend_count)
+        self.assertEqual(0, len(network_file.get_edges()[0]))
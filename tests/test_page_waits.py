@@ -0,0 +1,100 @@
+from unittest import mock, TestCase
+
+from src.page_waits import AdaptiveTimeout, PageWaiter
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdaptiveTimeoutTests(TestCase):
+    def test_initial_timeout_is_used_until_load_times_are_observed(self):
+        # Given
+        timeout = AdaptiveTimeout(initial=10, minimum=1, maximum=20)
+        # Then
+        self.assertEqual(10, timeout.value)
+
+    def test_timeout_follows_the_slowest_recent_load_time(self):
+        # Given
+        timeout = AdaptiveTimeout(initial=10, minimum=1, maximum=20, factor=3, window=2)
+        # When
+        timeout.record(2)
+        timeout.record(1)
+        # Then
+        self.assertEqual(6, timeout.value)
+        # When
+        timeout.record(1)
+        # Then
+        self.assertEqual(3, timeout.value)
+
+    def test_timeout_is_bounded(self):
+        # Given
+        timeout = AdaptiveTimeout(initial=10, minimum=1, maximum=20, factor=3)
+        # When
+        timeout.record(0.01)
+        # Then
+        self.assertEqual(1, timeout.value)
+        # When
+        timeout.record(100)
+        # Then
+        self.assertEqual(20, timeout.value)
+
+
+class PageWaiterTests(TestCase):
+    def test_wait_ends_as_soon_as_condition_is_fulfilled(self):
+        # Given
+        waiter = PageWaiter()
+        driver = mock.MagicMock()
+        condition = mock.MagicMock(side_effect=[False, True])
+        # When
+        is_fulfilled = waiter.wait_until(driver, condition, timeout=5)
+        # Then
+        self.assertTrue(is_fulfilled)
+        self.assertEqual(2, condition.call_count)
+        self.assertLess(waiter.total_wait_time, 1)
+        self.assertEqual(1, waiter.number_of_waits)
+
+    def test_wait_reports_timeouts(self):
+        # Given
+        waiter = PageWaiter()
+        # When
+        is_fulfilled = waiter.wait_until(mock.MagicMock(), lambda driver: False, timeout=0.05)
+        # Then
+        self.assertFalse(is_fulfilled)
+        self.assertEqual(1, waiter.number_of_timeouts)
+        self.assertIn("1 timed out", waiter.report())
+
+    def test_content_timeout_learns_from_load_times(self):
+        # Given
+        clock = FakeClock()
+        waiter = PageWaiter(clock=clock)
+        driver = mock.MagicMock()
+
+        def load_content(*_):
+            clock.now += 0.5
+            return True
+
+        driver.execute_async_script.side_effect = load_content
+        # When
+        is_settled = waiter.wait_for_content(driver)
+        # Then
+        self.assertTrue(is_settled)
+        self.assertEqual(PageWaiter.DOM_SETTLED_SCRIPT, driver.execute_async_script.call_args.args[0])
+        self.assertEqual(1.5, waiter.content_load_timeout.value)
+        self.assertEqual(0.5, waiter.total_wait_time)
+
+    def test_content_that_does_not_change_is_not_learnt(self):
+        # Given
+        waiter = PageWaiter()
+        driver = mock.MagicMock()
+        driver.execute_async_script.return_value = False
+        # When
+        is_settled = waiter.wait_for_content(driver)
+        # Then
+        self.assertFalse(is_settled)
+        self.assertEqual(waiter.content_load_timeout.initial, waiter.content_load_timeout.value)
+        self.assertEqual(1, waiter.number_of_timeouts)
@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from unittest import IsolatedAsyncioTestCase, mock, TestCase
+
+from src.rate_limiter import RateLimiter
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.time = 100.0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.time
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.time += seconds
+
+
+class RateLimiterTests(TestCase):
+    def test_requests_are_not_limited_by_default(self):
+        # Given
+        clock = FakeClock()
+        rate_limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+        # When
+        for _ in range(100):
+            rate_limiter.wait()
+        # Then
+        self.assertEqual(100.0, clock.time)
+
+    def test_requests_are_spaced_by_the_inverse_of_the_rate(self):
+        # Given
+        clock = FakeClock()
+        sleeps = []
+        rate_limiter = RateLimiter(4, clock=clock, sleep=sleeps.append)
+        # When
+        for _ in range(3):
+            rate_limiter.wait()
+        # Then
+        self.assertEqual([0.25, 0.5], sleeps)
+
+    def test_concurrent_callers_share_the_rate(self):
+        # Given
+        clock = FakeClock()
+        sleeps = []
+        rate_limiter = RateLimiter(10, clock=clock, sleep=sleeps.append)
+        # When
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: rate_limiter.wait(), range(20)))
+        # Then
+        self.assertEqual([round(0.1 * i, 6) for i in range(1, 20)], sorted(round(sleep, 6) for sleep in sleeps))
+
+
+class AsyncRateLimiterTests(IsolatedAsyncioTestCase):
+    async def test_coroutines_and_threads_share_the_rate(self):
+        # Given
+        clock = FakeClock()
+        sleeps = []
+        rate_limiter = RateLimiter(4, clock=clock, sleep=sleeps.append)
+        # When
+        with mock.patch("src.rate_limiter.asyncio.sleep", new=mock.AsyncMock(side_effect=sleeps.append)):
+            await asyncio.gather(*(rate_limiter.wait_async() for _ in range(3)))
+        rate_limiter.wait()
+        # Then
+        self.assertEqual([0.25, 0.5, 0.75], sleeps)
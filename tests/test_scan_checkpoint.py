@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from src.friend import Friend
+from src.scan_checkpoint import ScanCheckpoint
+
+
+class ScanCheckpointTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, "scan.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_progress_is_restored_from_file(self):
+        # Given
+        friends = [
+            Friend(user_id="1", name="Pedro", link="pedro.com"),
+            Friend(user_id="2", name="Juni", link="juni.com"),
+        ]
+        checkpoint = ScanCheckpoint(self.file_name)
+        checkpoint.record_friends_page(friends, dict(has_next_page=True, end_cursor="friends2"))
+        checkpoint.record_mutual_friends_page("1", [friends[1]], None, dict(has_next_page=True, end_cursor="page2"))
+        checkpoint.record_mutual_friends_page("1", [], "page2", dict(has_next_page=False, end_cursor=None))
+        checkpoint.record_scanned_friend("1")
+        checkpoint.record_mutual_friends_page("2", [friends[0]], None, dict(has_next_page=True, end_cursor="page2"))
+        checkpoint.close()
+        # When
+        restored_checkpoint = ScanCheckpoint(self.file_name)
+        restored_checkpoint.close()
+        # Then
+        self.assertEqual(friends, restored_checkpoint.friends)
+        self.assertEqual(dict(has_next_page=True, end_cursor="friends2"), restored_checkpoint.friend_list_page_info)
+        self.assertEqual(dict([("1", [friends[1]]), ("2", [friends[0]])]), restored_checkpoint.mutual_friends)
+        self.assertEqual(
+            dict(has_next_page=True, end_cursor="page2"), restored_checkpoint.mutual_friends_page_info["2"]
+        )
+        self.assertEqual({"1"}, restored_checkpoint.scanned_friend_ids)
+
+    def test_reading_the_first_page_again_restarts_the_mutual_friends_of_a_friend(self):
+        # Given
+        checkpoint = ScanCheckpoint(self.file_name)
+        checkpoint.record_mutual_friends_page("1", [Friend(user_id="2", name="Juni", link="juni.com")])
+        checkpoint.record_mutual_friends_page("1", [Friend(user_id="3", name="Rufus", link="rufus.com")])
+        checkpoint.close()
+        # When
+        restored_checkpoint = ScanCheckpoint(self.file_name)
+        restored_checkpoint.close()
+        # Then
+        self.assertEqual([Friend(user_id="3", name="Rufus", link="rufus.com")], restored_checkpoint.mutual_friends["1"])
+
+    def test_incomplete_last_record_is_discarded(self):
+        # Given
+        checkpoint = ScanCheckpoint(self.file_name)
+        checkpoint.record_scanned_friend("1")
+        checkpoint.close()
+        with open(self.file_name, "a") as file:
+            file.write('{"type": "scanned", "frie')
+        # When
+        restored_checkpoint = ScanCheckpoint(self.file_name)
+        restored_checkpoint.record_scanned_friend("2")
+        restored_checkpoint.close()
+        # Then
+        self.assertEqual({"1"}, restored_checkpoint.scanned_friend_ids)
+        restored_checkpoint = ScanCheckpoint(self.file_name)
+        restored_checkpoint.close()
+        self.assertEqual({"1", "2"}, restored_checkpoint.scanned_friend_ids)
+
+    def test_only_the_scan_that_wrote_the_checkpoint_resumes_it(self):
+        # Given
+        checkpoint = ScanCheckpoint(self.file_name, scan_id="scan1")
+        checkpoint.record_friends_page(
+            [Friend(user_id="1", name="Pedro", link="pedro.com")], dict(has_next_page=False, end_cursor=None)
+        )
+        checkpoint.close()
+        # When
+        retried_checkpoint = ScanCheckpoint(self.file_name, scan_id="scan1")
+        retried_checkpoint.close()
+        new_checkpoint = ScanCheckpoint(self.file_name, scan_id="scan2")
+        new_checkpoint.record_scanned_friend("2")
+        new_checkpoint.close()
+        # Then
+        self.assertEqual([Friend(user_id="1", name="Pedro", link="pedro.com")], retried_checkpoint.friends)
+        self.assertEqual([], new_checkpoint.friends)
+        self.assertEqual(dict(has_next_page=True, end_cursor=None), new_checkpoint.friend_list_page_info)
+        restored_checkpoint = ScanCheckpoint(self.file_name, scan_id="scan2")
+        restored_checkpoint.close()
+        self.assertEqual([], restored_checkpoint.friends)
+        self.assertEqual({"2"}, restored_checkpoint.scanned_friend_ids)
+
+    def test_unsupported_version_is_an_error(self):
+        # Given
+        with open(self.file_name, "w") as file:
+            file.write('{"version": 2}\n')
+        # Then
+        self.assertRaises(ValueError, ScanCheckpoint, self.file_name)
+
+    def test_unknown_records_are_ignored(self):
+        # Given
+        checkpoint = ScanCheckpoint(self.file_name)
+        checkpoint.record_scanned_friend("1")
+        checkpoint.close()
+        with open(self.file_name, "a") as file:
+            file.write('{"type": "unknown", "friend_id": "2"}\n')
+        # When
+        restored_checkpoint = ScanCheckpoint(self.file_name)
+        restored_checkpoint.close()
+        # Then
+        self.assertEqual({"1"}, restored_checkpoint.scanned_friend_ids)
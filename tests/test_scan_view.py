@@ -1,15 +1,18 @@
 import os
+import tempfile
 from unittest import mock
 
 from django.conf import settings
+from django.core.files import File
 from django.test import override_settings, TestCase
 
-from core.models import ScanInstance
+from core.models import LogEvent, ScanInstance
 from core.views import scan_facebook_friend_network
 
 
 @override_settings(
-    MEDIA_ROOT=os.path.join("tests", "helpers", "media")
+    MEDIA_ROOT=os.path.join("tests", "helpers", "media"),
+    SCAN_CHECKPOINT_DIR=os.path.join(tempfile.gettempdir(), "scan_checkpoints"),
 )
 class ScanViewTests(TestCase):
     def tearDown(self) -> None:
@@ -22,9 +25,10 @@ class ScanViewTests(TestCase):
         for f in os.listdir(temp_dir):
             os.remove(os.path.join(temp_dir, f))
 
+    @mock.patch.object(ScanInstance, "compute_layout")
     @mock.patch("os.remove")
     @mock.patch("core.views.FacebookFriendNetworkScanner")
-    def test_scan_network_saves_file_to_model(self, _, __):
+    def test_scan_network_saves_file_to_model(self, _, __, compute_layout):
         # Given
         with open(os.path.join(settings.MEDIA_ROOT, "temp", "network_pedro.json"), "w") as file:
             file.write("nothing")
@@ -37,3 +41,111 @@ class ScanViewTests(TestCase):
             os.path.join(settings.BASE_DIR, settings.MEDIA_ROOT, "networks", "pedro.json"),
             scan_instance.file.path
         )
+        compute_layout.assert_called_once()
+
+    @mock.patch.object(ScanInstance, "compute_layout", side_effect=ValueError("max() arg is an empty sequence"))
+    @mock.patch("os.remove")
+    @mock.patch("core.views.FacebookFriendNetworkScanner")
+    def test_scan_network_finishes_when_the_layout_fails(self, _, __, ___):
+        # Given
+        with open(os.path.join(settings.MEDIA_ROOT, "temp", "network_pedro.json"), "w") as file:
+            file.write("nothing")
+        # When
+        scan_facebook_friend_network.now("pedro", "password")
+        # Then
+        scan_instance = ScanInstance.objects.get(user="pedro")
+        self.assertTrue(scan_instance.file)
+        self.assertIsNone(scan_instance.layout)
+        self.assertEqual(
+            "Scan has finished", LogEvent.objects.filter(scan_instance=scan_instance).order_by("pk").last().text
+        )
+
+    @mock.patch.object(ScanInstance, "compute_layout")
+    @mock.patch("os.remove")
+    @mock.patch("core.views.FacebookFriendNetworkScanner")
+    def test_scan_network_saves_progress_to_checkpoint_file(self, scanner, __, ___):
+        # Given
+        with open(os.path.join(settings.MEDIA_ROOT, "temp", "network_pedro.json"), "w") as file:
+            file.write("nothing")
+        # When
+        scan_facebook_friend_network.now("pedro", "password", scan_id="scan1")
+        # Then
+        scanner.return_value.resume_from_checkpoint.assert_called_once_with(
+            os.path.join(settings.SCAN_CHECKPOINT_DIR, "pedro.jsonl"), notify=mock.ANY, scan_id="scan1"
+        )
+        scanner.return_value.scan_network.assert_called_once()
+
+    @mock.patch("core.views.FacebookFriendNetworkScanner")
+    def test_checkpoint_is_closed_when_the_scan_fails_before_scanning(self, scanner):
+        # Given
+        with open(os.path.join("tests", "helpers", "network_example.json"), "rb") as file:
+            ScanInstance.objects.create(user="pedro", file=File(file, name="pedro.json"))
+        scanner.return_value.read_all_friends_from_graphql_api.side_effect = ConnectionError
+        # When
+        with self.assertRaises(ConnectionError):
+            scan_facebook_friend_network.now("pedro", "password", True)
+        # Then
+        scanner.return_value.close_checkpoint.assert_called_once()
+        scanner.return_value.scan_network.assert_not_called()
+
+    @mock.patch.object(ScanInstance, "compute_layout")
+    @mock.patch("os.remove")
+    @mock.patch("core.views.FacebookFriendNetworkScanner")
+    def test_incremental_scan_reuses_mutual_friends_of_last_scan(self, scanner, __, ___):
+        # Given
+        with open(os.path.join("tests", "helpers", "network_example.json"), "rb") as file:
+            ScanInstance.objects.create(user="pedro", file=File(file, name="pedro.json"))
+        with open(os.path.join(settings.MEDIA_ROOT, "temp", "network_pedro.json"), "w") as file:
+            file.write("nothing")
+        scanner.return_value.reuse_mutual_friends.return_value = 0
+        # When
+        scan_facebook_friend_network.now("pedro", "password", True)
+        # Then
+        self.assertEqual(2, len(ScanInstance.objects.all()))
+        scanner.return_value.read_all_friends_from_graphql_api.assert_called_once()
+        previous_mutual_friends = scanner.return_value.reuse_mutual_friends.call_args.args[0]
+        self.assertEqual(2, len(previous_mutual_friends))
+
+    @mock.patch.object(ScanInstance, "compute_layout")
+    @mock.patch("os.remove")
+    @mock.patch("core.views.FacebookFriendNetworkScanner")
+    def test_incremental_scan_skips_scans_that_did_not_finish(self, scanner, __, ___):
+        # Given
+        with open(os.path.join("tests", "helpers", "network_example.json"), "rb") as file:
+            ScanInstance.objects.create(user="pedro", file=File(file, name="pedro.json"))
+        ScanInstance.objects.create(user="pedro")
+        with open(os.path.join(settings.MEDIA_ROOT, "temp", "network_pedro.json"), "w") as file:
+            file.write("nothing")
+        scanner.return_value.reuse_mutual_friends.return_value = 0
+        # When
+        scan_facebook_friend_network.now("pedro", "password", True)
+        # Then
+        previous_mutual_friends = scanner.return_value.reuse_mutual_friends.call_args.args[0]
+        self.assertEqual(2, len(previous_mutual_friends))
+
+    @mock.patch.object(ScanInstance, "compute_layout")
+    @mock.patch("os.remove")
+    @mock.patch("core.views.FacebookFriendNetworkScanner")
+    def test_incremental_scan_without_finished_scan_scans_whole_network(self, scanner, __, ___):
+        # Given
+        ScanInstance.objects.create(user="pedro")
+        with open(os.path.join(settings.MEDIA_ROOT, "temp", "network_pedro.json"), "w") as file:
+            file.write("nothing")
+        # When
+        scan_facebook_friend_network.now("pedro", "password", True)
+        # Then
+        scanner.return_value.reuse_mutual_friends.assert_not_called()
+        scanner.return_value.scan_network.assert_called_once()
+
+    @mock.patch.object(ScanInstance, "compute_layout")
+    @mock.patch("os.remove")
+    @mock.patch("core.views.FacebookFriendNetworkScanner")
+    def test_incremental_scan_without_previous_scan_scans_whole_network(self, scanner, __, ___):
+        # Given
+        with open(os.path.join(settings.MEDIA_ROOT, "temp", "network_pedro.json"), "w") as file:
+            file.write("nothing")
+        # When
+        scan_facebook_friend_network.now("pedro", "password", True)
+        # Then
+        scanner.return_value.reuse_mutual_friends.assert_not_called()
+        scanner.return_value.scan_network.assert_called_once()
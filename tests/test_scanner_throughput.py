@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+from benchmarks.mock_graphql_server import MockGraphQLServer
+from benchmarks.scanner_throughput import get_modes, run_benchmark
+
+
+class ScannerThroughputTests(TestCase):
+    def test_every_mode_scans_the_whole_mock_network(self):
+        # Given
+        server = MockGraphQLServer(number_of_friends=40, mean_mutual_friends=12, latency=0, seed=1)
+        with server:
+            # When
+            results = run_benchmark(server, get_modes(concurrency=4))
+            scanner = get_modes(concurrency=4)["async-4"](server.url)
+        # Then
+        self.assertEqual(["graphql", "graphql-threads-4", "async-4"], [result["mode"] for result in results])
+        self.assertTrue(all(result["scans_per_minute"] > 0 for result in results))
+        self.assertEqual(
+            {friend_id: set(mutual_friend_ids) for friend_id, mutual_friend_ids in server.mutual_friend_ids.items()},
+            {
+                friend_id: {mutual_friend.user_id for mutual_friend in mutual_friends}
+                for friend_id, mutual_friends in scanner.mutual_friends.items()
+            },
+        )
+
+    def test_requests_above_the_rate_limit_are_throttled(self):
+        # Given
+        server = MockGraphQLServer(number_of_friends=20, mean_mutual_friends=5, latency=0, max_requests_per_second=20)
+        with server:
+            # When
+            results = run_benchmark(server, {"async-10": get_modes(concurrency=10)["async-10"]})
+        # Then
+        self.assertGreater(results[0]["errors"], 0)
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from src.session_store import SessionStore
+
+
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.now = 1000.0
+        self.store = SessionStore(self.directory, max_age=60, clock=lambda: self.now)
+        # Fast key derivation, so that tests do not spend time on it
+        self.store.KEY_DERIVATION_ITERATIONS = 1000
+        self.cookies = dict(c_user="1234", xs="secret")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_saved_session_is_loaded(self):
+        # Given
+        self.store.save("pedro@mail.com", "password", self.cookies, "token")
+        # When
+        session = self.store.load("pedro@mail.com", "password")
+        # Then
+        self.assertEqual(self.cookies, session.cookies)
+        self.assertEqual("token", session.fb_dtsg_token)
+        self.assertEqual(1000.0, session.created_at)
+
+    def test_session_is_encrypted_with_password(self):
+        # Given
+        self.store.save("pedro@mail.com", "password", self.cookies, "token")
+        # Then
+        [file_name] = os.listdir(self.directory)
+        self.assertNotIn("pedro", file_name)
+        with open(os.path.join(self.directory, file_name), "rb") as file:
+            self.assertNotIn(b"secret", file.read())
+        self.assertIsNone(self.store.load("pedro@mail.com", "wrong password"))
+
+    def test_missing_session_is_not_loaded(self):
+        self.assertIsNone(self.store.load("pedro@mail.com", "password"))
+
+    def test_expired_session_is_not_loaded(self):
+        # Given
+        self.store.save("pedro@mail.com", "password", self.cookies, "token")
+        # When
+        self.now += 61
+        # Then
+        self.assertIsNone(self.store.load("pedro@mail.com", "password"))
+
+    def test_session_without_login_cookies_is_not_loaded(self):
+        # Given
+        self.store.save("pedro@mail.com", "password", dict(c_user="1234"), "token")
+        # Then
+        self.assertIsNone(self.store.load("pedro@mail.com", "password"))
+
+    def test_deleted_session_is_not_loaded(self):
+        # Given
+        self.store.save("pedro@mail.com", "password", self.cookies, "token")
+        # When
+        self.store.delete("pedro@mail.com")
+        self.store.delete("pedro@mail.com")
+        # Then
+        self.assertIsNone(self.store.load("pedro@mail.com", "password"))